@@ -0,0 +1,87 @@
+"""
+Validate the early block classifier against a corpus of blocked and normal pages.
+
+Each case in fixtures/blocks/cases.json describes the main document response
+(status, final URL, redirect chain, headers, body file) and the expected block
+reason (null for a normal page). The classifier runs on the navigation
+response first and falls back to the scoped text check only when its verdict
+is inconclusive, as the request handler does. Exits with status 1 if any case
+is misclassified.
+
+Usage:
+    python -m benchmarks.bench_block_classifier [--rounds N]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.main import classify_navigation, detect_block_reason
+
+CORPUS = Path(__file__).parent / 'fixtures' / 'blocks'
+
+
+def legacy_detect(html: str) -> Optional[str]:
+    """Previous behaviour: substring search over the whole lowercased HTML."""
+    text = html.lower()
+    if 'captcha' in text or 'verify' in text:
+        return 'captcha'
+    if any(term in text for term in ['access blocked', 'access denied', 'forbidden']):
+        return 'blocked'
+    if any(term in text for term in ['unusual activity', 'unusual traffic', 'robot']):
+        return 'bot'
+    return None
+
+
+def classify(case: dict, body: bytes) -> tuple:
+    reason, conclusive = classify_navigation(
+        case['status'], case['url'], case.get('redirects', []), case['headers'], body
+    )
+    if not conclusive:
+        return detect_block_reason(body.decode('utf-8', 'ignore')), 'text'
+    return reason, 'response'
+
+
+def median_ms(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    
+    cases = json.loads((CORPUS / 'cases.json').read_text(encoding='utf-8'))
+    failures = 0
+    legacy_failures = 0
+    
+    print(f'{"case":34} {"expected":13} {"classifier":13} {"via":9} {"ms":>7}   {"legacy":13}')
+    for case in cases:
+        body = (CORPUS / case['body']).read_bytes()
+        reason, via = classify(case, body)
+        elapsed = median_ms(lambda: classify(case, body), args.rounds)
+        legacy = legacy_detect(body.decode('utf-8', 'ignore'))
+        
+        ok = reason == case['expected']
+        failures += not ok
+        legacy_failures += legacy != case['expected']
+        print(f'{case["name"]:34} {str(case["expected"]):13} {str(reason):13} {via:9} {elapsed:7.3f}   '
+              f'{str(legacy):13}{"" if ok else "  <-- MISMATCH"}')
+    
+    print(f'\nclassifier: {len(cases) - failures}/{len(cases)} correct')
+    print(f'legacy:     {len(cases) - legacy_failures}/{len(cases)} correct')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+End-to-end crawler throughput against the local Etsy stand-in server.
+
+Starts benchmarks/replay_server.py on a free port, writes an Actor input that
+points the crawler at it (no proxy), runs src.main.main() in-process with a
+throwaway local storage directory and reports pages per minute, reviews per
+second and the per-stage timings the Actor saved as stage_timings. Needs the
+Camoufox browser (python -m camoufox fetch) but no network access.
+
+Usage:
+    python -m benchmarks.bench_crawl [--shops 3] [--reviews 240] [--results-wanted 240]
+        [--archive replay_archive.jsonl.gz] [--speed-profile fast] [--max-concurrency 2]
+        [--block-every N] [--input-json '{"httpFastPath": true}']
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.replay_server import start_server
+
+
+def write_input(storage_dir: Path, actor_input: dict) -> None:
+    store = storage_dir / 'key_value_stores' / 'default'
+    store.mkdir(parents=True, exist_ok=True)
+    (store / 'INPUT.json').write_text(json.dumps(actor_input), encoding='utf-8')
+
+
+def read_record(storage_dir: Path, key: str) -> dict:
+    store = storage_dir / 'key_value_stores' / 'default'
+    for path in store.glob(f'{key}*'):
+        if not path.name.endswith('.__metadata__.json'):
+            value = json.loads(path.read_text(encoding='utf-8'))
+            return json.loads(value) if isinstance(value, str) else value
+    return {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=3)
+    parser.add_argument('--reviews', type=int, default=240, help='reviews per synthetic shop')
+    parser.add_argument('--page-size', type=int, default=24)
+    parser.add_argument('--results-wanted', type=int, default=240)
+    parser.add_argument('--archive', type=Path, help='replay a recorded archive; start URLs must be in it')
+    parser.add_argument('--start-url', action='append', default=[], help='start URL path, e.g. /shop/Name')
+    parser.add_argument('--render', choices=['api', 'html'], default='api')
+    parser.add_argument('--api-pagination', choices=['page', 'cursor'], default='page')
+    parser.add_argument('--block-every', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--speed-profile', choices=['stealth', 'balanced', 'fast'], default='fast')
+    parser.add_argument('--max-concurrency', type=int, default=2)
+    parser.add_argument('--input-json', default='{}', help='extra Actor input merged over the defaults')
+    args = parser.parse_args()
+    
+    server = start_server(0, args.archive, args.reviews, args.page_size, args.api_pagination, args.render,
+                          args.block_every, 0.0, args.latency_ms)
+    paths = args.start_url or [f'/shop/BenchShop{n}' for n in range(1, args.shops + 1)]
+    actor_input = {
+        'startUrls': [{'url': f'{server.base_url}{path}#reviews'} for path in paths],
+        'results_wanted': args.results_wanted,
+        'speedProfile': args.speed_profile,
+        'maxConcurrency': args.max_concurrency,
+        'proxyConfiguration': {'useApifyProxy': False},
+        **json.loads(args.input_json),
+    }
+    
+    with tempfile.TemporaryDirectory(prefix='etsy-bench-') as tmp:
+        storage_dir = Path(tmp)
+        write_input(storage_dir, actor_input)
+        os.environ['CRAWLEE_STORAGE_DIR'] = str(storage_dir)
+        os.environ.setdefault('CRAWLEE_PURGE_ON_START', 'false')
+        
+        from src.main import main as actor_main
+        
+        started = time.perf_counter()
+        try:
+            asyncio.run(actor_main())
+        except SystemExit:
+            pass
+        elapsed = time.perf_counter() - started
+        statistics = read_record(storage_dir, 'statistics')
+        timings = read_record(storage_dir, 'stage_timings')
+    server.shutdown()
+    
+    pages = statistics.get('pagesProcessed', 0)
+    reviews = statistics.get('totalReviewsScraped', 0)
+    print(f'\nServer: {server.base_url} {server.counters}')
+    print(f'Wall time: {elapsed:.1f} s for {len(paths)} shops')
+    print(f'Pages: {pages} ({pages / elapsed * 60:.1f} pages/min)')
+    print(f'Reviews: {reviews} ({reviews / elapsed:.1f} reviews/s)')
+    if timings:
+        print(f'\n{"stage":20} {"count":>6} {"p50 ms":>10} {"p95 ms":>10} {"total ms":>11}')
+        for stage, values in sorted(timings['stages'].items(), key=lambda item: -item[1]['totalMs']):
+            print(f'{stage:20} {values["count"]:6} {values["p50Ms"]:10.1f} {values["p95Ms"]:10.1f} {values["totalMs"]:11.1f}')
+        print(f'\nReviews by source: {timings["reviewsBySource"]}')
+        print(f'Bytes: {timings["bytes"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory and time per 100k reviews for the dedup store variants.
+
+Usage:
+    python -m benchmarks.bench_dedup [--reviews 100000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.payloads import WORDS
+from src.main import ReviewDedup, ShopState, get_review_key
+
+
+def make_reviews(count: int) -> List[Dict]:
+    rng = random.Random(0)
+    reviews = []
+    for index in range(count):
+        reviews.append({
+            # Most HTML-extracted reviews have no id and fall back to the signature key
+            'review_id': f'{index}' if index % 4 == 0 else '',
+            'username': f'buyer_{rng.randint(0, 50000)}',
+            'comment': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))),
+            'date': f'Mar {rng.randint(1, 28)}, 2024',
+            'item_title': f'Handmade item {rng.randint(0, 400)}',
+        })
+    return reviews
+
+
+def string_keys(reviews: List[Dict]):
+    seen = set()
+    for review in reviews:
+        seen.add(get_review_key(review))
+    return seen
+
+
+def digests(bits: int, bloom_capacity: int = 0, exact_limit: int = 100_000) -> Callable:
+    def run(reviews: List[Dict]):
+        # Built through ShopState, the way the crawler builds it, so a dropped store shows up here
+        dedup = ShopState('bench', '', 0, ReviewDedup(bits, bloom_capacity, exact_limit)).seen_reviews
+        if (dedup.digest_bits, dedup.bloom_capacity) != (bits, bloom_capacity):
+            raise SystemExit(f'ShopState dropped the dedup store: got {dedup.digest_bits} bits, '
+                             f'capacity {dedup.bloom_capacity}; expected {bits} bits, capacity {bloom_capacity}')
+        for review in reviews:
+            dedup.add(review)
+        return dedup
+    return run
+
+
+def measure(name: str, fn: Callable, reviews: List[Dict]) -> None:
+    started = time.perf_counter()
+    fn(reviews)
+    elapsed = time.perf_counter() - started
+    
+    # Memory still held by the store once it is built
+    tracemalloc.start()
+    store = fn(reviews)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_100k = current / len(reviews) * 100_000
+    print(f'{name:<28} {per_100k / 1024 / 1024:8.2f} MiB per 100k   {elapsed * 1000:8.0f} ms')
+    del store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=100_000)
+    args = parser.parse_args()
+    
+    reviews = make_reviews(args.reviews)
+    measure('signature strings (before)', string_keys, reviews)
+    measure('64-bit digests', digests(64), reviews)
+    measure('128-bit digests', digests(128), reviews)
+    measure('Bloom tier (0.1% FP)', digests(64, bloom_capacity=args.reviews, exact_limit=1000), reviews)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Extraction executor throughput: inline on the event loop versus thread and process pools.
+
+Submits --jobs extraction jobs concurrently, the way several open pages and
+their review API responses would: generated shop pages go through
+extract_page and generated API bodies through parse_review_body. For each
+executor mode it reports jobs per second and the event loop's lag (how late a
+10 ms ticker fires while extraction runs), which is what the browsers and
+network handlers feel. Pools only pay off with more than one core; the
+process pool also pays for pickling pages to its workers and for its
+start-up, which the --warmup jobs absorb.
+
+Usage:
+    python -m benchmarks.bench_executor [--jobs 48] [--reviews 100] [--workers 0] [--modes inline,thread,process]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.payloads import make_review_payload, make_shop_page
+from src.main import EXTRACTION_EXECUTORS, extract_page, extraction_executor, parse_review_body, percentile
+
+TICK_SECS = 0.01
+
+
+async def measure_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECS)
+        lags.append((time.perf_counter() - started - TICK_SECS) * 1000)
+
+
+async def run_mode(mode: str, workers: int, jobs: int, warmup: int, pages: List[str], bodies: List[bytes]) -> Dict:
+    extraction_executor.configure(mode, workers)
+    
+    def submit(index: int):
+        if index % 2:
+            return extraction_executor.run(parse_review_body, bodies[index % len(bodies)], 'https://www.etsy.com/api/reviews')
+        return extraction_executor.run(extract_page, pages[index % len(pages)], 'https://www.etsy.com/shop/Bench?page=1')
+    
+    await asyncio.gather(*(submit(index) for index in range(warmup)))
+    
+    stop = asyncio.Event()
+    lags: List[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(submit(index) for index in range(jobs)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    statistics = extraction_executor.statistics()
+    extraction_executor.shutdown()
+    
+    reviews = sum(len(result.reviews) if index % 2 == 0 else len(result[0]) for index, result in enumerate(results))
+    return {
+        'mode': mode,
+        'workers': statistics['workers'],
+        'jobsPerSec': round(jobs / elapsed, 1),
+        'reviews': reviews,
+        'lagP50Ms': round(percentile(lags, 50), 1),
+        'lagMaxMs': round(max(lags, default=0.0), 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict]:
+    pages = [make_shop_page(args.reviews, seed) for seed in range(4)]
+    bodies = [json.dumps(make_review_payload(args.reviews, seed)).encode() for seed in range(4)]
+    return [
+        await run_mode(mode, args.workers, args.jobs, args.warmup, pages, bodies)
+        for mode in args.modes.split(',')
+        if mode in EXTRACTION_EXECUTORS
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=48)
+    parser.add_argument('--warmup', type=int, default=8)
+    parser.add_argument('--reviews', type=int, default=100, help='reviews per generated page and payload')
+    parser.add_argument('--workers', type=int, default=0, help='pool size, 0 = one per CPU')
+    parser.add_argument('--modes', default=','.join(EXTRACTION_EXECUTORS))
+    args = parser.parse_args()
+    
+    print(f'CPUs: {os.cpu_count()}, {args.jobs} jobs of {args.reviews} reviews')
+    print(f'{"mode":10} {"workers":>8} {"jobs/s":>9} {"reviews":>9} {"lag p50 ms":>11} {"lag max ms":>11}')
+    for result in asyncio.run(run(args)):
+        print(f'{result["mode"]:10} {result["workers"]:8} {result["jobsPerSec"]:9.1f} {result["reviews"]:9} '
+              f'{result["lagP50Ms"]:11.1f} {result["lagMaxMs"]:11.1f}')
+
+
+if __name__ == '__main__':
+    main()
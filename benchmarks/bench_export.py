@@ -0,0 +1,87 @@
+"""
+Export throughput: reviews streamed into NDJSON, CSV and Parquet parts.
+
+Generates --rows normalized reviews shaped like the Actor's dataset items,
+feeds them to ReviewExporter in DatasetWriter-sized batches with an in-memory
+key-value store, and reports rows per second, bytes per row (against plain
+JSON items as the dataset stores them) and the peak traced memory of a second
+run, which should stay flat as --rows grows since parts are flushed every
+--chunk-rows rows. Parquet needs pyarrow.
+
+Usage:
+    python -m benchmarks.bench_export [--rows 200000] [--chunk-rows 50000] [--formats ndjson,csv,parquet]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Dict, List
+
+from benchmarks.payloads import make_review_payload
+from src.main import EXPORT_ENCODERS, ReviewExporter, extract_reviews_from_any, pyarrow
+
+BATCH_SIZE = 100
+
+
+def make_items(rows: int) -> List[Dict]:
+    """Dataset items as push_reviews leaves them, a few thousand listings across 20 shops."""
+    items: List[Dict] = []
+    seed = 0
+    while len(items) < rows:
+        for review in extract_reviews_from_any(make_review_payload(1000, seed)):
+            review.pop('review_id', None)
+            review.pop('source', None)
+            review['shop'] = f'BenchShop{seed % 20}'
+            items.append(review)
+        seed += 1
+    return items[:rows]
+
+
+async def export(items: List[Dict], export_format: str, chunk_rows: int) -> ReviewExporter:
+    async def set_value(key: str, value: bytes, content_type: str = '') -> None:
+        pass
+    
+    exporter = ReviewExporter(export_format, set_value, chunk_rows)
+    for start in range(0, len(items), BATCH_SIZE):
+        await exporter.write(items[start:start + BATCH_SIZE])
+    await exporter.close()
+    return exporter
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--chunk-rows', type=int, default=50_000)
+    parser.add_argument('--formats', default=','.join(EXPORT_ENCODERS))
+    args = parser.parse_args()
+    
+    items = make_items(args.rows)
+    started = time.perf_counter()
+    json_bytes = sum(len(json.dumps(item).encode('utf-8')) for item in items)
+    json_secs = time.perf_counter() - started
+    print(f'{len(items)} reviews, chunks of {args.chunk_rows}')
+    print(f'{"format":10} {"rows/s":>10} {"bytes/row":>10} {"vs JSON":>8} {"parts":>6} {"peak MiB":>9}')
+    print(f'{"json":10} {len(items) / json_secs:10.0f} {json_bytes / len(items):10.1f} {1.0:8.2f} {"-":>6} {"-":>9}')
+    
+    for export_format in args.formats.split(','):
+        if export_format == 'parquet' and pyarrow is None:
+            print(f'{export_format:10} skipped, pyarrow is not installed')
+            continue
+        started = time.perf_counter()
+        exporter = asyncio.run(export(items, export_format, args.chunk_rows))
+        elapsed = time.perf_counter() - started
+        
+        tracemalloc.start()
+        asyncio.run(export(items, export_format, args.chunk_rows))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        statistics = exporter.statistics()
+        print(f'{export_format:10} {len(items) / elapsed:10.0f} {statistics["bytesPerRow"]:10.1f} '
+              f'{statistics["bytes"] / json_bytes:8.2f} {statistics["parts"]:6} {peak / 2 ** 20:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
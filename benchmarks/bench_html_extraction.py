@@ -0,0 +1,77 @@
+"""
+Benchmark single-parse HTML extraction against the per-extractor parse path.
+
+Usage:
+    python -m benchmarks.bench_html_extraction [--fixture PATH] [--rounds N]
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from src.main import (
+    ExtractionDocument,
+    extract_block_details,
+    extract_review_from_element,
+    extract_reviews_from_html,
+    extract_reviews_from_jsonld,
+    extract_reviews_from_next_data,
+)
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'shop_reviews.html'
+
+
+def separate_parses(html: str) -> int:
+    """Previous behaviour: every extractor parses the page on its own."""
+    count = len(extract_reviews_from_next_data(ExtractionDocument(html, 'html.parser')))
+    count += len(extract_reviews_from_jsonld(ExtractionDocument(html, 'html.parser')))
+    for element in ExtractionDocument(html, 'html.parser').review_elements:
+        if extract_review_from_element(str(element)):
+            count += 1
+    extract_block_details(ExtractionDocument(html, 'html.parser'))
+    return count
+
+
+def single_parse(html: str) -> int:
+    """Current behaviour: one parse shared by all extractors."""
+    document = ExtractionDocument(html)
+    count = len(extract_reviews_from_next_data(document))
+    count += len(extract_reviews_from_jsonld(document))
+    count += len(extract_reviews_from_html(document))
+    extract_block_details(document)
+    return count
+
+
+def measure(fn, html: str, rounds: int) -> dict:
+    timings = []
+    count = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        count = fn(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'reviews': count,
+        'medianMs': round(statistics.median(timings), 2),
+        'minMs': round(min(timings), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', type=Path, default=FIXTURE)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    
+    html = args.fixture.read_text(encoding='utf-8')
+    baseline = measure(separate_parses, html, args.rounds)
+    current = measure(single_parse, html, args.rounds)
+    
+    print(f'Fixture: {args.fixture} ({len(html) / 1024:.0f} KiB)')
+    print(f'separate parses: {baseline}')
+    print(f'single parse:    {current}')
+    print(f'speedup: {baseline["medianMs"] / current["medianMs"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
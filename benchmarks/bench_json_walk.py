@@ -0,0 +1,126 @@
+"""
+Benchmark the single-pass JSON walker against the previous two-walk path.
+
+Usage:
+    python -m benchmarks.bench_json_walk [--sizes 100,1000,10000] [--rounds N]
+"""
+
+import argparse
+import re
+import statistics
+import time
+import tracemalloc
+from typing import Any, Dict, List, Set
+
+from benchmarks.payloads import make_review_payload
+from src.main import extract_reviews_and_next_urls, normalize_review
+
+
+def legacy_has_potential_review_fields(obj: Any) -> bool:
+    if not isinstance(obj, dict):
+        return False
+    keys = [k.lower() for k in obj.keys()]
+    return any(k.find(field) >= 0 for k in keys for field in ['review', 'rating', 'comment', 'feedback'])
+
+
+def legacy_extract_reviews(payload: Any, source_url: str = '') -> List[Dict]:
+    results = []
+    visited = set()
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, (dict, list)):
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        if isinstance(node, list):
+            for item in node:
+                if isinstance(item, dict):
+                    review = normalize_review(item, source_url)
+                    if review:
+                        results.append(review)
+                stack.append(item)
+            continue
+        if legacy_has_potential_review_fields(node):
+            review = normalize_review(node, source_url)
+            if review:
+                results.append(review)
+        stack.extend(node.values())
+    return results
+
+
+def legacy_find_next_page_urls(payload: Any) -> List[str]:
+    urls: Set[str] = set()
+    visited: Set[int] = set()
+    stack = [payload]
+    url_regex = re.compile(r'^https?://', re.IGNORECASE)
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, (dict, list)):
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        for key, value in node.items():
+            if isinstance(value, str):
+                if url_regex.match(value) and any(p in value for p in ['page=', 'offset=', 'cursor=']):
+                    urls.add(value)
+                if 'next' in key.lower() and url_regex.match(value):
+                    urls.add(value)
+            else:
+                stack.append(value)
+    return list(urls)
+
+
+def two_walks(payload: Any):
+    return legacy_extract_reviews(payload, 'bench'), legacy_find_next_page_urls(payload)
+
+
+def one_walk(payload: Any):
+    return extract_reviews_and_next_urls(payload, 'bench')
+
+
+def measure(fn, payload: Any, rounds: int) -> Dict:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        reviews, next_urls = fn(payload)
+        timings.append((time.perf_counter() - started) * 1000)
+    
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'reviews': len(reviews),
+        'uniqueReviews': len({r['review_id'] or r['comment'] for r in reviews}),
+        'nextUrls': len(next_urls),
+        'medianMs': round(statistics.median(timings), 2),
+        'peakKiB': round(peak / 1024),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    
+    for size in [int(value) for value in args.sizes.split(',')]:
+        payload = make_review_payload(size)
+        baseline = measure(two_walks, payload, args.rounds)
+        current = measure(one_walk, payload, args.rounds)
+        print(f'{size} reviews')
+        print(f'  two walks: {baseline}')
+        print(f'  one walk:  {current}')
+        print(f'  speedup: {baseline["medianMs"] / current["medianMs"]:.1f}x, '
+              f'peak memory: {current["peakKiB"] / baseline["peakKiB"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Sharded crawl with several local worker processes against the Etsy stand-in server.
+
+Starts benchmarks/replay_server.py, runs the Actor once as coordinator (seeding
+one shard per shop into a shard directory), then starts --workers Actor
+processes with "role": "worker" that pull shards from that directory in
+parallel, each with its own storage directory and dataset, and finally runs
+the merge step, which deduplicates the worker datasets into one. Reports wall
+time, per-worker shard counts and the merge statistics. Needs the Camoufox
+browser (python -m camoufox fetch) but no network access.
+
+Usage:
+    python -m benchmarks.bench_sharded [--workers 3] [--shops 6] [--reviews 240] [--results-wanted 240]
+        [--max-concurrency 1] [--speed-profile fast] [--input-json '{"listingFanOut": true}']
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_crawl import read_record, write_input
+from benchmarks.replay_server import start_server
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def start_actor(storage_dir: Path, actor_input: dict) -> subprocess.Popen:
+    write_input(storage_dir, actor_input)
+    env = {**os.environ, 'CRAWLEE_STORAGE_DIR': str(storage_dir), 'CRAWLEE_PURGE_ON_START': 'false'}
+    log = open(storage_dir / 'actor.log', 'w', encoding='utf-8')
+    return subprocess.Popen([sys.executable, '-m', 'src'], cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def run_actor(storage_dir: Path, actor_input: dict) -> int:
+    return start_actor(storage_dir, actor_input).wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--shops', type=int, default=6)
+    parser.add_argument('--reviews', type=int, default=240, help='reviews per synthetic shop')
+    parser.add_argument('--page-size', type=int, default=24)
+    parser.add_argument('--results-wanted', type=int, default=240)
+    parser.add_argument('--render', choices=['api', 'html'], default='html')
+    parser.add_argument('--speed-profile', choices=['stealth', 'balanced', 'fast'], default='fast')
+    parser.add_argument('--max-concurrency', type=int, default=1, help='pages in parallel inside each worker')
+    parser.add_argument('--keep', action='store_true', help='keep the storage directories and print their path')
+    parser.add_argument('--input-json', default='{}', help='extra Actor input merged over the defaults')
+    args = parser.parse_args()
+    
+    server = start_server(0, None, args.reviews, args.page_size, 'page', args.render)
+    tmp = Path(tempfile.mkdtemp(prefix='etsy-sharded-'))
+    actor_input = {
+        'startUrls': [{'url': f'{server.base_url}/shop/ShardShop{n}#reviews'} for n in range(1, args.shops + 1)],
+        'results_wanted': args.results_wanted,
+        'speedProfile': args.speed_profile,
+        'maxConcurrency': args.max_concurrency,
+        'proxyConfiguration': {'useApifyProxy': False},
+        'shardStoreName': str(tmp / 'shards'),
+        **json.loads(args.input_json),
+    }
+    
+    started = time.perf_counter()
+    if run_actor(tmp / 'coordinator', {**actor_input, 'role': 'coordinator'}) != 0:
+        sys.exit(f'Coordinator failed, see {tmp / "coordinator" / "actor.log"}')
+    
+    workers = [
+        start_actor(tmp / f'worker-{n}', {**actor_input, 'role': 'worker', 'workerId': f'worker-{n}'})
+        for n in range(1, args.workers + 1)
+    ]
+    exit_codes = [worker.wait() for worker in workers]
+    crawl_secs = time.perf_counter() - started
+    
+    merge_code = run_actor(tmp / 'merge', {**actor_input, 'role': 'merge'})
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    
+    print(f'\nServer: {server.base_url} {server.counters}')
+    print(f'Crawl: {crawl_secs:.1f} s with {args.workers} workers, total with merge {elapsed:.1f} s')
+    for n, code in enumerate(exit_codes, start=1):
+        statistics = read_record(tmp / f'worker-{n}', 'statistics')
+        sharding = statistics.get('sharding', {})
+        print(f'  worker-{n}: exit {code}, {sharding.get("shardsCompleted", 0)} shards, '
+              f'{statistics.get("pagesProcessed", 0)} pages, {statistics.get("totalReviewsScraped", 0)} reviews')
+    
+    merged = read_record(tmp / 'merge', 'statistics')
+    print(f'Merge: exit {merge_code}, {merged.get("totalReviewsScraped", 0)} reviews')
+    print(json.dumps(merged.get('merge', {}), indent=2))
+    if args.keep:
+        print(f'Storage kept in {tmp}')
+    else:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
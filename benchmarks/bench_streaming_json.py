@@ -0,0 +1,58 @@
+"""
+Compare streaming JSON review extraction with loading the whole body first.
+
+Both paths start from the raw response bytes. Peak memory is measured with
+tracemalloc on top of the body itself.
+
+Usage:
+    python -m benchmarks.bench_streaming_json [--sizes 1000,10000,50000] [--rounds N]
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Dict
+
+from benchmarks.payloads import make_review_payload
+from src.main import parse_review_body
+
+
+def measure(body: bytes, streaming: bool, rounds: int) -> Dict:
+    timings = []
+    reviews = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        reviews, _ = parse_review_body(body, 'bench', streaming)
+        timings.append((time.perf_counter() - started) * 1000)
+    
+    tracemalloc.start()
+    parse_review_body(body, 'bench', streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'reviews': len(reviews),
+        'medianMs': round(statistics.median(timings), 1),
+        'peakMiB': round(peak / 1024 / 1024, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    
+    for size in [int(value) for value in args.sizes.split(',')]:
+        body = json.dumps(make_review_payload(size)).encode()
+        loaded = measure(body, False, args.rounds)
+        streamed = measure(body, True, args.rounds)
+        print(f'{size} reviews, body {len(body) / 1024 / 1024:.1f} MiB')
+        print(f'  json.loads: {loaded}')
+        print(f'  streaming:  {streamed}')
+
+
+if __name__ == '__main__':
+    main()
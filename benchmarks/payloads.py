@@ -0,0 +1,150 @@
+"""
+Synthetic review API payloads for offline benchmarks.
+
+Payloads mimic the nesting seen in Etsy's review endpoints: reviews carry
+nested buyer/listing objects with image arrays and translation tables, and
+the envelope contains pagination links, tracking blobs and decoy objects.
+"""
+
+import json
+import random
+from typing import Any, Dict, List
+
+WORDS = (
+    'lovely gift fast shipping beautiful quality soft warm exactly as pictured daughter '
+    'loved it will buy again seller communication great packaging cute colors perfect fit'
+).split()
+
+
+def make_review(index: int, rng: random.Random) -> Dict[str, Any]:
+    listing_id = 100000 + rng.randint(0, 400)
+    return {
+        'review_id': f'r{index}',
+        'transaction_id': 5000000 + index,
+        'buyer': {
+            'name': f'buyer_{rng.randint(0, 5000)}',
+            'avatar': {'images': [{'url': f'https://i.etsystatic.com/iusa/{index}_{size}.jpg', 'size': size} for size in (75, 150)]},
+        },
+        'rating': rng.randint(1, 5),
+        'review': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))).capitalize() + '.',
+        'created_at': 1700000000 + index * 3600,
+        'language': 'en',
+        'translations': {lang: {'review': 'translated text', 'status': 'machine'} for lang in ('de', 'fr', 'es', 'ja')},
+        'listing': {
+            'listing_id': listing_id,
+            'title': f'Handmade item {listing_id}',
+            'url': f'/listing/{listing_id}/handmade-item',
+            'image_url': f'https://i.etsystatic.com/il_75x75.{listing_id}.jpg',
+            'images': [{'url_fullxfull': f'https://i.etsystatic.com/il_full.{listing_id}_{n}.jpg', 'rank': n} for n in range(4)],
+        },
+    }
+
+
+def make_decoy(index: int, rng: random.Random) -> Dict[str, Any]:
+    """Objects that look review-ish by key name but carry no review."""
+    return {
+        'listing_id': 900000 + index,
+        'price': {'amount': rng.randint(500, 9000), 'currency_code': 'USD'},
+        'review_count_label': f'{rng.randint(1, 900)} reviews',
+        'tags': [rng.choice(WORDS) for _ in range(6)],
+    }
+
+
+def make_review_payload(review_count: int, seed: int = 0, page: int = 1) -> Dict[str, Any]:
+    """Build one API page holding `review_count` reviews plus envelope noise."""
+    rng = random.Random(seed)
+    reviews: List[Dict[str, Any]] = [make_review(i, rng) for i in range(review_count)]
+    return {
+        'success': True,
+        'data': {
+            'shop': {'shop_id': 12345678, 'name': 'SolelyWhimsical', 'review_count': review_count * 10},
+            'reviews': reviews,
+            'pagination': {
+                'current_page': page,
+                'next_page_url': f'https://www.etsy.com/api/v3/ajax/bespoke/shop/reviews?shop_id=12345678&page={page + 1}',
+            },
+            'similar_listings': [make_decoy(i, rng) for i in range(max(4, review_count // 20))],
+        },
+        'tracking': {'events': [{'name': 'review_impression', 'id': i, 'ts': 1700000000 + i} for i in range(review_count)]},
+        'experiments': {f'exp_{i}': {'variant': rng.choice('ab')} for i in range(50)},
+    }
+
+
+def make_nested_payload(review_count: int, seed: int = 0) -> Dict[str, Any]:
+    """GraphQL-style page: camelCase reviews wrapped in edges/node, buried under layout blocks."""
+    rng = random.Random(seed)
+    edges = []
+    for index in range(review_count):
+        edges.append({
+            'cursor': f'c{index}',
+            'node': {
+                'reviewId': f'n{index}',
+                'reviewRating': rng.randint(1, 5),
+                'reviewText': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))).capitalize() + '.',
+                'createdAt': f'2024-{1 + index % 12:02d}-{1 + index % 28:02d}T10:00:00Z',
+                'author': {'display_name': f'buyer_{rng.randint(0, 5000)}', 'avatarUrl': None},
+                'product': {'title': f'Item {index % 300}', 'link': f'/listing/{index % 300}/item', 'imageUrl': None},
+                'helpfulVotes': rng.randint(0, 20),
+            },
+        })
+    return {
+        'data': {
+            'page': {
+                'layout': [{'type': 'banner', 'content': {'text': 'Free shipping over $35'}}] * 5,
+                'sections': [
+                    {'type': 'listings', 'items': [make_decoy(i, rng) for i in range(max(4, review_count // 20))]},
+                    {
+                        'type': 'reviews',
+                        'reviewConnection': {
+                            'edges': edges,
+                            'pageInfo': {
+                                'hasNextPage': True,
+                                'next_url': f'https://www.etsy.com/api/v3/graphql/reviews?shop_id=12345678&cursor=c{review_count}',
+                            },
+                        },
+                    },
+                ],
+            },
+        },
+    }
+
+
+def make_shop_page(review_count: int, seed: int = 0) -> str:
+    """Shop page HTML with review cards, a __NEXT_DATA__ copy and JSON-LD, shaped like fixtures/shop_reviews.html."""
+    rng = random.Random(seed)
+    names = ['Sarah Miller', 'Priya R.', 'Lena B.', 'Hannah W.', 'Amanda', 'Tomasz K.']
+    cards = []
+    next_data_reviews = []
+    jsonld_reviews = []
+    for index in range(review_count):
+        name = rng.choice(names)
+        rating = rng.randint(1, 5)
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))).capitalize() + '.'
+        cards.append(
+            f'<div class="wt-grid__item-xs-12 review-card" data-review-region="{index}">\n<div class="wt-mb-xs-4">\n'
+            f'<div class="wt-display-flex-xs"><img class="wt-circle" src="https://i.etsystatic.com/iusa/avatar{index}.jpg" alt="">\n'
+            f'<p class="wt-text-title-01">{name}</p>\n<p class="wt-text-caption wt-text-gray">Mar {1 + index % 28}, 2024</p></div>\n'
+            f'<span class="wt-screen-reader-only">{rating} out of 5 stars</span>\n'
+            f'<p class="wt-text-body-01 wt-break-word">{text}</p>\n'
+            f'<a class="wt-text-link-no-underline" href="/listing/{200000 + index}/item">'
+            f'<img src="https://i.etsystatic.com/il_75x75.{200000 + index}.jpg" alt=""><p class="wt-text-caption">Item {index}</p></a>\n'
+            f'</div></div>'
+        )
+        next_data_reviews.append({
+            'review_id': str(900 + index), 'buyer_name': name, 'rating': rating, 'review': text,
+            'created_at': 1709251200 + index * 86400,
+            'listing': {'title': f'Item {index}', 'url': f'/listing/{200000 + index}/item'},
+        })
+        jsonld_reviews.append({
+            '@type': 'Review', 'author': {'@type': 'Person', 'name': name},
+            'reviewRating': {'@type': 'Rating', 'ratingValue': rating}, 'reviewBody': text, 'datePublished': '2024-03-01',
+        })
+    jsonld = {'@context': 'https://schema.org', '@type': 'Organization', 'name': 'SolelyWhimsical', 'review': jsonld_reviews}
+    next_data = {'props': {'pageProps': {'shop': {'name': 'SolelyWhimsical'}, 'reviews': next_data_reviews}}}
+    return (
+        '<!DOCTYPE html>\n<html lang="en-US"><head><meta charset="utf-8"><title>SolelyWhimsical - Etsy</title>\n'
+        f'<script type="application/ld+json">{json.dumps(jsonld)}</script></head>\n<body><main>\n'
+        '<div id="reviews" data-reviews-container>\n' + '\n'.join(cards) + '\n'
+        '<nav aria-label="Pagination"><a href="?page=1#reviews">1</a><a aria-label="Next page" href="?page=2#reviews">Next</a></nav>\n'
+        f'</div></main>\n<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>\n</body></html>\n'
+    )
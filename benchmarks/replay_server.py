@@ -0,0 +1,346 @@
+"""
+Local Etsy stand-in server for offline end-to-end runs of the crawler.
+
+Two sources of responses:
+
+* replay (--archive PATH): serves a replay_archive recorded by the Actor with
+  "recordArchive" enabled (download it from the run's key-value store).
+  Responses are matched on path and query, and absolute Etsy URLs in bodies
+  are rewritten to point at this server.
+* synthetic (default): generates shop pages at /shop/<name>?page=N with a
+  Pagination nav, and a review API at /api/v3/ajax/bespoke/shop/reviews that
+  pages with page= or cursor= links. With --render api (default) the review
+  cards are rendered in the browser from the API response, so reviews reach
+  the crawler through its API path; with --render html they are
+  server-rendered cards with a __NEXT_DATA__ review count. Every shop has 40
+  listings; /listing/<id> serves the server-rendered reviews of one listing
+  once its shop has been visited, for the crawler's listing fan-out.
+
+Block pages are served on demand with ?block=captcha|denied|rate|bot on any
+URL, for every Nth document (--block-every) or at random (--block-rate), using
+the corpus in fixtures/blocks. GET /__stats returns request counters.
+
+Usage:
+    python -m benchmarks.replay_server [--port 8765] [--archive replay_archive.jsonl.gz]
+        [--reviews 240] [--page-size 24] [--api-pagination page|cursor] [--render api|html]
+        [--block-every N] [--block-rate P] [--latency-ms MS]
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from benchmarks.payloads import WORDS
+
+BLOCKS = Path(__file__).parent / 'fixtures' / 'blocks'
+BLOCK_PAGES = {
+    'captcha': ('datadome_captcha.html', 403, {'x-datadome': 'protected'}),
+    'denied': ('access_denied.html', 403, {}),
+    'rate': ('rate_limited.html', 429, {'retry-after': '5'}),
+    'bot': ('unusual_activity.html', 200, {}),
+}
+ETSY_ORIGIN = re.compile(r'https?://(?:www\.)?etsy\.com')
+REVIEWS_API_PATH = '/api/v3/ajax/bespoke/shop/reviews'
+LISTINGS_PER_SHOP = 40
+NAMES = ['Sarah Miller', 'Priya R.', 'Lena B.', 'Hannah W.', 'Amanda', 'Tomasz K.', 'Jo', 'Marcus']
+
+
+def request_key(url: str) -> str:
+    """Path plus sorted query, ignoring scheme, host and fragment."""
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return f'{parsed.path}?{query}' if query else parsed.path
+
+
+class Archive:
+    """Recorded responses indexed by request_key."""
+    
+    def __init__(self, path: Path):
+        self.entries: Dict[str, Dict] = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(request_key(entry['url']), entry)
+    
+    def lookup(self, url: str) -> Optional[Dict]:
+        return self.entries.get(request_key(url))
+
+
+class SyntheticShop:
+    """Deterministic review pages for any shop name."""
+    
+    def __init__(self, reviews: int, page_size: int, api_pagination: str, render: str):
+        self.reviews = reviews
+        self.page_size = page_size
+        self.api_pagination = api_pagination
+        self.render = render
+        self.listing_shops: Dict[int, str] = {}
+    
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.reviews // self.page_size))
+    
+    def listing_id(self, shop: str, index: int) -> int:
+        listing_id = 200000 + zlib.crc32(shop.encode()) % 10000 * LISTINGS_PER_SHOP + index % LISTINGS_PER_SHOP
+        self.listing_shops[listing_id] = shop
+        return listing_id
+    
+    def listing_reviews(self, listing_id: int) -> List[Dict]:
+        shop = self.listing_shops[listing_id]
+        first = (listing_id - 200000) % LISTINGS_PER_SHOP
+        return [self.review(shop, index) for index in range(first, self.reviews, LISTINGS_PER_SHOP)]
+    
+    def review(self, shop: str, index: int) -> Dict:
+        rng = random.Random(zlib.crc32(f'{shop}:{index}'.encode()))
+        return {
+            'review_id': f'{shop}-{index}',
+            'buyer': {'name': rng.choice(NAMES)},
+            'rating': rng.randint(1, 5),
+            'review': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))).capitalize() + '.',
+            'created_at': 1709251200 - index * 3600,
+            'listing': {
+                'title': f'Handmade item {index % LISTINGS_PER_SHOP}',
+                'url': f'/listing/{self.listing_id(shop, index)}/handmade-item',
+                'image_url': f'https://i.etsystatic.com/il_75x75.{self.listing_id(shop, index)}.jpg',
+            },
+        }
+    
+    def page_reviews(self, shop: str, page: int) -> List[Dict]:
+        start = (page - 1) * self.page_size
+        return [self.review(shop, index) for index in range(start, min(start + self.page_size, self.reviews))]
+    
+    def api_url(self, base: str, shop: str, page: int) -> str:
+        if self.api_pagination == 'cursor':
+            cursor = base64.urlsafe_b64encode(f'offset:{(page - 1) * self.page_size}'.encode()).decode()
+            return f'{base}{REVIEWS_API_PATH}?shop={shop}&cursor={cursor}'
+        return f'{base}{REVIEWS_API_PATH}?shop={shop}&page={page}'
+    
+    def api_page(self, base: str, query: Dict[str, str]) -> Dict:
+        shop = query.get('shop', 'shop')
+        if 'cursor' in query:
+            offset = int(base64.urlsafe_b64decode(query['cursor'].encode()).decode().split(':')[1])
+            page = offset // self.page_size + 1
+        else:
+            page = int(query.get('page', 1))
+        pagination = {'current_page': page, 'total_pages': self.pages, 'total_count': self.reviews}
+        if page < self.pages:
+            pagination['next_page_url'] = self.api_url(base, shop, page + 1)
+        return {'success': True, 'data': {'reviews': self.page_reviews(shop, page), 'pagination': pagination}}
+    
+    def nav(self, page: int, pages: int) -> str:
+        nav = ''.join(f'<a href="?page={n}#reviews">{n}</a>' for n in range(1, min(pages, 5) + 1))
+        if page < pages:
+            nav += f'<a aria-label="Next page" href="?page={page + 1}#reviews">Next</a>'
+        else:
+            nav += '<a aria-label="Next page" class="wt-is-disabled">Next</a>'
+        return f'<nav aria-label="Pagination">{nav}</nav>'
+    
+    def cards(self, reviews: List[Dict]) -> str:
+        return '\n'.join(
+            f'<div class="wt-grid__item-xs-12 review-card" data-review-region="{review["review_id"]}">'
+            f'<p class="wt-text-title-01">{review["buyer"]["name"]}</p>'
+            f'<p class="wt-text-caption wt-text-gray">Mar {1 + index % 28}, 2024</p>'
+            f'<span class="wt-screen-reader-only">{review["rating"]} out of 5 stars</span>'
+            f'<p class="wt-text-body-01 wt-break-word">{review["review"]}</p>'
+            f'<a class="wt-text-link-no-underline" href="{review["listing"]["url"]}">'
+            f'<p class="wt-text-caption">{review["listing"]["title"]}</p></a></div>'
+            for index, review in enumerate(reviews)
+        )
+    
+    def listing_document(self, listing_id: int, page: int) -> str:
+        reviews = self.listing_reviews(listing_id)
+        pages = max(1, -(-len(reviews) // self.page_size))
+        page = min(page, pages)
+        body = self.cards(reviews[(page - 1) * self.page_size:page * self.page_size])
+        return (
+            f'<!DOCTYPE html>\n<html lang="en-US"><head><meta charset="utf-8"><title>Listing {listing_id} - Etsy</title>'
+            '</head>\n<body><main>\n'
+            f'<div id="reviews" data-reviews-container>{body}</div>\n{self.nav(page, pages)}\n</main></body></html>\n'
+        )
+    
+    def document(self, base: str, shop: str, page: int) -> str:
+        reviews = self.page_reviews(shop, page)
+        if self.render == 'html':
+            body = self.cards(reviews)
+            script = ''
+        else:
+            # Cards built from the API response carry no markup the HTML extractor understands,
+            # so every review reaches the crawler exactly once, through the API collector
+            body = ''
+            script = (
+                f'<script>fetch({json.dumps(self.api_url("", shop, page))}).then(r => r.json()).then(p => {{'
+                'const box = document.getElementById("reviews");'
+                'for (const r of p.data.reviews) { const d = document.createElement("div");'
+                'd.setAttribute("data-review-id", r.review_id); d.textContent = r.review; box.appendChild(d); }'
+                '});</script>'
+            )
+        next_data = {'props': {'pageProps': {
+            'shop': {'name': shop, 'reviewCount': self.reviews},
+            'pagination': {'currentPage': page, 'totalPages': self.pages, 'pageSize': self.page_size},
+        }}}
+        return (
+            f'<!DOCTYPE html>\n<html lang="en-US"><head><meta charset="utf-8"><title>{shop} - Etsy</title>'
+            '<link rel="preconnect" href="https://i.etsystatic.com"></head>\n<body><main>\n'
+            f'<div id="reviews" data-reviews-container>{body}</div>\n'
+            f'{self.nav(page, self.pages)}\n</main>\n'
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>\n'
+            f'{script}</body></html>\n'
+        )
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address: Tuple[str, int], archive: Optional[Archive], shop: SyntheticShop,
+                 block_every: int = 0, block_rate: float = 0.0, latency_ms: float = 0.0, seed: int = 0):
+        super().__init__(address, ReplayHandler)
+        self.archive = archive
+        self.shop = shop
+        self.block_every = block_every
+        self.block_rate = block_rate
+        self.latency_ms = latency_ms
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = {'documents': 0, 'api': 0, 'blocked': 0, 'missing': 0}
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def count(self, name: str) -> int:
+        with self.lock:
+            self.counters[name] += 1
+            return self.counters[name]
+    
+    def block_for(self, query: Dict[str, str], document_number: int) -> Optional[str]:
+        if query.get('block') in BLOCK_PAGES:
+            return query['block']
+        if self.block_every and document_number % self.block_every == 0:
+            return 'captcha'
+        with self.lock:
+            if self.block_rate and self.rng.random() < self.block_rate:
+                return 'captcha'
+        return None
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    server: ReplayServer
+    
+    def log_message(self, format: str, *args) -> None:
+        pass
+    
+    def send_body(self, status: int, content_type: str, body: str, headers: Optional[Dict[str, str]] = None) -> None:
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', content_type)
+        self.send_header('content-length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_GET(self) -> None:
+        server = self.server
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+        parsed = urlparse(self.path)
+        query = dict(parse_qsl(parsed.query))
+        
+        if parsed.path == '/__stats':
+            self.send_body(200, 'application/json', json.dumps(server.counters))
+            return
+        
+        is_api = parsed.path.startswith('/api/')
+        document_number = server.count('api' if is_api else 'documents')
+        block = None if is_api else server.block_for(query, document_number)
+        if block:
+            server.count('blocked')
+            filename, status, headers = BLOCK_PAGES[block]
+            self.send_body(status, 'text/html; charset=utf-8', (BLOCKS / filename).read_text(encoding='utf-8'), headers)
+            return
+        
+        if server.archive:
+            entry = server.archive.lookup(self.path)
+            if entry is None:
+                server.count('missing')
+                self.send_body(404, 'text/plain', 'not recorded')
+                return
+            body = ETSY_ORIGIN.sub(server.base_url, entry['body'])
+            self.send_body(entry['status'], entry['contentType'] or 'text/html', body)
+            return
+        
+        if parsed.path == REVIEWS_API_PATH:
+            payload = server.shop.api_page(server.base_url, query)
+            self.send_body(200, 'application/json', json.dumps(payload))
+            return
+        
+        match = re.match(r'^/(?:[a-z]{2}/)?shop/([^/?#]+)', parsed.path)
+        if match:
+            page = max(1, min(int(query.get('page', 1)), server.shop.pages))
+            self.send_body(200, 'text/html; charset=utf-8', server.shop.document(server.base_url, match.group(1), page))
+            return
+        
+        match = re.match(r'^/(?:[a-z]{2}/)?listing/(\d+)', parsed.path)
+        if match and int(match.group(1)) in server.shop.listing_shops:
+            page = max(1, int(query.get('page', 1)))
+            self.send_body(200, 'text/html; charset=utf-8', server.shop.listing_document(int(match.group(1)), page))
+            return
+        
+        server.count('missing')
+        self.send_body(404, 'text/plain', 'not found')
+
+
+def start_server(port: int = 0, archive: Optional[Path] = None, reviews: int = 240, page_size: int = 24,
+                 api_pagination: str = 'page', render: str = 'api', block_every: int = 0,
+                 block_rate: float = 0.0, latency_ms: float = 0.0) -> ReplayServer:
+    """Start a server on a background thread; port 0 picks a free port."""
+    server = ReplayServer(
+        ('127.0.0.1', port),
+        Archive(archive) if archive else None,
+        SyntheticShop(reviews, page_size, api_pagination, render),
+        block_every=block_every,
+        block_rate=block_rate,
+        latency_ms=latency_ms,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--archive', type=Path, help='replay a recorded archive instead of synthetic shops')
+    parser.add_argument('--reviews', type=int, default=240, help='reviews per synthetic shop')
+    parser.add_argument('--page-size', type=int, default=24)
+    parser.add_argument('--api-pagination', choices=['page', 'cursor'], default='page')
+    parser.add_argument('--render', choices=['api', 'html'], default='api')
+    parser.add_argument('--block-every', type=int, default=0, help='serve a captcha for every Nth document')
+    parser.add_argument('--block-rate', type=float, default=0.0, help='serve a captcha for this share of documents')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    
+    server = start_server(args.port, args.archive, args.reviews, args.page_size, args.api_pagination,
+                          args.render, args.block_every, args.block_rate, args.latency_ms)
+    source = f'archive {args.archive}' if args.archive else f'synthetic shops with {args.reviews} reviews'
+    print(f'Serving {source} on {server.base_url} (try {server.base_url}/shop/DemoShop#reviews)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
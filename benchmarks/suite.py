@@ -0,0 +1,221 @@
+"""
+Offline extraction benchmark suite.
+
+Times every extractor and the full extraction-plus-merge pipeline on the saved
+HTML fixtures, on generated shop pages and on generated API payloads from 10 to
+100k reviews (flat Etsy-style pages and GraphQL-style nested pages, both with
+decoy objects). Each case reports the median and min time over several rounds
+and the peak traced memory of a separate run, so memory tracing never skews the
+timings. Nothing touches the network.
+
+Regression mode compares a run against a saved baseline and exits with status 1
+when any case is slower (or uses more memory) than the baseline by more than the
+threshold factor:
+
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json   # on the last good build
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 1.25
+
+Usage:
+    python -m benchmarks.suite [--quick] [--filter SUBSTRING] [--rounds N] [--json PATH]
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.payloads import make_nested_payload, make_review_payload, make_shop_page
+from src.main import (
+    ExtractionDocument,
+    extract_reviews_and_next_urls,
+    extract_reviews_from_any,
+    extract_reviews_from_html,
+    extract_reviews_from_jsonld,
+    extract_reviews_from_next_data,
+    find_next_page_urls,
+    merge_reviews,
+    normalize_review,
+)
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+HTML_FIXTURES = [FIXTURES / 'shop_reviews.html', FIXTURES / 'blocks' / 'shop_trap_words.html']
+PAYLOAD_SIZES = [10, 100, 1_000, 10_000, 100_000]
+PAGE_SIZES = [10, 100, 1_000]
+QUICK_PAYLOAD_SIZES = [10, 100, 1_000]
+QUICK_PAGE_SIZES = [10, 100]
+
+# A case is (name, setup, run): setup builds fresh untimed input, run is the measured call
+Case = Tuple[str, Callable[[], Any], Callable[[Any], Any]]
+
+
+def size_label(size: int) -> str:
+    return f'{size // 1000}k' if size >= 1000 else str(size)
+
+
+def parsed(html: str) -> Callable[[], ExtractionDocument]:
+    """Setup returning a freshly parsed document, so cached extractor results never leak between rounds."""
+    def setup() -> ExtractionDocument:
+        document = ExtractionDocument(html)
+        document.soup
+        return document
+    return setup
+
+
+def raw_reviews(payload: Dict, nested: bool) -> List[Dict]:
+    if nested:
+        section = payload['data']['page']['sections'][1]
+        return [edge['node'] for edge in section['reviewConnection']['edges']]
+    return payload['data']['reviews']
+
+
+def html_cases(label: str, html: str, payload: Dict) -> List[Case]:
+    def pipeline(_: Any) -> int:
+        document = ExtractionDocument(html)
+        api_reviews, _next_urls = extract_reviews_and_next_urls(payload)
+        return len(merge_reviews(
+            api_reviews,
+            extract_reviews_from_next_data(document),
+            extract_reviews_from_jsonld(document),
+            extract_reviews_from_html(document),
+        ))
+    
+    def extracted() -> List[List[Dict]]:
+        document = parsed(html)()
+        return [
+            extract_reviews_from_next_data(document),
+            extract_reviews_from_jsonld(document),
+            extract_reviews_from_html(document),
+        ]
+    
+    return [
+        (f'html.{label}.parse', lambda: html, lambda source: ExtractionDocument(source).soup),
+        (f'html.{label}.next_data', parsed(html), extract_reviews_from_next_data),
+        (f'html.{label}.jsonld', parsed(html), extract_reviews_from_jsonld),
+        (f'html.{label}.html', parsed(html), extract_reviews_from_html),
+        (f'html.{label}.merge', extracted, lambda lists: merge_reviews(*lists)),
+        (f'html.{label}.pipeline', lambda: None, pipeline),
+    ]
+
+
+def payload_cases(label: str, payload: Dict, nested: bool) -> List[Case]:
+    reviews = raw_reviews(payload, nested)
+    
+    def normalize_all(items: List[Dict]) -> int:
+        return sum(1 for item in items if normalize_review(item))
+    
+    def merge_with_duplicates() -> List[List[Dict]]:
+        found = extract_reviews_from_any(payload)
+        return [found, found[: len(found) // 2]]
+    
+    return [
+        (f'json.{label}.extract_reviews_from_any', lambda: payload, extract_reviews_from_any),
+        (f'json.{label}.find_next_page_urls', lambda: payload, find_next_page_urls),
+        (f'json.{label}.normalize_review', lambda: reviews, normalize_all),
+        (f'json.{label}.merge', merge_with_duplicates, lambda lists: merge_reviews(*lists)),
+    ]
+
+
+def build_cases(payload_sizes: List[int], page_sizes: List[int]) -> List[Case]:
+    cases: List[Case] = []
+    for fixture in HTML_FIXTURES:
+        cases += html_cases(fixture.stem, fixture.read_text(encoding='utf-8'), make_review_payload(20))
+    for size in page_sizes:
+        cases += html_cases(f'generated_{size_label(size)}', make_shop_page(size), make_review_payload(size))
+    for size in payload_sizes:
+        cases += payload_cases(f'flat_{size_label(size)}', make_review_payload(size), nested=False)
+        cases += payload_cases(f'nested_{size_label(size)}', make_nested_payload(size), nested=True)
+    return cases
+
+
+def measure(setup: Callable[[], Any], run: Callable[[Any], Any], rounds: int) -> Dict[str, float]:
+    run(setup())  # warm caches (key plans, regexes) the way a long crawl would
+    timings = []
+    for _ in range(rounds):
+        value = setup()
+        gc.collect()
+        started = time.perf_counter()
+        run(value)
+        timings.append((time.perf_counter() - started) * 1000)
+    
+    value = setup()
+    gc.collect()
+    tracemalloc.start()
+    run(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'medianMs': round(statistics.median(timings), 3),
+        'minMs': round(min(timings), 3),
+        'peakKiB': round(peak / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float, min_ms: float) -> List[str]:
+    """List cases that regressed beyond the threshold.
+    
+    Timings are compared on the best round, which is far less noisy than the
+    median on a shared machine; cases faster than min_ms are ignored.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['minMs'] >= min_ms and current['minMs'] > previous['minMs'] * threshold:
+            regressions.append(f'{name}: {previous["minMs"]} ms -> {current["minMs"]} ms (best round)')
+        if current['peakKiB'] > max(previous['peakKiB'] * threshold, previous['peakKiB'] + 64):
+            regressions.append(f'{name}: {previous["peakKiB"]} KiB -> {current["peakKiB"]} KiB peak')
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='skip the 10k and 100k payloads and the largest page')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--json', type=Path, help='write results to this file')
+    parser.add_argument('--save-baseline', type=Path, help='write results as a baseline for later comparison')
+    parser.add_argument('--baseline', type=Path, help='compare against a saved baseline and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown factor in regression mode')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='ignore timing regressions in cases faster than this')
+    args = parser.parse_args()
+    
+    payload_sizes = QUICK_PAYLOAD_SIZES if args.quick else PAYLOAD_SIZES
+    page_sizes = QUICK_PAGE_SIZES if args.quick else PAGE_SIZES
+    
+    results: Dict[str, Dict] = {}
+    print(f'{"case":58} {"median ms":>11} {"min ms":>11} {"peak KiB":>11}')
+    for name, setup, run in build_cases(payload_sizes, page_sizes):
+        if args.filter not in name:
+            continue
+        # Large payloads take seconds per round; a few rounds are enough for a stable median
+        rounds = args.rounds if '100k' not in name and '10k' not in name else max(3, args.rounds // 2)
+        results[name] = measure(setup, run, rounds)
+        result = results[name]
+        print(f'{name:58} {result["medianMs"]:11.3f} {result["minMs"]:11.3f} {result["peakKiB"]:11.1f}')
+    
+    output = {'python': sys.version.split()[0], 'results': results}
+    for path in (args.json, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(output, indent=2) + '\n', encoding='utf-8')
+            print(f'Wrote {path}')
+    
+    if args.baseline:
+        baseline: Optional[Dict] = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare(results, baseline['results'], args.threshold, args.min_ms)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.threshold}x:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print(f'\nNo regressions beyond {args.threshold}x against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
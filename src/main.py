@@ -4,18 +4,43 @@ Uses PlaywrightCrawler with Camoufox for anti-bot evasion
 """
 
 import asyncio
+import cProfile
+import csv
+import gzip
+import hashlib
+import io
 import json
+import math
+import multiprocessing
+import os
+import pstats
 import re
+import shutil
+import struct
+import threading
 import time
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Set
-from urllib.parse import urlparse
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 
-from apify import Actor
+from apify import Actor, Configuration, Event
+from apify.storage_clients import ApifyStorageClient
 from camoufox import AsyncNewBrowser
-from bs4 import BeautifulSoup
-from crawlee.browsers import BrowserPool, PlaywrightBrowserController, PlaywrightBrowserPlugin
+from bs4 import BeautifulSoup, Tag
+from crawlee import ConcurrencySettings, Request
+from crawlee.browsers import BrowserPool, CrawleePage, PlaywrightBrowserController, PlaywrightBrowserPlugin
 from crawlee.crawlers import PlaywrightCrawler, PlaywrightCrawlingContext
+from crawlee.errors import SessionError
+from crawlee.http_clients import HttpClient, ImpitHttpClient
+from crawlee.proxy_configuration import ProxyInfo
+from crawlee.sessions import Session, SessionPool
+from crawlee.storage_clients import FileSystemStorageClient
+from crawlee.storages import Dataset, KeyValueStore, RequestQueue
 from typing_extensions import override
 
 
@@ -29,11 +54,97 @@ class CamoufoxPlugin(PlaywrightBrowserPlugin):
 
         return PlaywrightBrowserController(
             browser=await AsyncNewBrowser(self._playwright, headless=True),
-            max_open_pages_per_browser=1,
+            max_open_pages_per_browser=self.max_open_pages_per_browser,
             header_generator=None,  # Camoufox handles headers
         )
 
 
+class SessionBrowserPool(BrowserPool):
+    """Browser pool that keeps a few warm browsers, each bound to one proxy session.
+
+    Pages for a session reuse that session's browser (and with it the cookies and
+    fingerprint that already passed Etsy's checks); a new browser is launched only
+    for a session that has none. Browsers of blocked sessions are retired at once.
+    """
+
+    def __init__(self, *args: Any, warm_browsers: int = 2, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.warm_browsers = max(1, warm_browsers)
+        self._browser_sessions: Dict[PlaywrightBrowserController, Optional[str]] = {}
+        self._page_sessions: Dict[str, Optional[str]] = {}
+        self._wanted_session: Optional[str] = None
+        self.launches = 0
+        self.launch_secs: List[float] = []
+        self.warm_pages = 0
+        self.retired_on_block = 0
+
+    @override
+    async def _get_new_page(
+        self, page_id: str, plugin: PlaywrightBrowserPlugin, proxy_info: Optional[ProxyInfo]
+    ) -> CrawleePage:
+        session_id = proxy_info.session_id if proxy_info else None
+        self._page_sessions[page_id] = session_id
+        # Read synchronously by _pick_browser_with_free_capacity before the first await
+        self._wanted_session = session_id
+        try:
+            return await super()._get_new_page(page_id, plugin, proxy_info)
+        finally:
+            self._page_sessions.pop(page_id, None)
+
+    @override
+    def _pick_browser_with_free_capacity(
+        self, browser_plugin: PlaywrightBrowserPlugin
+    ) -> Optional[PlaywrightBrowserController]:
+        for browser in self._active_browsers:
+            if (
+                self._browser_sessions.get(browser) == self._wanted_session
+                and browser.has_free_capacity
+                and browser.AUTOMATION_LIBRARY == browser_plugin.AUTOMATION_LIBRARY
+            ):
+                self.warm_pages += 1
+                return browser
+        return None
+
+    @override
+    async def _launch_new_browser(self, page_id: str, plugin: PlaywrightBrowserPlugin) -> PlaywrightBrowserController:
+        # Make room by retiring the longest-idle warm browser of another session
+        idle = [browser for browser in self._active_browsers if not browser.pages and not browser.is_opening_pages]
+        if len(self._active_browsers) >= self.warm_browsers and idle:
+            self._retire_browser(max(idle, key=lambda browser: browser.idle_time))
+
+        started = time.monotonic()
+        browser = await super()._launch_new_browser(page_id, plugin)
+        self.launch_secs.append(time.monotonic() - started)
+        self.launches += 1
+        self._browser_sessions[browser] = self._page_sessions.get(page_id)
+        return browser
+
+    @override
+    def _retire_browser(self, browser: PlaywrightBrowserController) -> None:
+        super()._retire_browser(browser)
+        self._browser_sessions.pop(browser, None)
+
+    def retire_session(self, session_id: Optional[str]) -> None:
+        """Retire every browser bound to a session that got blocked."""
+        for browser, bound_session in list(self._browser_sessions.items()):
+            if bound_session == session_id:
+                self._retire_browser(browser)
+                self.retired_on_block += 1
+
+    def statistics(self) -> Dict:
+        mean_launch_secs = sum(self.launch_secs) / len(self.launch_secs) if self.launch_secs else 0.0
+        return {
+            'browserLaunches': self.launches,
+            'warmPageReuses': self.warm_pages,
+            'retiredOnBlock': self.retired_on_block,
+            'launchSecs': {
+                'mean': round(mean_launch_secs, 2),
+                'p95': round(percentile(self.launch_secs, 95), 2),
+            },
+            'estimatedColdStartSecsSaved': round(self.warm_pages * mean_launch_secs, 1),
+        }
+
+
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
@@ -79,6 +190,35 @@ def parse_date_value(value: Any) -> str:
     return normalize_text(value)
 
 
+REVIEW_DATE_FORMATS = ('%b %d, %Y', '%B %d, %Y', '%d %b, %Y', '%d %B, %Y', '%d %b %Y', '%d %B %Y', '%m/%d/%Y')
+
+
+def review_date_key(value: str) -> str:
+    """Sortable YYYY-MM-DD form of a review date (ISO or as Etsy shows it); '' if it does not parse."""
+    text = normalize_text(value or '')
+    if not text:
+        return ''
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).date().isoformat()
+    except ValueError:
+        pass
+    for date_format in REVIEW_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return ''
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
 def get_first_value(obj: Dict, keys: List[str]) -> Any:
     """Get first available value from object by key priority."""
     if not isinstance(obj, dict):
@@ -99,52 +239,139 @@ def get_first_value(obj: Dict, keys: List[str]) -> Any:
     return None
 
 
+# Alias lists per output field, in priority order (see get_first_value)
+REVIEW_FIELDS: Dict[str, List[str]] = {
+    'user': ['user', 'buyer', 'reviewer', 'author', 'member', 'profile'],
+    'listing': ['listing', 'item', 'product'],
+    'username': ['user_name', 'username', 'reviewer', 'reviewer_name', 'buyer_name', 'author', 'name'],
+    'rating': ['rating', 'stars', 'star_rating', 'review_rating', 'reviewRating', 'rating_value', 'score'],
+    'comment': ['review', 'review_text', 'reviewText', 'comment', 'feedback', 'message', 'text', 'body', 'content'],
+    'date': ['date', 'created_at', 'createdAt', 'created', 'review_date', 'timestamp', 'time'],
+    'item_title': ['listing_title', 'item_title', 'title', 'product_title'],
+    'item_url': ['listing_url', 'item_url', 'url', 'link'],
+    'item_image': ['listing_image', 'item_image', 'image_url', 'image', 'img', 'imageUrl'],
+    'review_id': ['review_id', 'reviewId', 'id', 'transaction_id', 'transactionId'],
+}
+
+USER_FIELDS: Dict[str, List[str]] = {
+    'username': ['name', 'username', 'login', 'user_name', 'display_name'],
+}
+
+LISTING_FIELDS: Dict[str, List[str]] = {
+    'item_title': ['title', 'name', 'listing_title'],
+    'item_url': ['url', 'link', 'listing_url'],
+    'item_image': ['image', 'image_url', 'imageUrl'],
+}
+
+KEY_PLAN_CACHE_SIZE = 2048
+
+
+class KeyResolver:
+    """Resolve field aliases through lookup plans compiled once per object key-set."""
+    
+    def __init__(self, maxsize: int = KEY_PLAN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.plans: OrderedDict = OrderedDict()
+        # Extraction threads share the cache; an eviction between get() and move_to_end() raises KeyError
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Largest plan cache of the extraction worker processes, which keep their own
+        self.worker_shapes = 0
+    
+    @staticmethod
+    def compile(keys: Tuple[str, ...], fields: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+        """Candidate keys per field in the order get_first_value would try them."""
+        key_set = set(keys)
+        lower_key_map = {k.lower(): k for k in keys}
+        plan = {}
+        for name, aliases in fields.items():
+            candidates = [alias for alias in aliases if alias in key_set]
+            candidates += [lower_key_map[alias.lower()] for alias in aliases if alias.lower() in lower_key_map]
+            plan[name] = tuple(dict.fromkeys(candidates))
+        return plan
+    
+    def plan_for(self, obj: Dict, fields: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+        shape = (id(fields), tuple(obj))
+        with self.lock:
+            plan = self.plans.get(shape)
+            if plan is not None:
+                self.hits += 1
+                self.plans.move_to_end(shape)
+                return plan
+            self.misses += 1
+        
+        plan = self.compile(shape[1], fields)
+        with self.lock:
+            self.plans[shape] = plan
+            if len(self.plans) > self.maxsize:
+                self.plans.popitem(last=False)
+        return plan
+    
+    def resolve(self, obj: Any, fields: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Return the first non-None value per field, like get_first_value for every field at once."""
+        if not isinstance(obj, dict):
+            return dict.fromkeys(fields)
+        
+        values = {}
+        for name, candidates in self.plan_for(obj, fields).items():
+            value = None
+            for key in candidates:
+                value = obj[key]
+                if value is not None:
+                    break
+            values[name] = value
+        return values
+    
+    def add_worker_counts(self, counts: Dict[str, int]) -> None:
+        """Fold in the lookups of a job run in a worker process (see run_with_counters)."""
+        with self.lock:
+            self.hits += counts['hits']
+            self.misses += counts['misses']
+            self.worker_shapes = max(self.worker_shapes, counts['cachedShapes'])
+    
+    def statistics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cachedShapes': max(len(self.plans), self.worker_shapes),
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+key_resolver = KeyResolver()
+
+
 def normalize_review(raw: Dict, source_url: str = '') -> Optional[Dict]:
     """Normalize a raw review object to standard format."""
     if not isinstance(raw, dict):
         return None
     
-    user_obj = get_first_value(raw, ['user', 'buyer', 'reviewer', 'author', 'member', 'profile'])
-    listing_obj = get_first_value(raw, ['listing', 'item', 'product'])
+    fields = key_resolver.resolve(raw, REVIEW_FIELDS)
+    user_obj = fields['user']
+    listing_obj = fields['listing']
+    user_fields = key_resolver.resolve(user_obj, USER_FIELDS) if isinstance(user_obj, dict) else {}
+    listing_fields = key_resolver.resolve(listing_obj, LISTING_FIELDS) if isinstance(listing_obj, dict) else {}
     
-    username = normalize_text(
-        get_first_value(raw, ['user_name', 'username', 'reviewer', 'reviewer_name', 'buyer_name', 'author', 'name'])
-        or (get_first_value(user_obj, ['name', 'username', 'login', 'user_name', 'display_name']) if isinstance(user_obj, dict) else None)
-    )
+    username = normalize_text(fields['username'] or user_fields.get('username'))
     
-    rating = parse_rating_value(
-        get_first_value(raw, ['rating', 'stars', 'star_rating', 'review_rating', 'reviewRating', 'rating_value', 'score'])
-    )
+    rating = parse_rating_value(fields['rating'])
     
-    comment = normalize_text(
-        get_first_value(raw, ['review', 'review_text', 'reviewText', 'comment', 'feedback', 'message', 'text', 'body', 'content'])
-    )
+    comment = normalize_text(fields['comment'])
     
-    date_text = parse_date_value(
-        get_first_value(raw, ['date', 'created_at', 'createdAt', 'created', 'review_date', 'timestamp', 'time'])
-    )
+    date_text = parse_date_value(fields['date'])
     
-    item_title = normalize_text(
-        get_first_value(raw, ['listing_title', 'item_title', 'title', 'product_title'])
-        or (get_first_value(listing_obj, ['title', 'name', 'listing_title']) if isinstance(listing_obj, dict) else None)
-    )
+    item_title = normalize_text(fields['item_title'] or listing_fields.get('item_title'))
     
-    item_url = normalize_text(
-        get_first_value(raw, ['listing_url', 'item_url', 'url', 'link'])
-        or (get_first_value(listing_obj, ['url', 'link', 'listing_url']) if isinstance(listing_obj, dict) else None)
-    )
+    item_url = normalize_text(fields['item_url'] or listing_fields.get('item_url'))
     
     if item_url and item_url.startswith('/'):
         item_url = f'https://www.etsy.com{item_url}'
     
-    item_image = normalize_text(
-        get_first_value(raw, ['listing_image', 'item_image', 'image_url', 'image', 'img', 'imageUrl'])
-        or (get_first_value(listing_obj, ['image', 'image_url', 'imageUrl']) if isinstance(listing_obj, dict) else None)
-    )
+    item_image = normalize_text(fields['item_image'] or listing_fields.get('item_image'))
     
-    review_id = normalize_text(
-        get_first_value(raw, ['review_id', 'reviewId', 'id', 'transaction_id', 'transactionId'])
-    )
+    review_id = normalize_text(fields['review_id'])
     
     # Skip empty reviews
     if not comment and rating is None:
@@ -164,29 +391,39 @@ def normalize_review(raw: Dict, source_url: str = '') -> Optional[Dict]:
     }
 
 
+REVIEW_FIELD_PATTERN = re.compile(r'review|rating|comment|feedback', re.IGNORECASE)
+URL_PATTERN = re.compile(r'^https?://', re.IGNORECASE)
+PAGINATION_MARKERS = ('page=', 'offset=', 'cursor=')
+
+# Subtrees that never hold reviews or pagination links; skipping them keeps walks short
+SKIPPED_SUBTREE_KEYS = frozenset({
+    'images', 'image', 'img', 'photos', 'thumbnails', 'srcset', 'icons',
+    'translations', 'i18n', 'l10n', 'locales', 'strings',
+    'tracking', 'analytics', 'beacon', 'beacons', 'experiments', 'feature_flags', 'featureflags',
+})
+
+
+@lru_cache(maxsize=4096)
+def _shape_has_review_fields(keys: Tuple[str, ...]) -> bool:
+    return REVIEW_FIELD_PATTERN.search('\n'.join(keys)) is not None
+
+
 def has_potential_review_fields(obj: Any) -> bool:
     """Check if object might contain review data."""
     if not isinstance(obj, dict):
         return False
-    
-    keys = [k.lower() for k in obj.keys()]
-    return any(
-        k.find(field) >= 0 for k in keys 
-        for field in ['review', 'rating', 'comment', 'feedback']
-    )
+    return _shape_has_review_fields(tuple(obj))
 
 
-def extract_reviews_from_any(payload: Any, source_url: str = '') -> List[Dict]:
-    """Recursively extract reviews from any JSON structure."""
-    results = []
-    visited = set()
+def walk_payload(payload: Any, source_url: str = '', collect_reviews: bool = True) -> Iterator[Tuple[str, Any]]:
+    """Walk a JSON payload once, yielding ('review', dict) and ('next', url) items."""
+    visited: Set[int] = set()
+    tried: Set[int] = set()
+    next_urls: Set[str] = set()
     stack = [payload]
     
     while stack:
         node = stack.pop()
-        if not isinstance(node, (dict, list)):
-            continue
-        
         node_id = id(node)
         if node_id in visited:
             continue
@@ -195,71 +432,416 @@ def extract_reviews_from_any(payload: Any, source_url: str = '') -> List[Dict]:
         if isinstance(node, list):
             for item in node:
                 if isinstance(item, dict):
-                    review = normalize_review(item, source_url)
-                    if review:
-                        results.append(review)
-                stack.append(item)
+                    # Every dict in a list is a review candidate
+                    if collect_reviews:
+                        tried.add(id(item))
+                        review = normalize_review(item, source_url)
+                        if review:
+                            yield 'review', review
+                    stack.append(item)
+                elif isinstance(item, list):
+                    stack.append(item)
             continue
         
-        if has_potential_review_fields(node):
+        if collect_reviews and node_id not in tried and has_potential_review_fields(node):
             review = normalize_review(node, source_url)
             if review:
-                results.append(review)
+                yield 'review', review
         
-        for value in node.values():
-            stack.append(value)
-    
-    return results
+        for key, value in node.items():
+            if isinstance(value, str):
+                if (URL_PATTERN.match(value) and value not in next_urls
+                        and ('next' in key.lower() or any(marker in value for marker in PAGINATION_MARKERS))):
+                    next_urls.add(value)
+                    yield 'next', value
+            elif isinstance(value, (dict, list)) and value and key.lower() not in SKIPPED_SUBTREE_KEYS:
+                stack.append(value)
+
+
+def extract_reviews_and_next_urls(payload: Any, source_url: str = '') -> Tuple[List[Dict], List[str]]:
+    """Collect reviews and pagination URLs from a payload in a single walk."""
+    reviews: List[Dict] = []
+    next_urls: List[str] = []
+    for kind, value in walk_payload(payload, source_url):
+        if kind == 'review':
+            reviews.append(value)
+        else:
+            next_urls.append(value)
+    return reviews, next_urls
+
+
+def extract_reviews_from_any(payload: Any, source_url: str = '') -> List[Dict]:
+    """Recursively extract reviews from any JSON structure."""
+    return [value for kind, value in walk_payload(payload, source_url) if kind == 'review']
 
 
 def find_next_page_urls(payload: Any) -> List[str]:
     """Extract pagination URLs from JSON payload."""
-    urls: Set[str] = set()
-    visited: Set[int] = set()
-    stack = [payload]
-    url_regex = re.compile(r'^https?://', re.IGNORECASE)
+    return [value for _, value in walk_payload(payload, collect_reviews=False)]
+
+
+# =============================================================================
+# INSTRUMENTATION
+# =============================================================================
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+
+class StageTimer:
+    """Wall-clock spans per pipeline stage, plus review yields per source and bytes handled."""
     
-    while stack:
-        node = stack.pop()
-        if not isinstance(node, (dict, list)):
-            continue
-        
-        node_id = id(node)
-        if node_id in visited:
-            continue
-        visited.add(node_id)
-        
-        if isinstance(node, list):
-            for item in node:
-                stack.append(item)
-            continue
-        
-        for key, value in node.items():
-            if isinstance(value, str):
-                if url_regex.match(value) and any(p in value for p in ['page=', 'offset=', 'cursor=']):
-                    urls.add(value)
-                if 'next' in key.lower() and url_regex.match(value):
-                    urls.add(value)
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+        self.yields: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+    
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+    
+    def record(self, stage: str, seconds: float) -> None:
+        self.durations.setdefault(stage, []).append(seconds * 1000)
+    
+    def add_yield(self, source: str, count: int) -> None:
+        self.yields[source] = self.yields.get(source, 0) + count
+    
+    def add_bytes(self, kind: str, size: int) -> None:
+        self.bytes[kind] = self.bytes.get(kind, 0) + size
+    
+    def statistics(self) -> Dict:
+        return {
+            'stages': {
+                stage: {
+                    'count': len(timings),
+                    'totalMs': round(sum(timings), 1),
+                    'p50Ms': round(percentile(timings, 50), 2),
+                    'p95Ms': round(percentile(timings, 95), 2),
+                    'maxMs': round(max(timings), 2),
+                }
+                for stage, timings in self.durations.items()
+            },
+            'reviewsBySource': self.yields,
+            'bytes': self.bytes,
+        }
+
+
+stage_timer = StageTimer()
+
+
+class ExtractionProfiler:
+    """Profile the synchronous extraction code across pages.
+    
+    Uses pyinstrument's sampling profiler when it is installed and falls back
+    to cProfile otherwise.
+    """
+    
+    def __init__(self):
+        self.sampling = SamplingProfiler is not None
+        self.profiler = SamplingProfiler(interval=0.0005, async_mode='disabled') if self.sampling else cProfile.Profile()
+        self.runs = 0
+    
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        if self.sampling:
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.sampling:
+                self.profiler.stop()
             else:
-                stack.append(value)
+                self.profiler.disable()
+            self.runs += 1
+    
+    async def save(self, store_key: str = 'extraction_profile') -> None:
+        """Store the report in the default key-value store (HTML and text for pyinstrument, text for cProfile)."""
+        if not self.runs:
+            return
+        if self.sampling:
+            await Actor.set_value(f'{store_key}.html', self.profiler.output_html(), content_type='text/html')
+            await Actor.set_value(f'{store_key}.txt', self.profiler.output_text(unicode=True), content_type='text/plain')
+        else:
+            output = io.StringIO()
+            pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(60)
+            await Actor.set_value(f'{store_key}.txt', output.getvalue(), content_type='text/plain')
+
+
+# =============================================================================
+# RECORDING
+# =============================================================================
+
+RECORD_MAX_BYTES = 256 * 1024 * 1024
+RECORD_ARCHIVE_KEY = 'replay_archive'
+
+
+class ResponseRecorder:
+    """Capture page documents and review API responses for offline replay.
+    
+    The archive is gzipped JSON lines, one response per line, and is what
+    benchmarks/replay_server.py serves back on localhost.
+    """
+    
+    def __init__(self, max_bytes: int = RECORD_MAX_BYTES):
+        self.enabled = False
+        self.max_bytes = max_bytes
+        self.entries: Dict[str, Dict] = {}
+        self.size = 0
+        self.dropped = 0
+    
+    def record(self, url: str, status: int, content_type: str, body: bytes, kind: str) -> None:
+        """Keep the first response seen for each URL while under the size cap."""
+        if not self.enabled or url in self.entries:
+            return
+        if self.size + len(body) > self.max_bytes:
+            self.dropped += 1
+            return
+        self.size += len(body)
+        self.entries[url] = {
+            'url': url,
+            'kind': kind,
+            'status': status,
+            'contentType': content_type,
+            'body': body.decode('utf-8', errors='replace'),
+        }
+    
+    async def record_document(self, response) -> None:
+        """Record a page's main document from its Playwright navigation response."""
+        if not self.enabled or response is None:
+            return
+        try:
+            body = await response.body()
+        except Exception:
+            return
+        self.record(response.url, response.status, response.headers.get('content-type', ''), body, 'document')
+    
+    def to_bytes(self) -> bytes:
+        lines = (json.dumps(entry, ensure_ascii=False) for entry in self.entries.values())
+        return gzip.compress('\n'.join(lines).encode('utf-8'))
+    
+    async def save(self, key: str = RECORD_ARCHIVE_KEY) -> None:
+        await Actor.set_value(key, self.to_bytes(), content_type='application/gzip')
+        Actor.log.info(f'Recorded {len(self.entries)} responses ({self.size / 1024 / 1024:.1f} MiB) to "{key}"'
+                       f'{f", dropped {self.dropped} over the size cap" if self.dropped else ""}')
+
+
+response_recorder = ResponseRecorder()
+
+
+# =============================================================================
+# STREAMING JSON
+# =============================================================================
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StreamingReviewParser:
+    """Parse a JSON body incrementally, emitting reviews as soon as each list element completes.
+    
+    Elements of arrays are walked and dropped once closed, so peak memory is bounded by
+    the largest single element (one review) plus the envelope around the arrays.
+    """
+    
+    def __init__(self, source_url: str = ''):
+        if ijson is None:
+            raise RuntimeError('Streaming JSON parsing requires the "ijson" package.')
+        self.source_url = source_url
+        self.next_urls: List[str] = []
+        self._seen_next_urls: Set[str] = set()
+        self._events = ijson.sendable_list()
+        self._coro = ijson.parse_coro(self._events, use_float=True)
+        # Frames are [container, pending_key, skipped]; a skipped frame has no container
+        self._stack: List[list] = []
+        self._root: Any = None
+        self._reviews: List[Dict] = []
+    
+    def _walk(self, node: Any) -> None:
+        for kind, value in walk_payload(node, self.source_url):
+            if kind == 'review':
+                self._reviews.append(value)
+            elif value not in self._seen_next_urls:
+                self._seen_next_urls.add(value)
+                self.next_urls.append(value)
+    
+    def _add_value(self, value: Any) -> None:
+        if not self._stack:
+            self._root = value
+            return
+        container, key, skipped = self._stack[-1]
+        if skipped:
+            return
+        if isinstance(container, dict):
+            container[key] = value
+        elif isinstance(value, (dict, list)):
+            # Array elements are independent candidates: walk them now and drop them
+            self._walk([value])
+    
+    def _open(self, container: Any) -> None:
+        skipped = False
+        if self._stack:
+            parent, key, parent_skipped = self._stack[-1]
+            skipped = parent_skipped or (isinstance(parent, dict) and key.lower() in SKIPPED_SUBTREE_KEYS)
+        self._stack.append([None if skipped else container, None, skipped])
     
-    return list(urls)
+    def _close(self) -> None:
+        container, _, skipped = self._stack.pop()
+        if not skipped:
+            self._add_value(container)
+    
+    def _process_events(self) -> None:
+        for _, event, value in self._events:
+            if event == 'map_key':
+                self._stack[-1][1] = value
+            elif event == 'start_map':
+                self._open({})
+            elif event == 'start_array':
+                self._open([])
+            elif event in ('end_map', 'end_array'):
+                self._close()
+            else:
+                self._add_value(value)
+        del self._events[:]
+    
+    def _drain(self) -> List[Dict]:
+        reviews, self._reviews = self._reviews, []
+        return reviews
+    
+    def feed(self, chunk: bytes) -> List[Dict]:
+        """Feed a chunk of the body; return reviews completed so far."""
+        self._coro.send(chunk)
+        self._process_events()
+        return self._drain()
+    
+    def close(self) -> List[Dict]:
+        """Finish parsing and walk whatever envelope remains."""
+        self._coro.close()
+        self._process_events()
+        if isinstance(self._root, (dict, list)):
+            self._walk(self._root)
+            self._root = None
+        return self._drain()
+
+
+def parse_review_body(body: bytes, source_url: str = '', streaming: bool = False) -> Tuple[List[Dict], List[str]]:
+    """Extract reviews and pagination URLs from a raw JSON body."""
+    if streaming:
+        return stream_reviews_from_bytes(body, source_url)
+    return extract_reviews_and_next_urls(json.loads(body), source_url)
+
+
+def stream_reviews_from_bytes(body: bytes, source_url: str = '') -> Tuple[List[Dict], List[str]]:
+    """Extract reviews and pagination URLs from a JSON body without building the full object tree."""
+    parser = StreamingReviewParser(source_url)
+    reviews: List[Dict] = []
+    for offset in range(0, len(body), STREAM_CHUNK_SIZE):
+        reviews.extend(parser.feed(body[offset:offset + STREAM_CHUNK_SIZE]))
+    reviews.extend(parser.close())
+    return reviews, parser.next_urls
+
+
+REVIEW_RESPONSE_PATTERN = re.compile(r'review|feedback|rating|testimonial', re.IGNORECASE)
 
 
 def is_likely_review_response(url: str, content_type: str = '') -> bool:
     """Check if URL/response looks like review data."""
-    pattern = re.compile(r'review|reviews|feedback|rating|testimonial', re.IGNORECASE)
-    return pattern.search(url) or pattern.search(content_type)
+    return bool(REVIEW_RESPONSE_PATTERN.search(url) or REVIEW_RESPONSE_PATTERN.search(content_type))
+
+
+# =============================================================================
+# HTML EXTRACTION
+# =============================================================================
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+REVIEW_ELEMENT_SELECTORS = [
+    '[data-review-id]',
+    '[data-review-region]',
+    'article[data-review]',
+    'li[data-review]',
+    'div[data-reviews-container] div.wt-grid__item-xs-12',
+    '.wt-grid__item-xs-12 .wt-mb-xs-4'
+]
+
+# Parts of a review element, looked up inside it by extract_review_from_element and by IN_PAGE_EXTRACTION_SCRIPT
+REVIEW_PART_SELECTORS = {
+    'username': 'p.wt-text-title-01, span.wt-text-title-01, a[href*="/people/"]',
+    'rating': 'span.wt-screen-reader-only, span[aria-label*="out of 5"], span[aria-label*="star"]',
+    'comment': 'p.wt-text-body-01.wt-break-word, p.wt-text-body-01, p[data-review-text], .review-text',
+    'date': 'p.wt-text-caption.wt-text-gray, time, .wt-text-caption',
+    'itemLink': 'a.wt-text-link-no-underline, a[href*="/listing/"]',
+    'itemTitle': 'p.wt-text-caption',
+}
+
+
+class ExtractionDocument:
+    """Parse a page's HTML once and share the tree between all extractors."""
+    
+    def __init__(self, html: str, parser: Optional[str] = None):
+        self.html = html
+        self.soup = BeautifulSoup(html, parser or HTML_PARSER)
+        self.next_data: Optional[str] = None
+        self.jsonld: List[str] = []
+        self._review_elements: Optional[List[Tag]] = None
+        self._text: Optional[str] = None
+        
+        # Collect script blobs in a single pass over <script> tags
+        for script in self.soup.find_all('script'):
+            content = script.string
+            if not content:
+                continue
+            if script.get('id') == '__NEXT_DATA__':
+                if self.next_data is None:
+                    self.next_data = content
+            elif script.get('type') == 'application/ld+json':
+                self.jsonld.append(content)
+    
+    @property
+    def review_elements(self) -> List[Tag]:
+        """Review container nodes matched by the known selectors."""
+        if self._review_elements is None:
+            self._review_elements = self.soup.select(','.join(REVIEW_ELEMENT_SELECTORS))
+        return self._review_elements
+    
+    @property
+    def text(self) -> str:
+        """Visible text of the document."""
+        if self._text is None:
+            self._text = normalize_text(self.soup.get_text())
+        return self._text
+
 
+def as_document(source: Union[str, ExtractionDocument]) -> ExtractionDocument:
+    """Return a parsed document, parsing raw HTML only when needed."""
+    if isinstance(source, ExtractionDocument):
+        return source
+    return ExtractionDocument(source)
 
-def extract_reviews_from_jsonld(html: str) -> List[Dict]:
+
+def extract_reviews_from_jsonld(html: Union[str, ExtractionDocument]) -> List[Dict]:
     """Extract reviews from JSON-LD structured data."""
     results = []
-    soup = BeautifulSoup(html, 'html.parser')
+    document = as_document(html)
     
-    for script in soup.find_all('script', type='application/ld+json'):
+    for content in document.jsonld:
         try:
-            data = json.loads(script.string)
+            data = json.loads(content)
             results.extend(extract_reviews_from_any(data, 'jsonld'))
         except (json.JSONDecodeError, TypeError):
             Actor.log.debug('Failed to parse JSON-LD')
@@ -267,124 +849,239 @@ def extract_reviews_from_jsonld(html: str) -> List[Dict]:
     return results
 
 
-def extract_reviews_from_next_data(html: str) -> List[Dict]:
+def extract_reviews_from_next_data(html: Union[str, ExtractionDocument]) -> List[Dict]:
     """Extract reviews from Next.js __NEXT_DATA__ object."""
-    soup = BeautifulSoup(html, 'html.parser')
-    element = soup.find('script', {'id': '__NEXT_DATA__'})
+    document = as_document(html)
     
-    if not element or not element.string:
+    if not document.next_data:
         return []
     
     try:
-        data = json.loads(element.string)
+        data = json.loads(document.next_data)
         return extract_reviews_from_any(data, 'next_data')
     except (json.JSONDecodeError, TypeError):
         Actor.log.debug('Failed to parse __NEXT_DATA__')
         return []
 
 
-def extract_review_from_element(element_html: str) -> Optional[Dict]:
+def read_review_element(node: Tag) -> Dict[str, Optional[str]]:
+    """Raw text and attributes of a review element's parts; None for parts that are missing."""
+    def text(selector: str, scope: Optional[Tag] = None) -> Optional[str]:
+        part = (scope or node).select_one(selector)
+        return part.get_text() if part else None
+    
+    item_link = node.select_one(REVIEW_PART_SELECTORS['itemLink'])
+    image = node if node.name == 'img' else node.find('img')
+    return {
+        'username': text(REVIEW_PART_SELECTORS['username']),
+        'rating': text(REVIEW_PART_SELECTORS['rating']),
+        'comment': text(REVIEW_PART_SELECTORS['comment']),
+        'date': text(REVIEW_PART_SELECTORS['date']),
+        'itemTitle': text(REVIEW_PART_SELECTORS['itemTitle'], item_link) if item_link else None,
+        'itemHref': item_link.get('href') if item_link else None,
+        'image': image.get('src') if image else None,
+    }
+
+
+def build_element_review(parts: Dict[str, Optional[str]]) -> Optional[Dict]:
+    """Turn the raw parts of a review element into a review."""
+    username = normalize_text(parts['username']) if parts['username'] is not None else 'Anonymous'
+    
+    rating = None
+    if parts['rating']:
+        match = re.search(r'(\d+)\s*out of', parts['rating'], re.IGNORECASE)
+        if match:
+            rating = int(match.group(1))
+    
+    comment = normalize_text(parts['comment'])
+    if not comment and not rating:
+        return None
+    
+    item_url = parts['itemHref'] or ''
+    if item_url and not item_url.startswith('http'):
+        item_url = f'https://www.etsy.com{item_url}'
+    
+    return {
+        'username': username,
+        'rating': rating,
+        'comment': comment,
+        'date': normalize_text(parts['date']),
+        'item_title': normalize_text(parts['itemTitle']),
+        'item_url': item_url,
+        'item_image': parts['image'] or '',
+        'scrapedAt': datetime.utcnow().isoformat()
+    }
+
+
+def extract_review_from_element(element: Union[str, Tag]) -> Optional[Dict]:
     """Extract review data from a single DOM element."""
     try:
-        soup = BeautifulSoup(element_html, 'html.parser')
-        
-        # Reviewer Name
-        name_el = soup.select_one('p.wt-text-title-01, span.wt-text-title-01, a[href*="/people/"]')
-        username = normalize_text(name_el.get_text()) if name_el else 'Anonymous'
-        
-        # Rating
-        rating = None
-        rating_el = soup.select_one('span.wt-screen-reader-only, span[aria-label*="out of 5"], span[aria-label*="star"]')
-        if rating_el:
-            match = re.search(r'(\d+)\s*out of', rating_el.get_text(), re.IGNORECASE)
-            if match:
-                rating = int(match.group(1))
-        
-        # Comment
-        comment_el = soup.select_one('p.wt-text-body-01.wt-break-word, p.wt-text-body-01, p[data-review-text], .review-text')
-        comment = normalize_text(comment_el.get_text()) if comment_el else ''
-        
-        if not comment and not rating:
-            return None
-        
-        # Date
-        date_el = soup.select_one('p.wt-text-caption.wt-text-gray, time, .wt-text-caption')
-        date_text = normalize_text(date_el.get_text()) if date_el else ''
-        
-        # Item Info
-        item_link = soup.select_one('a.wt-text-link-no-underline, a[href*="/listing/"]')
-        item_title = ''
-        item_url = ''
-        
-        if item_link:
-            item_title = normalize_text(item_link.select_one('p.wt-text-caption').get_text()) if item_link.select_one('p.wt-text-caption') else ''
-            item_url = item_link.get('href', '')
-            if item_url and not item_url.startswith('http'):
-                item_url = f'https://www.etsy.com{item_url}'
-        
-        # Image
-        img_el = soup.find('img')
-        item_image = img_el.get('src', '') if img_el else ''
-        
-        return {
-            'username': username,
-            'rating': rating,
-            'comment': comment,
-            'date': date_text,
-            'item_title': item_title,
-            'item_url': item_url,
-            'item_image': item_image,
-            'scrapedAt': datetime.utcnow().isoformat()
-        }
+        node = BeautifulSoup(element, HTML_PARSER) if isinstance(element, str) else element
+        return build_element_review(read_review_element(node))
     except Exception as e:
         Actor.log.debug(f'Failed to parse review element: {str(e)}')
         return None
 
 
-def extract_reviews_from_html(html: str) -> List[Dict]:
+def extract_reviews_from_html(html: Union[str, ExtractionDocument]) -> List[Dict]:
     """Extract reviews from HTML DOM."""
     results = []
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    selectors = [
-        '[data-review-id]',
-        '[data-review-region]',
-        'article[data-review]',
-        'li[data-review]',
-        'div[data-reviews-container] div.wt-grid__item-xs-12',
-        '.wt-grid__item-xs-12 .wt-mb-xs-4'
-    ]
+    document = as_document(html)
     
-    elements = soup.select(','.join(selectors))
+    elements = document.review_elements
     if not elements:
         Actor.log.warning('No review elements found with primary selectors.')
         return []
     
     for element in elements:
-        review = extract_review_from_element(str(element))
+        review = extract_review_from_element(element)
         if review:
             results.append(review)
     
     return results
 
 
-def detect_block_reason(html: str) -> Optional[str]:
-    """Detect if page is blocked/captcha."""
-    text = html.lower()
-    if 'captcha' in text or 'verify' in text:
-        return 'captcha'
-    if any(term in text for term in ['access blocked', 'access denied', 'forbidden']):
-        return 'blocked'
-    if any(term in text for term in ['unusual activity', 'unusual traffic', 'robot']):
-        return 'bot'
+# The crawler's in-page "Next" lookup; DOM hrefs are already absolute
+NEXT_PAGE_SCRIPT = '''() => {
+    const nextButton = document.querySelector('nav[aria-label="Pagination"] a:last-child');
+    if (nextButton && !nextButton.classList.contains('wt-is-disabled') && nextButton.getAttribute('aria-label')?.includes('Next')) {
+        return nextButton.href;
+    }
+    const alternatives = Array.from(document.querySelectorAll('a[href*="page="]'));
+    const nextLink = alternatives.find(a => a.innerText.includes('Next') || a.getAttribute('aria-label')?.includes('Next'));
+    return nextLink ? nextLink.href : null;
+}'''
+
+
+def find_next_page_link(html: Union[str, ExtractionDocument], base_url: str) -> Optional[str]:
+    """Find the "Next" pagination link, mirroring the in-page lookup used by the crawler."""
+    document = as_document(html)
+    soup = document.soup
+    
+    next_button = soup.select_one('nav[aria-label="Pagination"] a:last-child')
+    if next_button and 'wt-is-disabled' not in (next_button.get('class') or []) and 'Next' in (next_button.get('aria-label') or ''):
+        return urljoin(base_url, next_button.get('href', ''))
+    
+    for link in soup.select('a[href*="page="]'):
+        if 'Next' in link.get_text() or 'Next' in (link.get('aria-label') or ''):
+            return urljoin(base_url, link['href'])
+    
+    return None
+
+
+# Phrases that only appear on interstitials; bare words like "verify" or "robot" also
+# show up on normal shop pages ("Verified purchase", <meta name="robots">)
+BLOCK_TEXT_PATTERNS = [
+    ('captcha', re.compile(r'\bcaptcha\b|verify (?:that )?you are (?:a )?human|complete the security check', re.IGNORECASE)),
+    ('blocked', re.compile(r'access (?:to this page )?(?:has been |is )?(?:blocked|denied)|\b403 forbidden\b', re.IGNORECASE)),
+    ('bot', re.compile(r'unusual (?:activity|traffic)|are you a robot|automated (?:access|requests|queries)', re.IGNORECASE)),
+]
+BLOCK_TEXT_SCOPE_CHARS = 2000
+BLOCK_TEXT_SCRIPT = f'''() => `${{document.title}} ${{(document.body?.innerText || '').slice(0, {BLOCK_TEXT_SCOPE_CHARS})}}`'''
+
+# Navigation-level signals, checked before any DOM work
+BLOCK_BODY_PREFIX_BYTES = 8192
+CHALLENGE_HOSTS = ['captcha-delivery.com', 'challenges.cloudflare.com', 'perimeterx.net', 'px-cloud.net']
+CHALLENGE_PATH_PATTERN = re.compile(r'/(?:captcha|challenge|interstitial|blocked)\b', re.IGNORECASE)
+CHALLENGE_BODY_MARKERS = [
+    ('captcha', 'captcha-delivery.com'),
+    ('captcha', 'px-captcha'),
+    ('captcha', 'cf-chl-'),
+    ('captcha', 'cf_chl_opt'),
+    ('blocked', '<title>access denied'),
+    ('blocked', '<title>403 forbidden'),
+    ('bot', '<title>attention required'),
+]
+# Present in the <head> of every real Etsy page
+ETSY_PAGE_MARKERS = ['etsystatic.com', 'content="etsy"', '<title>etsy', ' | etsy</title>', '- etsy</title>']
+
+
+def detect_block_reason_in_text(text: str) -> Optional[str]:
+    """Match block phrases against a short piece of visible text."""
+    scoped = text[:BLOCK_TEXT_SCOPE_CHARS]
+    for reason, pattern in BLOCK_TEXT_PATTERNS:
+        if pattern.search(scoped):
+            return reason
     return None
 
 
-def extract_block_details(html: str) -> Dict:
+def detect_block_reason(html: Union[str, ExtractionDocument]) -> Optional[str]:
+    """Detect if page is blocked/captcha, looking only at the title and the start of the visible body text."""
+    document = as_document(html)
+    soup = document.soup
+    title = normalize_text(soup.title.get_text()) if soup.title else ''
+    body = soup.body or soup
+    parts = []
+    size = 0
+    for string in body.find_all(string=True):
+        if string.parent is not None and string.parent.name in ('script', 'style', 'noscript', 'template'):
+            continue
+        part = string.strip()
+        if part:
+            parts.append(part)
+            size += len(part) + 1
+            if size >= BLOCK_TEXT_SCOPE_CHARS:
+                break
+    return detect_block_reason_in_text(f'{title} {" ".join(parts)}')
+
+
+def classify_navigation(status: Optional[int], url: str, redirect_urls: List[str],
+                        headers: Dict[str, str], body_prefix: bytes) -> Tuple[Optional[str], bool]:
+    """Classify the main document response before the DOM is touched.
+    
+    Returns (reason, conclusive): a block reason or None, and whether the verdict
+    is certain enough to skip the scoped text check on the rendered page.
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    
+    for hop in [*redirect_urls, url]:
+        parsed = urlparse(hop)
+        host = parsed.hostname or ''
+        if any(host == challenge or host.endswith(f'.{challenge}') for challenge in CHALLENGE_HOSTS):
+            return 'captcha', True
+        if CHALLENGE_PATH_PATTERN.search(parsed.path) and (host == 'etsy.com' or host.endswith('.etsy.com')):
+            return 'captcha', True
+    
+    if headers.get('cf-mitigated') == 'challenge':
+        return 'captcha', True
+    
+    prefix = body_prefix[:BLOCK_BODY_PREFIX_BYTES].decode('utf-8', 'ignore').lower()
+    for reason, marker in CHALLENGE_BODY_MARKERS:
+        if marker in prefix:
+            return reason, True
+    
+    if status == 429:
+        return 'rate-limited', True
+    if status in (401, 403, 407):
+        return ('captcha' if 'x-datadome' in headers or 'x-dd-b' in headers else 'blocked'), True
+    if status is not None and status >= 500:
+        return None, False
+    
+    if any(marker in prefix for marker in ETSY_PAGE_MARKERS):
+        return None, True
+    return None, False
+
+
+async def classify_page_response(response) -> Tuple[Optional[str], bool]:
+    """Run classify_navigation on a Playwright navigation response."""
+    if response is None:
+        return None, False
+    redirect_urls = []
+    previous = response.request.redirected_from
+    while previous is not None:
+        redirect_urls.append(previous.url)
+        previous = previous.redirected_from
+    try:
+        body = await response.body()
+    except Exception:
+        body = b''
+    return classify_navigation(response.status, response.url, redirect_urls[::-1], response.headers, body)
+
+
+def extract_block_details(html: Union[str, ExtractionDocument]) -> Dict:
     """Extract details about block reason."""
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        text = normalize_text(soup.get_text())
+        text = as_document(html).text
         
         id_match = re.search(r'\bID:\s*([a-z0-9-]{8,})\b', text, re.IGNORECASE)
         ip_match = re.search(r'\bIP\s*([0-9]{1,3}(?:\.[0-9]{1,3}){3})\b', text, re.IGNORECASE)
@@ -398,18 +1095,21 @@ def extract_block_details(html: str) -> Dict:
         return {'requestId': None, 'ip': None, 'snippet': None}
 
 
+def get_review_key(review: Dict) -> str:
+    """Build the dedup key for a review."""
+    if review.get('review_id'):
+        return f"id:{review['review_id']}"
+    return f"sig:{review.get('username', '')}-{review.get('comment', '')}-{review.get('date', '')}-{review.get('item_title', '')}"
+
+
 def merge_reviews(*arrays: List[Dict]) -> List[Dict]:
     """Merge multiple review lists, removing duplicates."""
     merged = []
-    seen: Set[str] = set()
+    seen: Set[int] = set()
     
     for review_list in arrays:
         for review in review_list:
-            if review.get('review_id'):
-                key = f"id:{review['review_id']}"
-            else:
-                key = f"sig:{review.get('username', '')}-{review.get('comment', '')}-{review.get('date', '')}-{review.get('item_title', '')}"
-            
+            key = review_digest(review)
             if key not in seen:
                 seen.add(key)
                 merged.append(review)
@@ -417,118 +1117,2557 @@ def merge_reviews(*arrays: List[Dict]) -> List[Dict]:
     return merged
 
 
-async def simulate_human_behavior(page) -> None:
-    """Simulate human browsing patterns."""
-    try:
-        # Wait randomly
-        await asyncio.sleep(1 + (time.time() % 2))
-        
-        # Scroll
-        scroll_amount = 300 + int(time.time() % 500)
-        await page.evaluate(f'window.scrollBy(0, {scroll_amount})')
-        await asyncio.sleep(0.5 + (time.time() % 1))
-        
-        # Mouse movements
-        viewport = await page.evaluate('({width: window.innerWidth, height: window.innerHeight})')
-        if viewport:
-            for _ in range(2 + int(time.time() % 3)):
-                x = 100 + (time.time() % (viewport['width'] - 200))
-                y = 100 + (time.time() % (viewport['height'] - 200))
-                await page.mouse.move(int(x), int(y))
-                await asyncio.sleep(0.05 + (time.time() % 0.15))
+# =============================================================================
+# DEDUPLICATION
+# =============================================================================
+
+DEDUP_EXACT_TIER_LIMIT = 100_000
+DEDUP_BLOOM_ERROR_RATE = 0.001
+DEDUP_FORMAT_MAGIC = b'RVDD1'
+
+
+def review_digest(review: Dict, bits: int = 64) -> int:
+    """Fixed-size digest of get_review_key(review); the key string itself is not kept."""
+    digest = hashlib.blake2b(get_review_key(review).encode(), digest_size=bits // 8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over integer digests."""
+    
+    def __init__(self, capacity: int, error_rate: float = DEDUP_BLOOM_ERROR_RATE, bits: Optional[bytearray] = None,
+                 hash_count: Optional[int] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.size = len(self.bits) * 8
+        self.hash_count = hash_count or max(1, round(self.size / max(1, capacity) * math.log(2)))
+    
+    def _positions(self, digest: int) -> Iterator[int]:
+        # Double hashing over the two halves of the digest
+        low = digest & 0xFFFFFFFF
+        high = (digest >> 32) | 1
+        for i in range(self.hash_count):
+            yield (low + i * high) % self.size
+    
+    def add(self, digest: int) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, digest: int) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class ReviewDedup:
+    """Memory-bounded set of seen reviews.
+    
+    Stores fixed-size digests of the review identity (see get_review_key) instead of
+    the key strings. With `bloom_capacity` set, digests spill into a Bloom filter once
+    the exact tier holds `exact_limit` entries, trading a small false-positive rate
+    for flat memory on very large runs.
+    """
+    
+    def __init__(self, digest_bits: int = 64, bloom_capacity: int = 0, exact_limit: int = DEDUP_EXACT_TIER_LIMIT):
+        if digest_bits not in (64, 128):
+            raise ValueError('digest_bits must be 64 or 128')
+        self.digest_bits = digest_bits
+        self.bloom_capacity = bloom_capacity
+        self.exact_limit = exact_limit
+        self.exact: Set[int] = set()
+        self.bloom: Optional[BloomFilter] = None
+        self.count = 0
+    
+    def digest(self, review: Dict) -> int:
+        return review_digest(review, self.digest_bits)
+    
+    def contains_digest(self, digest: int) -> bool:
+        return digest in self.exact or (self.bloom is not None and digest in self.bloom)
+    
+    def add_digest(self, digest: int) -> bool:
+        """Add a digest; return True if it was not seen before."""
+        if self.contains_digest(digest):
+            return False
+        self.count += 1
+        if self.bloom is not None:
+            self.bloom.add(digest)
+            return True
+        
+        self.exact.add(digest)
+        if self.bloom_capacity and len(self.exact) >= self.exact_limit:
+            self.bloom = BloomFilter(self.bloom_capacity)
+            for existing in self.exact:
+                self.bloom.add(existing)
+            self.exact = set()
+            Actor.log.info(f'Dedup store switched to a Bloom filter after {self.count} reviews')
+        return True
+    
+    def add(self, review: Dict) -> bool:
+        return self.add_digest(self.digest(review))
+    
+    def __contains__(self, review: Dict) -> bool:
+        return self.contains_digest(self.digest(review))
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def to_bytes(self) -> bytes:
+        """Serialize for the key-value store."""
+        width = self.digest_bits // 8
+        header = struct.pack(
+            '>5sBQQIIQ', DEDUP_FORMAT_MAGIC, self.digest_bits, self.count, self.bloom_capacity,
+            self.bloom.hash_count if self.bloom else 0, len(self.bloom.bits) if self.bloom else 0, len(self.exact),
+        )
+        digests = b''.join(digest.to_bytes(width, 'big') for digest in self.exact)
+        return header + (bytes(self.bloom.bits) if self.bloom else b'') + digests
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, exact_limit: int = DEDUP_EXACT_TIER_LIMIT) -> 'ReviewDedup':
+        header_size = struct.calcsize('>5sBQQIIQ')
+        magic, digest_bits, count, bloom_capacity, hash_count, bloom_size, exact_count = struct.unpack(
+            '>5sBQQIIQ', data[:header_size]
+        )
+        if magic != DEDUP_FORMAT_MAGIC:
+            raise ValueError('Not a serialized ReviewDedup')
+        
+        dedup = cls(digest_bits, bloom_capacity, exact_limit)
+        dedup.count = count
+        offset = header_size
+        if bloom_size:
+            dedup.bloom = BloomFilter(bloom_capacity, bits=bytearray(data[offset:offset + bloom_size]), hash_count=hash_count)
+            offset += bloom_size
+        width = digest_bits // 8
+        dedup.exact = {
+            int.from_bytes(data[start:start + width], 'big')
+            for start in range(offset, offset + exact_count * width, width)
+        }
+        return dedup
+    
+    async def save(self, store, key: str) -> None:
+        await store.set_value(key, self.to_bytes(), content_type='application/octet-stream')
+    
+    @classmethod
+    async def load(cls, store, key: str) -> Optional['ReviewDedup']:
+        data = await store.get_value(key)
+        return cls.from_bytes(data) if data else None
+
+
+# =============================================================================
+# SHOP STATE
+# =============================================================================
+
+def normalize_start_url(url: str) -> str:
+    """Normalize URL to point at the reviews section."""
+    url = url.strip()
+    if '#reviews' not in url:
+        url = f"{url.split('#')[0]}#reviews"
+    return url
+
+
+def get_shop_key(url: str) -> str:
+    """Derive a stable key identifying the shop (or listing) behind a URL."""
+    parsed = urlparse(url)
+    match = re.match(r'^/(?:[a-z]{2}(?:-[a-z]{2})?/)?(shop|listing)/([^/?#]+)', parsed.path, re.IGNORECASE)
+    if match:
+        kind, name = match.group(1).lower(), match.group(2)
+        return name.lower() if kind == 'shop' else f'listing-{name}'
+    return f'{parsed.netloc}{parsed.path}'.lower()
+
+
+def parse_start_urls(actor_input: Dict, default_results_wanted: int) -> List[Dict]:
+    """Collect shop entries from `startUrls` and the legacy `startUrl` input."""
+    sources: List[Any] = list(actor_input.get('startUrls') or [])
+    if actor_input.get('startUrl'):
+        sources.insert(0, actor_input['startUrl'])
+    
+    entries: List[Dict] = []
+    keys: Set[str] = set()
+    for source in sources:
+        if isinstance(source, str):
+            url, user_data = source, {}
+        elif isinstance(source, dict) and source.get('url'):
+            url, user_data = source['url'], source.get('userData') or {}
+        else:
+            Actor.log.warning(f'Skipping invalid start URL entry: {source!r}')
+            continue
+        
+        url = normalize_start_url(url)
+        key = get_shop_key(url)
+        if key in keys:
+            continue
+        keys.add(key)
+        
+        results_wanted = user_data.get('results_wanted', source.get('results_wanted') if isinstance(source, dict) else None)
+        entries.append({
+            'url': url,
+            'shop': key,
+            'results_wanted': default_results_wanted if results_wanted is None else int(results_wanted),
+        })
+    
+    return entries
+
+
+INCREMENTAL_KEYS_LIMIT = 1000
+
+
+def get_state_store_key(shop_key: str) -> str:
+    """Key-value store record name for a shop (only a limited character set is allowed)."""
+    return 'SHOP-' + re.sub(r"[^a-zA-Z0-9!\-_.'()]", '-', shop_key)[:200]
+
+
+class IncrementalState:
+    """High-water mark of reviews seen by previous runs, persisted per shop."""
+    
+    def __init__(self, shop_key: str, known_digests: List[int], newest_date: str = '', digest_bits: int = 64):
+        self.shop_key = shop_key
+        self.digest_bits = digest_bits
+        self.previous_digests = known_digests
+        self.known_digests: Set[int] = set(known_digests)
+        self.new_digests: List[int] = []
+        # review_date_key of each new digest; pages can finish out of order, so arrival order says little
+        self.new_dates: List[str] = []
+        self.newest_date = newest_date
+        self.newest_key = ''
+    
+    @classmethod
+    async def load(cls, store, shop_key: str, digest_bits: int = 64) -> 'IncrementalState':
+        record = await store.get_value(get_state_store_key(shop_key)) or {}
+        digests = [int(value, 16) for value in record.get('digests', [])]
+        if digests and record.get('digestBits', 64) != digest_bits:
+            Actor.log.warning(f'[{shop_key}] Stored incremental state uses another digest size, starting fresh.')
+            digests = []
+        return cls(shop_key, digests, record.get('newestDate', ''), digest_bits)
+    
+    def record(self, digest: int, review: Dict) -> None:
+        """Remember a review pushed in this run and keep the newest date seen.
+        
+        Without a parseable date the first review recorded stands in for the newest.
+        """
+        date_key = review_date_key(review.get('date', ''))
+        if date_key > self.newest_key:
+            self.newest_date, self.newest_key = review['date'], date_key
+        elif not self.newest_key and not self.new_digests and review.get('date'):
+            self.newest_date = review['date']
+        self.new_digests.append(digest)
+        self.new_dates.append(date_key)
+    
+    def newest_entries(self) -> List[Tuple[str, int]]:
+        """(date key, digest) of this run's reviews, newest first; ties and undated ones keep arrival order."""
+        return sorted(zip(self.new_dates, self.new_digests), key=lambda entry: entry[0], reverse=True)
+    
+    async def save(self, store) -> None:
+        newest = [digest for _, digest in self.newest_entries()]
+        digests = list(dict.fromkeys(newest + self.previous_digests))[:INCREMENTAL_KEYS_LIMIT]
+        await store.set_value(get_state_store_key(self.shop_key), {
+            'shop': self.shop_key,
+            'digestBits': self.digest_bits,
+            'digests': [f'{digest:x}' for digest in digests],
+            'newestDate': self.newest_date,
+            'updatedAt': datetime.utcnow().isoformat(),
+        })
+
+
+class ShopState:
+    """Progress counters and dedup keys for a single shop."""
+    
+    def __init__(self, key: str, start_url: str, results_wanted: int, dedup: Optional[ReviewDedup] = None):
+        self.key = key
+        self.start_url = start_url
+        self.results_wanted = results_wanted
+        self.reviews_scraped = 0
+        self.pages_processed = 0
+        self.seen_reviews = dedup if dedup is not None else ReviewDedup()
+        self.use_http = True
+        self.http_pages = 0
+        self.http_fallbacks = 0
+        self.incremental: Optional[IncrementalState] = None
+        self.caught_up = False
+        self.planned_pages = 0
+        self.plan_source: Optional[str] = None
+        self.listings: Dict[str, int] = {}
+        # Resume points of pages still being handled, by request key: 'http' is the next page of the
+        # HTTP walk, 'api' the API paginator's progress (None once its reviews are pushed)
+        self.cursors: Dict[str, Dict] = {}
+    
+    def attach_incremental(self, incremental: IncrementalState) -> None:
+        """Treat reviews from previous runs as already seen."""
+        self.incremental = incremental
+        for digest in incremental.known_digests:
+            self.seen_reviews.add_digest(digest)
+    
+    def is_stale_page(self, reviews: List[Dict]) -> bool:
+        """True when every review on a page was already scraped by a previous run."""
+        if not self.incremental or not reviews:
+            return False
+        return all(self.seen_reviews.digest(review) in self.incremental.known_digests for review in reviews)
+    
+    def mark_caught_up(self, url: str) -> None:
+        if not self.caught_up:
+            Actor.log.info(f'[{self.key}] Page {url} only has reviews from previous runs, stopping pagination.')
+        self.caught_up = True
+    
+    def set_cursor(self, request_key: str, **values: Any) -> None:
+        self.cursors.setdefault(request_key, {}).update(values)
+    
+    def request_data(self, **extra: Any) -> Dict:
+        """User data for a request of this shop; carries enough for a worker that has not seen the shop yet."""
+        return {'shop': self.key, 'startUrl': self.start_url, 'results_wanted': self.results_wanted, **extra}
+    
+    def add_listings(self, listing_ids: List[str], max_listings: int) -> List[str]:
+        """Register newly found listings, up to max_listings per shop (0 = no cap); returns the new ones."""
+        added = []
+        for listing_id in listing_ids:
+            if listing_id in self.listings:
+                continue
+            if max_listings and len(self.listings) >= max_listings:
+                break
+            self.listings[listing_id] = 0
+            added.append(listing_id)
+        return added
+    
+    def listing_remaining(self, listing_id: str, per_listing: int) -> int:
+        """Reviews a listing may still add under its own limit; 0 means unlimited."""
+        if per_listing <= 0:
+            return 0
+        return max(0, per_listing - self.listings.get(listing_id, 0))
+    
+    @property
+    def can_plan(self) -> bool:
+        """Plan the page range once; incremental runs keep serial pagination so they can stop when caught up."""
+        return not self.planned_pages and not (self.incremental and self.incremental.known_digests)
+    
+    @property
+    def is_complete(self) -> bool:
+        return self.results_wanted > 0 and self.reviews_scraped >= self.results_wanted
+    
+    def remaining(self, pending: int = 0) -> int:
+        """Reviews still wanted after `pending` ones; 0 means unlimited."""
+        if self.results_wanted == 0:
+            return 0
+        return max(0, self.results_wanted - self.reviews_scraped - pending)
+    
+    def wants_more(self, pending: int = 0) -> bool:
+        if self.caught_up:
+            return False
+        return self.results_wanted == 0 or self.reviews_scraped + pending < self.results_wanted
+    
+    def take_new(self, reviews: List[Dict], limit: int = 0) -> List[Dict]:
+        """Filter out reviews already seen for this shop and reserve the budget for the rest.
+        
+        `limit` caps how many new reviews this batch may add (0 = only the shop budget applies);
+        reviews past the cap stay unseen so another page can still collect them.
+        """
+        cap = self.remaining() if self.results_wanted > 0 else len(reviews)
+        if limit > 0:
+            cap = min(cap, limit)
+        
+        unique = []
+        for review in reviews:
+            if len(unique) >= cap:
+                break
+            digest = self.seen_reviews.digest(review)
+            if self.seen_reviews.add_digest(digest):
+                unique.append((digest, review))
+        self.reviews_scraped += len(unique)
+        
+        if self.incremental:
+            for digest, review in unique:
+                self.incremental.record(digest, review)
+        return [review for _, review in unique]
+    
+    def to_statistics(self) -> Dict:
+        return {
+            'startUrl': self.start_url,
+            'resultsWanted': self.results_wanted,
+            'reviewsScraped': self.reviews_scraped,
+            'pagesProcessed': self.pages_processed,
+            'httpPages': self.http_pages,
+            'httpFallbacks': self.http_fallbacks,
+            'knownFromPreviousRuns': len(self.incremental.known_digests) if self.incremental else None,
+            'caughtUp': self.caught_up,
+            'plannedPages': self.planned_pages,
+            'planSource': self.plan_source,
+            'listings': len(self.listings),
+        }
+    
+    def to_checkpoint(self) -> Dict:
+        """Everything but the dedup keys, which CrawlCheckpoint stores in their own record."""
+        state = {
+            'startUrl': self.start_url,
+            'resultsWanted': self.results_wanted,
+            'reviewsScraped': self.reviews_scraped,
+            'pagesProcessed': self.pages_processed,
+            'useHttp': self.use_http,
+            'httpPages': self.http_pages,
+            'httpFallbacks': self.http_fallbacks,
+            'caughtUp': self.caught_up,
+            'plannedPages': self.planned_pages,
+            'planSource': self.plan_source,
+            'listings': dict(self.listings),
+            'cursors': {key: dict(cursor) for key, cursor in self.cursors.items()},
+        }
+        if self.incremental:
+            newest = self.incremental.newest_entries()[:INCREMENTAL_KEYS_LIMIT]
+            state['incremental'] = {
+                'newestDate': self.incremental.newest_date,
+                'newDigests': [f'{digest:x}' for _, digest in newest],
+                'newDates': [date_key for date_key, _ in newest],
+            }
+        return state
+    
+    def restore(self, state: Dict, dedup: ReviewDedup) -> None:
+        """Pick up from a checkpoint; the restored dedup keys already include any incremental ones."""
+        self.seen_reviews = dedup
+        self.reviews_scraped = state['reviewsScraped']
+        self.pages_processed = state['pagesProcessed']
+        self.use_http = state['useHttp']
+        self.http_pages = state['httpPages']
+        self.http_fallbacks = state['httpFallbacks']
+        self.caught_up = state['caughtUp']
+        self.planned_pages = state['plannedPages']
+        self.plan_source = state['planSource']
+        self.listings = dict(state['listings'])
+        self.cursors = dict(state.get('cursors', {}))
+        if self.incremental and state.get('incremental'):
+            self.incremental.newest_date = state['incremental']['newestDate']
+            self.incremental.newest_key = review_date_key(self.incremental.newest_date)
+            self.incremental.new_digests = [int(value, 16) for value in state['incremental']['newDigests']]
+            self.incremental.new_dates = list(state['incremental']['newDates'])
+
+
+async def push_reviews(shop: ShopState, reviews: List[Dict], writer: 'DatasetWriter', limit: int = 0) -> int:
+    """Deduplicate reviews for the shop and push the new ones to the dataset."""
+    # Marking reviews seen and queueing them is one step for checkpoints (see DatasetWriter.pause)
+    async with writer.batch():
+        reviews_to_push = shop.take_new(reviews, limit)
+        
+        for review in reviews_to_push:
+            if writer.digest_field:
+                # Computed while review_id is still there
+                review[writer.digest_field] = f'{shop.seen_reviews.digest(review):x}'
+            # Remove internal fields
+            review.pop('review_id', None)
+            review.pop('source', None)
+            review['shop'] = shop.key
+        
+        for review in reviews_to_push:
+            await writer.put(review)
+    
+    return len(reviews_to_push)
+
+
+# =============================================================================
+# DATASET OUTPUT
+# =============================================================================
+
+class DatasetWriter:
+    """Push reviews to the dataset in batches from a background task.
+    
+    Reviews go into a bounded queue so handlers never wait on storage unless the
+    writer falls behind. A batch is flushed when it reaches `batch_size` or when
+    its oldest review has waited `flush_interval` seconds.
+    """
+    
+    _CLOSE = object()
+    
+    def __init__(self, push_data, batch_size: int = 100, flush_interval: float = 2.0,
+                 digest_field: Optional[str] = None):
+        self.push_data = push_data
+        self.digest_field = digest_field
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 10)
+        self.task: Optional[asyncio.Task] = None
+        self.items_written = 0
+        self.items_failed = 0
+        self.batches = 0
+        self.flush_latencies: List[float] = []
+        self.max_queue_depth = 0
+        self.accepting = asyncio.Event()
+        self.accepting.set()
+        self.batches_in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+    
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+    
+    async def put(self, review: Dict) -> None:
+        await self.queue.put(review)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+    
+    @asynccontextmanager
+    async def batch(self):
+        """Hold while a page's reviews are marked seen and queued; waits while the writer is paused."""
+        await self.accepting.wait()
+        self.batches_in_flight += 1
+        self.idle.clear()
+        try:
+            yield
+        finally:
+            self.batches_in_flight -= 1
+            if not self.batches_in_flight:
+                self.idle.set()
+    
+    async def pause(self) -> None:
+        """Hold back new batches and wait until the ones already started are fully queued."""
+        self.accepting.clear()
+        await self.idle.wait()
+    
+    def resume(self) -> None:
+        self.accepting.set()
+    
+    async def sync(self) -> None:
+        """Wait until every review queued before this call has been pushed."""
+        if self.task is None:
+            return
+        marker = asyncio.get_running_loop().create_future()
+        await self.queue.put(marker)
+        await marker
+    
+    async def close(self) -> None:
+        """Drain everything still queued and stop the background task."""
+        if self.task is None:
+            return
+        await self.queue.put(self._CLOSE)
+        await self.task
+        self.task = None
+    
+    async def _flush(self, batch: List[Dict]) -> None:
+        started = time.perf_counter()
+        try:
+            await self.push_data(batch)
+            self.items_written += len(batch)
+        except Exception as e:
+            self.items_failed += len(batch)
+            Actor.log.error(f'Failed to push {len(batch)} reviews to the dataset: {str(e)}')
+        self.batches += 1
+        self.flush_latencies.append(time.perf_counter() - started)
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Dict] = []
+        deadline = 0.0
+        
+        while True:
+            timeout = max(0.0, deadline - loop.time()) if batch else None
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+            
+            if item is self._CLOSE:
+                if batch:
+                    await self._flush(batch)
+                return
+            
+            if isinstance(item, asyncio.Future):
+                # sync() marker: push what is batched so far, whatever its size
+                if batch:
+                    await self._flush(batch)
+                    batch = []
+                item.set_result(None)
+                continue
+            
+            if item is not None:
+                if not batch:
+                    deadline = loop.time() + self.flush_interval
+                batch.append(item)
+            
+            if len(batch) >= self.batch_size or (batch and loop.time() >= deadline):
+                await self._flush(batch)
+                batch = []
+    
+    def statistics(self) -> Dict:
+        latencies_ms = [latency * 1000 for latency in self.flush_latencies]
+        return {
+            'batchSize': self.batch_size,
+            'itemsWritten': self.items_written,
+            'itemsFailed': self.items_failed,
+            'batches': self.batches,
+            'flushLatencyMs': {
+                'p50': round(percentile(latencies_ms, 50), 1),
+                'p95': round(percentile(latencies_ms, 95), 1),
+                'max': round(max(latencies_ms, default=0.0), 1),
+            },
+            'maxQueueDepth': self.max_queue_depth,
+        }
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FORMATS = ['none', 'ndjson', 'csv', 'parquet']
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_GZIP_LEVEL = 6
+EXPORT_KEY_PREFIX = 'reviews-export'
+EXPORT_EXTENSIONS = {'ndjson': 'ndjson.gz', 'csv': 'csv.gz', 'parquet': 'parquet'}
+EXPORT_CONTENT_TYPES = {'ndjson': 'application/gzip', 'csv': 'application/gzip', 'parquet': 'application/vnd.apache.parquet'}
+LISTING_COLUMNS = ['item_title', 'item_url', 'item_image']
+# Text formats replace the listing columns with a reference into the listing parts
+TEXT_REVIEW_COLUMNS = ['shop', 'username', 'rating', 'comment', 'date', 'scrapedAt', 'listing_ref']
+TEXT_LISTING_COLUMNS = ['listing_ref', *LISTING_COLUMNS]
+PARQUET_COLUMNS = ['shop', 'username', 'rating', 'comment', 'date', *LISTING_COLUMNS, 'scrapedAt']
+PARQUET_DICTIONARY_COLUMNS = ['shop', *LISTING_COLUMNS]
+
+
+def encode_ndjson(rows: List[Dict], columns: List[str]) -> bytes:
+    lines = [json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False, separators=(',', ':'))
+             for row in rows]
+    return gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'), compresslevel=EXPORT_GZIP_LEVEL)
+
+
+def encode_csv(rows: List[Dict], columns: List[str]) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    writer.writerows([row.get(column) for column in columns] for row in rows)
+    return gzip.compress(output.getvalue().encode('utf-8'), compresslevel=EXPORT_GZIP_LEVEL)
+
+
+def encode_parquet(rows: List[Dict], columns: List[str]) -> bytes:
+    arrays = {
+        column: pyarrow.array([row.get(column) for row in rows], pyarrow.int8() if column == 'rating' else pyarrow.string())
+        for column in columns
+    }
+    try:
+        arrays['scrapedAt'] = arrays['scrapedAt'].cast(pyarrow.timestamp('us'))
+    except pyarrow.ArrowInvalid:
+        pass
+    sink = pyarrow.BufferOutputStream()
+    parquet.write_table(pyarrow.table(arrays), sink, compression='zstd', use_dictionary=PARQUET_DICTIONARY_COLUMNS)
+    return sink.getvalue().to_pybytes()
+
+
+EXPORT_ENCODERS = {'ndjson': encode_ndjson, 'csv': encode_csv, 'parquet': encode_parquet}
+
+
+class ReviewExporter:
+    """Stream reviews into compressed NDJSON, CSV or Parquet parts in the key-value store.
+    
+    Rows are buffered and written as one part per `chunk_rows`, so memory stays
+    flat however many reviews are exported. NDJSON and CSV keep each distinct
+    listing once, in listing parts, and refer to it by `listing_ref`; Parquet
+    dictionary-encodes the listing columns instead. A manifest record lists
+    every part.
+    """
+    
+    def __init__(self, export_format: str, set_value, chunk_rows: int = EXPORT_CHUNK_ROWS,
+                 prefix: str = EXPORT_KEY_PREFIX):
+        if export_format not in EXPORT_ENCODERS:
+            raise ValueError(f'Unknown export format: {export_format}')
+        self.format = export_format
+        self.set_value = set_value
+        self.chunk_rows = max(1, chunk_rows)
+        self.prefix = prefix
+        self.rows: List[Dict] = []
+        self.listing_refs: Dict[Tuple[str, ...], int] = {}
+        self.new_listings: List[Dict] = []
+        self.parts: List[Dict] = []
+        self.listing_parts: List[Dict] = []
+        self.encode_secs = 0.0
+        # Checkpoints flush from outside the dataset writer; part numbers must not be taken twice
+        self._flush_lock = asyncio.Lock()
+    
+    async def write(self, reviews: List[Dict]) -> None:
+        """Buffer a batch of reviews; usable as DatasetWriter's push_data."""
+        if self.format == 'parquet':
+            self.rows.extend(reviews)
+        else:
+            self.rows.extend(self._with_listing_ref(review) for review in reviews)
+        if len(self.rows) >= self.chunk_rows:
+            await self.flush()
+    
+    def _with_listing_ref(self, review: Dict) -> Dict:
+        listing = tuple(review.get(column) or '' for column in LISTING_COLUMNS)
+        ref = self.listing_refs.get(listing)
+        if ref is None:
+            ref = self.listing_refs[listing] = len(self.listing_refs) + 1
+            self.new_listings.append({'listing_ref': ref, **dict(zip(LISTING_COLUMNS, listing))})
+        return {**review, 'listing_ref': ref}
+    
+    async def _write_part(self, name: str, rows: List[Dict], columns: List[str], parts: List[Dict]) -> None:
+        started = time.perf_counter()
+        data = await asyncio.to_thread(EXPORT_ENCODERS[self.format], rows, columns)
+        self.encode_secs += time.perf_counter() - started
+        key = f'{self.prefix}-{name}-{len(parts) + 1:05d}.{EXPORT_EXTENSIONS[self.format]}'
+        await self.set_value(key, data, content_type=EXPORT_CONTENT_TYPES[self.format])
+        parts.append({'key': key, 'rows': len(rows), 'bytes': len(data)})
+    
+    async def flush(self) -> None:
+        """Write the buffered reviews, and the listings first seen in them, as new parts."""
+        async with self._flush_lock:
+            rows, self.rows = self.rows, []
+            listings, self.new_listings = self.new_listings, []
+            if listings:
+                await self._write_part('listings', listings, TEXT_LISTING_COLUMNS, self.listing_parts)
+            if rows:
+                columns = PARQUET_COLUMNS if self.format == 'parquet' else TEXT_REVIEW_COLUMNS
+                await self._write_part('reviews', rows, columns, self.parts)
+    
+    async def close(self) -> None:
+        await self.flush()
+        await self.set_value(f'{self.prefix}-manifest', json.dumps({
+            'format': self.format,
+            'reviewColumns': PARQUET_COLUMNS if self.format == 'parquet' else TEXT_REVIEW_COLUMNS,
+            'listingColumns': TEXT_LISTING_COLUMNS if self.format != 'parquet' else [],
+            'reviewParts': self.parts,
+            'listingParts': self.listing_parts,
+        }))
+    
+    def to_checkpoint(self) -> Dict:
+        """Parts written so far and the listings they refer to; buffered rows are not included."""
+        written_listings = sum(part['rows'] for part in self.listing_parts)
+        return {
+            'format': self.format,
+            'reviewParts': list(self.parts),
+            'listingParts': list(self.listing_parts),
+            'listings': [list(listing) for listing in list(self.listing_refs)[:written_listings]],
+        }
+    
+    def restore(self, state: Dict) -> None:
+        """Continue after the parts of a checkpoint instead of overwriting them."""
+        if state.get('format') != self.format:
+            return
+        self.parts = list(state['reviewParts'])
+        self.listing_parts = list(state['listingParts'])
+        self.listing_refs = {tuple(listing): ref for ref, listing in enumerate(state['listings'], start=1)}
+    
+    def statistics(self) -> Dict:
+        rows = sum(part['rows'] for part in self.parts)
+        size = sum(part['bytes'] for part in self.parts + self.listing_parts)
+        return {
+            'format': self.format,
+            'rows': rows,
+            'listings': len(self.listing_refs),
+            'parts': len(self.parts) + len(self.listing_parts),
+            'bytes': size,
+            'bytesPerRow': round(size / rows, 1) if rows else 0,
+            'encodeMs': round(self.encode_secs * 1000, 1),
+        }
+
+
+# =============================================================================
+# NETWORK
+# =============================================================================
+
+TRACKER_DOMAINS = [
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'googleadservices.com', 'facebook.net', 'connect.facebook.com', 'bat.bing.com', 'ct.pinterest.com',
+    'analytics.tiktok.com', 'sc-static.net', 'hotjar.com', 'branch.io', 'adsrvr.org', 'criteo.com',
+    'criteo.net', 'quantserve.com', 'scorecardresearch.com', 'pinimg.com', 'fullstory.com',
+]
+TRACKER_PATH_MARKERS = ['/bcn/beacon', '/api/v3/ajax/bespoke/member/log']
+
+RESOURCE_BLOCKING_PROFILES: Dict[str, Dict[str, Any]] = {
+    'off': {'types': set(), 'domains': []},
+    'balanced': {'types': {'image', 'media', 'font'}, 'domains': TRACKER_DOMAINS},
+    'aggressive': {
+        'types': {'image', 'media', 'font', 'stylesheet', 'texttrack', 'manifest', 'websocket', 'eventsource'},
+        'domains': TRACKER_DOMAINS,
+    },
+}
+
+# Rough transfer sizes used to estimate what aborted requests would have cost
+TYPICAL_RESOURCE_BYTES = {
+    'image': 45_000, 'media': 400_000, 'font': 40_000, 'stylesheet': 30_000,
+    'script': 60_000, 'xhr': 3_000, 'fetch': 3_000,
+}
+
+
+class NetworkProfile:
+    """Decide which requests a page may make."""
+    
+    def __init__(self, name: str, extra_domains: Optional[List[str]] = None):
+        if name not in RESOURCE_BLOCKING_PROFILES:
+            raise ValueError(f'Unknown resource blocking profile: {name}')
+        profile = RESOURCE_BLOCKING_PROFILES[name]
+        self.name = name
+        self.blocked_types: Set[str] = set(profile['types'])
+        self.blocked_domains = tuple(domain.lower().lstrip('.') for domain in [*profile['domains'], *(extra_domains or [])])
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.blocked_types or self.blocked_domains)
+    
+    def block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        """Return why a request should be aborted, or None to let it through."""
+        parsed = urlparse(url)
+        host = parsed.hostname or ''
+        if self.blocked_domains and any(marker in parsed.path for marker in TRACKER_PATH_MARKERS):
+            return 'domain'
+        # Documents and review JSON must always reach the page and ApiResponseCollector
+        if resource_type in ('document', 'xhr', 'fetch') and (host == 'etsy.com' or host.endswith('.etsy.com')):
+            return None
+        if resource_type in self.blocked_types:
+            return resource_type
+        if any(host == domain or host.endswith(f'.{domain}') for domain in self.blocked_domains):
+            return 'domain'
+        return None
+
+
+class PageTraffic:
+    """Bytes transferred and requests blocked for one page."""
+    
+    def __init__(self, profile: NetworkProfile):
+        self.profile = profile
+        self.bytes_transferred = 0
+        self.requests = 0
+        self.blocked: Dict[str, int] = {}
+        self.bytes_saved_estimate = 0
+        self._pending: Set[asyncio.Task] = set()
+    
+    async def install(self, page) -> None:
+        """Attach route interception and size accounting; call before navigation."""
+        if self.profile.enabled:
+            await page.route('**/*', self._on_route)
+        page.on('requestfinished', self._on_request_finished)
+    
+    async def _on_route(self, route) -> None:
+        request = route.request
+        reason = self.profile.block_reason(request.resource_type, request.url)
+        if reason is None:
+            await route.continue_()
+            return
+        self.blocked[reason] = self.blocked.get(reason, 0) + 1
+        self.bytes_saved_estimate += TYPICAL_RESOURCE_BYTES.get(request.resource_type, 10_000)
+        await route.abort('blockedbyclient')
+    
+    def _on_request_finished(self, request) -> None:
+        task = asyncio.ensure_future(self._count(request))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _count(self, request) -> None:
+        try:
+            sizes = await request.sizes()
+            self.bytes_transferred += sizes['responseBodySize'] + sizes['responseHeadersSize']
+            self.requests += 1
+        except Exception:
+            pass
+    
+    async def finish(self, page) -> None:
+        page.remove_listener('requestfinished', self._on_request_finished)
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+
+class NetworkStats:
+    """Run-level network usage across pages."""
+    
+    def __init__(self, profile: NetworkProfile):
+        self.profile = profile
+        self.page_bytes: List[int] = []
+        self.blocked: Dict[str, int] = {}
+        self.bytes_saved_estimate = 0
+    
+    def add(self, traffic: PageTraffic) -> None:
+        self.page_bytes.append(traffic.bytes_transferred)
+        self.bytes_saved_estimate += traffic.bytes_saved_estimate
+        for reason, count in traffic.blocked.items():
+            self.blocked[reason] = self.blocked.get(reason, 0) + count
+    
+    def statistics(self) -> Dict:
+        return {
+            'profile': self.profile.name,
+            'pages': len(self.page_bytes),
+            'bytesTransferred': sum(self.page_bytes),
+            'bytesPerPage': {
+                'p50': percentile(self.page_bytes, 50),
+                'p95': percentile(self.page_bytes, 95),
+            },
+            'blockedRequests': self.blocked,
+            'estimatedBytesSaved': self.bytes_saved_estimate,
+        }
+
+
+# =============================================================================
+# PAGE READINESS
+# =============================================================================
+
+# How much human-like jitter each profile keeps; (base, spread) pairs are seconds
+SPEED_PROFILES: Dict[str, Dict[str, Any]] = {
+    'stealth': {
+        'settle': (1.5, 1.5), 'before_interaction': (3.0, 2.0), 'human_scale': 1.0,
+        'scroll_pause': (0.7, 0.9), 'min_scrolls': 6, 'max_scrolls': 10, 'stable_rounds': 2, 'api_quiet': 2.0,
+    },
+    'balanced': {
+        'settle': (0.3, 0.5), 'before_interaction': (0.5, 0.7), 'human_scale': 0.3,
+        'scroll_pause': (0.25, 0.35), 'min_scrolls': 1, 'max_scrolls': 8, 'stable_rounds': 2, 'api_quiet': 0.75,
+    },
+    'fast': {
+        'settle': (0.0, 0.0), 'before_interaction': (0.0, 0.0), 'human_scale': 0.0,
+        'scroll_pause': (0.1, 0.0), 'min_scrolls': 1, 'max_scrolls': 8, 'stable_rounds': 1, 'api_quiet': 0.4,
+    },
+}
+
+# Mean idle time of the old fixed sleeps per page: settle, pre-interaction pause,
+# human simulation, six scroll steps and the final wait
+LEGACY_FIXED_WAIT_SECS = 2.25 + 4.0 + 3.4 + 6 * 1.15 + 2.0
+
+REVIEW_NODE_COUNT_SCRIPT = f'() => document.querySelectorAll({json.dumps(",".join(REVIEW_ELEMENT_SELECTORS))}).length'
+
+
+def jitter(base: float, spread: float) -> float:
+    """Return a delay between base and base + spread."""
+    return base + (time.time() % spread if spread else 0.0)
+
+
+async def simulate_human_behavior(page, scale: float = 1.0) -> None:
+    """Simulate human browsing patterns, with pauses multiplied by scale."""
+    if scale <= 0:
+        return
+    try:
+        # Wait randomly
+        await asyncio.sleep(jitter(1, 2) * scale)
+        
+        # Scroll
+        scroll_amount = 300 + int(time.time() % 500)
+        await page.evaluate(f'window.scrollBy(0, {scroll_amount})')
+        await asyncio.sleep(jitter(0.5, 1) * scale)
+        
+        # Mouse movements
+        viewport = await page.evaluate('({width: window.innerWidth, height: window.innerHeight})')
+        if viewport:
+            for _ in range(2 + int(time.time() % 3)):
+                x = 100 + (time.time() % (viewport['width'] - 200))
+                y = 100 + (time.time() % (viewport['height'] - 200))
+                await page.mouse.move(int(x), int(y))
+                await asyncio.sleep(jitter(0.05, 0.15) * scale)
     except Exception as e:
         Actor.log.debug(f'Human behavior simulation failed: {str(e)}')
 
 
-async def ensure_reviews_section(page) -> None:
-    """Navigate to reviews section if needed."""
-    try:
-        reviews_tab = page.get_by_role('tab', name=re.compile(r'reviews', re.IGNORECASE)).first
-        if await reviews_tab.count():
-            await reviews_tab.click(timeout=5000)
-            await asyncio.sleep(0.8)
-            return
-    except Exception as e:
-        Actor.log.debug(f'Reviews tab click failed: {str(e)}')
+async def count_review_nodes(page) -> int:
+    """Count review elements currently in the DOM."""
+    try:
+        return await page.evaluate(REVIEW_NODE_COUNT_SCRIPT)
+    except Exception:
+        return 0
+
+
+async def wait_for_review_nodes(page, timeout_ms: int = 5000) -> bool:
+    """Wait until the first review element (or its container) is attached."""
+    try:
+        await page.wait_for_selector('[data-review-id], [data-reviews-container]', timeout=timeout_ms)
+        return True
+    except Exception:
+        return False
+
+
+async def ensure_reviews_section(page) -> None:
+    """Navigate to reviews section if needed."""
+    try:
+        reviews_tab = page.get_by_role('tab', name=re.compile(r'reviews', re.IGNORECASE)).first
+        if await reviews_tab.count():
+            await reviews_tab.click(timeout=5000)
+            await wait_for_review_nodes(page, 3000)
+            return
+    except Exception as e:
+        Actor.log.debug(f'Reviews tab click failed: {str(e)}')
+    
+    try:
+        reviews_link = page.locator('a[href*="#reviews"], a[href*="reviews"]').first
+        if await reviews_link.count():
+            await reviews_link.click(timeout=5000)
+            await wait_for_review_nodes(page, 3000)
+    except Exception as e:
+        Actor.log.debug(f'Reviews link click failed: {str(e)}')
+
+
+async def scroll_for_reviews(page, profile: Dict[str, Any], collector=None) -> int:
+    """Scroll until the review count holds steady and review API traffic is quiet; returns scrolls made."""
+    last_count = await count_review_nodes(page)
+    stable = 0
+    scrolls = 0
+    while scrolls < profile['max_scrolls']:
+        await page.evaluate('window.scrollBy(0, window.innerHeight * 0.8)')
+        scrolls += 1
+        await asyncio.sleep(jitter(*profile['scroll_pause']))
+        
+        count = await count_review_nodes(page)
+        quiet = collector is None or collector.is_quiet(profile['api_quiet'] / 2)
+        stable = stable + 1 if count == last_count and quiet else 0
+        last_count = count
+        if scrolls >= profile['min_scrolls'] and stable >= profile['stable_rounds']:
+            break
+    return scrolls
+
+
+class ReadinessStats:
+    """Time spent waiting for pages to become ready, against the old fixed sleeps."""
+    
+    def __init__(self, profile_name: str):
+        self.profile_name = profile_name
+        self.wait_secs: List[float] = []
+        self.scrolls = 0
+    
+    def add(self, wait_secs: float, scrolls: int) -> None:
+        self.wait_secs.append(wait_secs)
+        self.scrolls += scrolls
+    
+    def statistics(self) -> Dict:
+        pages = len(self.wait_secs)
+        # The stealth profile can wait longer than the fixed sleeps did; that is no saving, not a negative one
+        saved = max(0.0, sum(LEGACY_FIXED_WAIT_SECS - secs for secs in self.wait_secs))
+        return {
+            'profile': self.profile_name,
+            'pages': pages,
+            'waitSecs': {
+                'p50': round(percentile(self.wait_secs, 50), 2),
+                'p95': round(percentile(self.wait_secs, 95), 2),
+            },
+            'scrolls': self.scrolls,
+            'estimatedSecsSaved': round(saved, 1),
+            'estimatedSecsSavedPerPage': round(saved / pages, 2) if pages else 0,
+        }
+
+
+# =============================================================================
+# RESPONSE FILTER
+# =============================================================================
+
+RESPONSE_MAX_BYTES = 16 * 1024 * 1024
+# Decoded responses without a single review before an endpoint stops being decoded
+RESPONSE_LEARN_AFTER = 5
+RESPONSE_MAX_ENDPOINTS = 1000
+CACHE_BUSTING_PARAMS = frozenset({'_', '_t', 'cb', 'cachebust', 'cachebuster', 'nocache', 'rnd', 'rand', 'ts', 'timestamp'})
+# URLs that match the review pattern but only carry tracking, logging or recommendations
+EXCLUDED_ENDPOINT_PATTERN = re.compile(
+    '|'.join(re.escape(marker) for marker in TRACKER_PATH_MARKERS)
+    + r'|/(?:bcn|beacons?|logs?|track(?:ing)?|analytics|metrics|telemetry|impressions?|recs|recommend(?:ations|ed)?)(?:[/?]|$)',
+    re.IGNORECASE,
+)
+NUMERIC_SEGMENT_PATTERN = re.compile(r'/\d+(?=/|$)')
+
+
+def normalize_response_url(url: str) -> str:
+    """URL without cache-busting parameters and with a stable query order, for dedup."""
+    parsed = urlparse(url)
+    if not parsed.query:
+        return url
+    query = sorted((key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                   if key.lower() not in CACHE_BUSTING_PARAMS)
+    return urlunparse(parsed._replace(query=urlencode(query), fragment=''))
+
+
+def endpoint_key(url: str) -> str:
+    """Host and path with numeric IDs collapsed, so one API shared by many shops counts as one endpoint."""
+    parsed = urlparse(url)
+    return f'{parsed.hostname or ""}{NUMERIC_SEGMENT_PATTERN.sub("/{id}", parsed.path)}'
+
+
+class ResponseFilter:
+    """Decide which browser responses are worth decoding as review data, learning from what endpoints yield.
+    
+    Endpoints that keep answering without reviews stop being decoded after
+    RESPONSE_LEARN_AFTER tries; an endpoint that ever yielded a review is always decoded.
+    """
+    
+    def __init__(self, max_bytes: int = RESPONSE_MAX_BYTES, learn: bool = True):
+        self.max_bytes = max_bytes
+        self.learn = learn
+        self.endpoints: Dict[str, Dict[str, int]] = {}
+        self.decoded = 0
+        self.skipped: Dict[str, int] = {}
+    
+    def skip(self, reason: str, endpoint: Optional[str] = None) -> str:
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        if endpoint in self.endpoints:
+            self.endpoints[endpoint]['skipped'] += 1
+        return reason
+    
+    def check(self, url: str, content_type: str, content_length: Optional[int] = None) -> Optional[str]:
+        """Return why a response should not be decoded, or None to decode it."""
+        if not is_likely_review_response(url, content_type):
+            return self.skip('notReview')
+        if 'application/json' not in content_type:
+            return self.skip('notJson')
+        if EXCLUDED_ENDPOINT_PATTERN.search(urlparse(url).path):
+            return self.skip('excluded')
+        endpoint = endpoint_key(url)
+        if content_length is not None and content_length > self.max_bytes:
+            return self.skip('tooLarge', endpoint)
+        stats = self.endpoints.get(endpoint)
+        if self.learn and stats and not stats['reviews'] and stats['decoded'] >= RESPONSE_LEARN_AFTER:
+            return self.skip('learnedEmpty', endpoint)
+        return None
+    
+    def record(self, url: str, reviews: int, size: int) -> None:
+        """Count a decoded response and the reviews it held."""
+        self.decoded += 1
+        endpoint = endpoint_key(url)
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            if len(self.endpoints) >= RESPONSE_MAX_ENDPOINTS:
+                return
+            stats = self.endpoints[endpoint] = {'decoded': 0, 'withReviews': 0, 'reviews': 0, 'bytes': 0, 'skipped': 0}
+        stats['decoded'] += 1
+        stats['withReviews'] += bool(reviews)
+        stats['reviews'] += reviews
+        stats['bytes'] += size
+    
+    def statistics(self) -> Dict:
+        busiest = sorted(self.endpoints.items(), key=lambda item: -(item[1]['decoded'] + item[1]['skipped']))
+        return {
+            'decoded': self.decoded,
+            'skipped': sum(self.skipped.values()),
+            'skippedByReason': self.skipped,
+            'learnedEmptyEndpoints': sorted(
+                endpoint for endpoint, stats in self.endpoints.items()
+                if not stats['reviews'] and stats['decoded'] >= RESPONSE_LEARN_AFTER
+            ),
+            'endpoints': dict(busiest[:20]),
+        }
+
+
+response_filter = ResponseFilter()
+
+
+# =============================================================================
+# HTTP FAST PATH
+# =============================================================================
+
+BLOCKED_STATUS_CODES = {401, 403, 407, 429, 503}
+HTTP_PAGINATION_BUDGET_SECS = 200
+
+
+class HttpPathBlocked(Exception):
+    """Raised when the browser-free HTTP path gets blocked and the browser must take over."""
+
+
+class HttpFastPath:
+    """Browser-free fetching that reuses the cookies and headers of a page that passed Etsy's checks."""
+    
+    def __init__(self, http_client: HttpClient, proxy_info: Optional[ProxyInfo], cookies: List[Dict],
+                 headers: Dict[str, str], endpoints: List[str]):
+        self.http_client = http_client
+        self.proxy_info = proxy_info
+        self.session = Session(max_age=timedelta(hours=2), max_usage_count=10_000)
+        self.session.cookies.set_cookies_from_playwright_format(cookies)
+        self.headers = headers
+        self.endpoints = endpoints
+        self.requests_made = 0
+        self.blocked = False
+    
+    @classmethod
+    async def from_page(cls, page, http_client: HttpClient, proxy_info: Optional[ProxyInfo],
+                        endpoints: List[str]) -> 'HttpFastPath':
+        """Export cookies, headers and the discovered endpoints from a loaded page."""
+        cookies = await page.context.cookies()
+        navigator = await page.evaluate('({userAgent: navigator.userAgent, languages: navigator.languages})')
+        headers = {
+            'user-agent': navigator['userAgent'],
+            'accept-language': ','.join(navigator.get('languages') or ['en-US', 'en']),
+            'referer': page.url,
+        }
+        Actor.log.debug(f'Exported browser session: {len(cookies)} cookies, {len(endpoints)} review endpoints')
+        return cls(http_client, proxy_info, cookies, headers, endpoints)
+    
+    async def _get(self, url: str, accept: str) -> bytes:
+        if self.blocked:
+            raise HttpPathBlocked('HTTP path already blocked')
+        
+        self.requests_made += 1
+        response = await self.http_client.send_request(
+            url,
+            headers={**self.headers, 'accept': accept},
+            session=self.session,
+            proxy_info=self.proxy_info,
+            timeout=timedelta(seconds=30),
+        )
+        if response.status_code in BLOCKED_STATUS_CODES:
+            self.blocked = True
+            raise HttpPathBlocked(f'HTTP {response.status_code} for {url}')
+        if response.status_code >= 400:
+            raise RuntimeError(f'HTTP {response.status_code} for {url}')
+        body = await response.read()
+        stage_timer.add_bytes('http', len(body))
+        response_recorder.record(url, response.status_code, response.headers.get('content-type', ''), body, 'http')
+        return body
+    
+    async def get_reviews(self, url: str) -> Tuple[List[Dict], List[str]]:
+        """Fetch a JSON review page and extract its reviews and pagination URLs on the extraction executor."""
+        body = await self._get(url, 'application/json, text/javascript, */*; q=0.01')
+        try:
+            return await extraction_executor.run(parse_review_body, body, url)
+        except ValueError:
+            # A challenge page instead of JSON means our session is no longer trusted
+            self.blocked = True
+            raise HttpPathBlocked(f'Non-JSON response for {url}')
+    
+    async def stream_reviews(self, url: str) -> Tuple[List[Dict], List[str]]:
+        """Fetch a JSON review page, parsing the body while it is still downloading."""
+        if self.blocked:
+            raise HttpPathBlocked('HTTP path already blocked')
+        
+        self.requests_made += 1
+        headers = {**self.headers, 'accept': 'application/json, text/javascript, */*; q=0.01'}
+        async with self.http_client.stream(url, headers=headers, session=self.session,
+                                           proxy_info=self.proxy_info, timeout=timedelta(seconds=30)) as response:
+            if response.status_code in BLOCKED_STATUS_CODES:
+                self.blocked = True
+                raise HttpPathBlocked(f'HTTP {response.status_code} for {url}')
+            if response.status_code >= 400:
+                raise RuntimeError(f'HTTP {response.status_code} for {url}')
+            
+            parser = StreamingReviewParser(url)
+            reviews: List[Dict] = []
+            chunks: List[bytes] = []
+            try:
+                async for chunk in response.read_stream():
+                    stage_timer.add_bytes('http', len(chunk))
+                    if response_recorder.enabled:
+                        chunks.append(chunk)
+                    reviews.extend(parser.feed(chunk))
+                reviews.extend(parser.close())
+            except ijson.JSONError:
+                self.blocked = True
+                raise HttpPathBlocked(f'Non-JSON response for {url}')
+            response_recorder.record(url, response.status_code, response.headers.get('content-type', ''),
+                                     b''.join(chunks), 'http')
+            return reviews, parser.next_urls
+    
+    async def get_html(self, url: str) -> str:
+        body = await self._get(url, 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8')
+        return body.decode('utf-8', errors='replace')
+
+
+async def paginate_over_http(fast_path: HttpFastPath, shop: ShopState, start_url: str,
+                             writer: DatasetWriter, cursor_key: Optional[str] = None) -> Optional[str]:
+    """Walk shop review pages over HTTP; return the URL the browser should resume from, if any.
+    
+    With `cursor_key`, the next page is kept in the shop's cursors after every pushed page,
+    so a checkpoint lets a migrated run continue the walk instead of starting it over.
+    """
+    url: Optional[str] = start_url
+    deadline = time.time() + HTTP_PAGINATION_BUDGET_SECS
+    while url and shop.wants_more():
+        if time.time() > deadline:
+            # Hand over to a fresh request so the handler timeout is never hit
+            return url
+        try:
+            started = time.time()
+            html = await fast_path.get_html(url)
+        except HttpPathBlocked as e:
+            Actor.log.warning(f'[{shop.key}] HTTP fast path blocked ({str(e)}), falling back to browser.')
+            shop.http_fallbacks += 1
+            return url
+        except Exception as e:
+            Actor.log.warning(f'[{shop.key}] HTTP fast path failed ({str(e)}), falling back to browser.')
+            shop.http_fallbacks += 1
+            return url
+        
+        extraction = await extraction_executor.run(extract_page, html, url)
+        reviews = extraction.reviews
+        if not reviews:
+            # Either a challenge page or reviews that only render client-side
+            reason = extraction.block_reason or 'empty'
+            Actor.log.warning(f'[{shop.key}] HTTP fast path returned no reviews ({reason}), falling back to browser.')
+            fast_path.blocked = True
+            shop.http_fallbacks += 1
+            return url
+        
+        shop.pages_processed += 1
+        shop.http_pages += 1
+        if shop.is_stale_page(reviews):
+            shop.mark_caught_up(url)
+            return None
+
+        saved = await push_reviews(shop, reviews, writer)
+        Actor.log.info(f'[{shop.key}] HTTP page {url} in {time.time() - started:.2f}s: saved {saved} reviews. Total: {shop.reviews_scraped}')
+        
+        url = extraction.next_page_url
+        if cursor_key:
+            shop.set_cursor(cursor_key, http=url)
+    
+    return None
+
+
+class ApiResponseCollector:
+    """Collect reviews from API responses."""
+    
+    def __init__(self, streaming: bool = False, scan_counts: bool = False):
+        self.streaming = streaming
+        self.scan_counts = scan_counts
+        self.count_hints: Dict[str, int] = {}
+        self.reviews: List[Dict] = []
+        self.next_urls: Set[str] = set()
+        self.seen_urls: Set[str] = set()
+        self.review_endpoints: Set[str] = set()
+        self.in_flight = 0
+        self.last_activity = time.monotonic()
+    
+    def is_quiet(self, quiet_secs: float) -> bool:
+        """True when no review response is being read and none arrived in the last quiet_secs."""
+        return self.in_flight == 0 and time.monotonic() - self.last_activity >= quiet_secs
+    
+    async def wait_until_quiet(self, quiet_secs: float, timeout_secs: float = 10.0) -> None:
+        """Wait for review API traffic to go quiet, up to timeout_secs."""
+        deadline = time.monotonic() + timeout_secs
+        while not self.is_quiet(quiet_secs) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+    
+    async def on_response(self, response) -> None:
+        """Handle API responses."""
+        try:
+            url = response.url
+            headers = response.headers
+            content_type = headers.get('content-type', '')
+            content_length = headers.get('content-length', '')
+            if response_filter.check(url, content_type, int(content_length) if content_length.isdigit() else None):
+                return
+            
+            seen_key = normalize_response_url(url)
+            if seen_key in self.seen_urls:
+                response_filter.skip('duplicate')
+                return
+            
+            self.seen_urls.add(seen_key)
+            self.in_flight += 1
+            self.last_activity = time.monotonic()
+            try:
+                body = await response.body()
+            finally:
+                self.in_flight -= 1
+                self.last_activity = time.monotonic()
+            stage_timer.add_bytes('api', len(body))
+            response_recorder.record(url, response.status, content_type, body, 'api')
+            if len(body) > response_filter.max_bytes:
+                response_filter.skip('tooLarge', endpoint_key(url))
+                return
+            found, next_urls = await extraction_executor.run(parse_review_body, body, url, self.streaming)
+            response_filter.record(url, len(found), len(body))
+            if found:
+                self.reviews.extend(found)
+                self.review_endpoints.add(url)
+                if self.scan_counts:
+                    for kind, value in scan_count_hints(body.decode('utf-8', 'ignore')).items():
+                        self.count_hints[kind] = min(self.count_hints.get(kind, value), value)
+            
+            for next_url in next_urls:
+                self.next_urls.add(next_url)
+        except Exception as e:
+            Actor.log.debug(f'API response parse failed: {str(e)}')
+
+
+# =============================================================================
+# API PAGINATION
+# =============================================================================
+
+PAGE_PARAMS = ['page', 'page_num', 'pageNumber', 'p']
+OFFSET_PARAMS = ['offset', 'start', 'from']
+CURSOR_PARAMS = ['cursor', 'next_cursor', 'after', 'page_token', 'continuation']
+PAGE_SIZE_PARAMS = ['limit', 'per_page', 'page_size', 'pageSize', 'count', 'size']
+
+
+class PaginationScheme:
+    """Predictable page/offset pattern inferred from pagination URLs."""
+    
+    def __init__(self, kind: str, template: str, param: str, step: int):
+        self.kind = kind
+        self.template = template
+        self.param = param
+        self.step = step
+    
+    def _key(self, url: str) -> Tuple[str, Tuple]:
+        parsed = urlparse(url)
+        query = tuple(sorted((k, v) for k, v in parse_qsl(parsed.query) if k != self.param))
+        return f'{parsed.netloc}{parsed.path}', query
+    
+    def position_of(self, url: str) -> Optional[int]:
+        """Return the page position of a URL, or None if it does not follow this scheme."""
+        if self._key(url) != self._key(self.template):
+            return None
+        value = dict(parse_qsl(urlparse(url).query)).get(self.param)
+        if value is None or not value.isdigit():
+            return None
+        return int(value) // self.step if self.kind == 'offset' else int(value)
+    
+    def url_for(self, position: int) -> str:
+        value = position * self.step if self.kind == 'offset' else position
+        parsed = urlparse(self.template)
+        query = [(k, v) for k, v in parse_qsl(parsed.query) if k != self.param]
+        query.append((self.param, str(value)))
+        return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+def infer_pagination_scheme(urls: List[str]) -> Optional[PaginationScheme]:
+    """Work out the page/offset scheme behind pagination URLs; None for cursors or unknown shapes."""
+    for url in urls:
+        params = dict(parse_qsl(urlparse(url).query))
+        if any(param in params for param in CURSOR_PARAMS):
+            return None
+    
+    for url in urls:
+        params = dict(parse_qsl(urlparse(url).query))
+        for param in PAGE_PARAMS:
+            if params.get(param, '').isdigit():
+                return PaginationScheme('page', url, param, 1)
+        
+        for param in OFFSET_PARAMS:
+            if not params.get(param, '').isdigit():
+                continue
+            step = next((int(params[p]) for p in PAGE_SIZE_PARAMS if params.get(p, '').isdigit() and int(params[p]) > 0), 0)
+            if not step:
+                # Without an explicit page size, the offset of the second page is the page size
+                offsets = sorted({
+                    int(v) for u in urls
+                    for k, v in parse_qsl(urlparse(u).query) if k == param and v.isdigit() and int(v) > 0
+                })
+                step = offsets[0] if offsets else 0
+            if step:
+                return PaginationScheme('offset', url, param, step)
+    
+    return None
+
+
+class ApiPaginator:
+    """Fetch review API pages concurrently once their URLs become predictable."""
+    
+    def __init__(self, fetch_page, limit: int, max_pages: int, concurrency: int, is_stale_page=None,
+                 on_progress=None):
+        self.fetch_page = fetch_page
+        self.is_stale_page = is_stale_page
+        self.on_progress = on_progress
+        self.stale = False
+        self.limit = limit
+        self.max_pages = max_pages
+        self.concurrency = max(1, concurrency)
+        self.scheme: Optional[PaginationScheme] = None
+        self.frontier: Deque[str] = deque()
+        self.visited: Set[str] = set()
+        self.positions: Set[int] = set()
+        self.last_position: Optional[int] = None
+        self.exhausted = False
+        self.pages_fetched = 0
+        self.found = 0
+        self.results: List[Tuple[float, List[Dict]]] = []
+        self.fetched_urls: List[str] = []
+    
+    def to_checkpoint(self, in_flight: List[str]) -> Dict:
+        """Pages fetched so far with their reviews, and the URLs still to fetch."""
+        return {
+            'pages': [[url, order, found] for url, (order, found) in zip(self.fetched_urls, self.results)],
+            'pending': [*in_flight, *self.frontier],
+            'lastPosition': self.last_position,
+            'stale': self.stale,
+        }
+    
+    def restore(self, state: Dict) -> None:
+        """Continue from to_checkpoint(); fetched pages are not fetched again."""
+        for url, order, found in state['pages']:
+            self.visited.add(url)
+            self.fetched_urls.append(url)
+            self.results.append((order, found))
+            self.found += len(found)
+            self.pages_fetched += 1
+        self.last_position = state['lastPosition']
+        self.exhausted = self.last_position is not None
+        self.stale = state['stale']
+        self._learn([url for url, _, _ in state['pages']] + state['pending'])
+    
+    def _satisfied(self) -> bool:
+        return self.stale or (self.limit > 0 and self.found >= self.limit)
+    
+    def _add(self, url: str) -> None:
+        if url in self.visited:
+            return
+        position = self.scheme.position_of(url) if self.scheme else None
+        if position is not None:
+            if position in self.positions or (self.last_position is not None and position > self.last_position):
+                return
+            self.positions.add(position)
+        self.visited.add(url)
+        self.frontier.append(url)
+    
+    def _learn(self, urls: List[str]) -> None:
+        if self.scheme is None and urls:
+            self.scheme = infer_pagination_scheme(urls)
+            if self.scheme:
+                Actor.log.debug(f'API pagination uses {self.scheme.kind} parameter "{self.scheme.param}"')
+                for url in self.visited:
+                    position = self.scheme.position_of(url)
+                    if position is not None:
+                        self.positions.add(position)
+        for url in urls:
+            self._add(url)
+    
+    def _predict(self) -> None:
+        """Keep the in-flight window full with predicted page URLs."""
+        if not self.scheme or self.exhausted or not self.positions:
+            return
+        position = max(self.positions)
+        while len(self.frontier) < self.concurrency and len(self.visited) < self.max_pages:
+            position += 1
+            if self.last_position is not None and position > self.last_position:
+                return
+            self._add(self.scheme.url_for(position))
+    
+    async def _fetch(self, url: str) -> Tuple[str, List[Dict], List[str]]:
+        result = await self.fetch_page(url)
+        if result is None:
+            return url, [], []
+        found, next_urls = result
+        return url, found, next_urls
+    
+    async def run(self, seed_urls: List[str]) -> List[Dict]:
+        for url in seed_urls:
+            if url not in self.visited:
+                self.visited.add(url)
+                self.frontier.append(url)
+        self._learn(list(seed_urls))
+        
+        in_flight: Dict[asyncio.Task, str] = {}
+        order = max((item[0] for item in self.results), default=0.0)
+        orders: Dict[str, float] = {}
+        try:
+            while (self.frontier or in_flight) and not self._satisfied():
+                self._predict()
+                # A cursor (or unknown) scheme forces one page at a time
+                width = self.concurrency if self.scheme else 1
+                while self.frontier and len(in_flight) < width and self.pages_fetched + len(in_flight) < self.max_pages:
+                    url = self.frontier.popleft()
+                    position = self.scheme.position_of(url) if self.scheme else None
+                    order += 1
+                    orders[url] = float(position) if position is not None else order
+                    in_flight[asyncio.ensure_future(self._fetch(url))] = url
+                
+                if not in_flight:
+                    break
+                
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = in_flight.pop(task)
+                    self.pages_fetched += 1
+                    try:
+                        _, found, next_urls = task.result()
+                    except Exception as e:
+                        Actor.log.debug(f'API pagination fetch failed: {str(e)}')
+                        continue
+                    
+                    if not found:
+                        # An empty predicted page marks the end of the range
+                        position = self.scheme.position_of(url) if self.scheme else None
+                        if position is not None:
+                            self.exhausted = True
+                            if self.last_position is None or position - 1 < self.last_position:
+                                self.last_position = position - 1
+                    if self.is_stale_page and self.is_stale_page(found):
+                        # Only reviews from previous runs: everything older is known as well
+                        Actor.log.debug(f'API page {url} only has known reviews, stopping pagination.')
+                        self.stale = True
+                    self.found += len(found)
+                    self.results.append((orders[url], found))
+                    self.fetched_urls.append(url)
+                    self._learn(next_urls)
+                if self.on_progress:
+                    self.on_progress(self.to_checkpoint(list(in_flight.values())))
+        finally:
+            for task in in_flight:
+                task.cancel()
+        
+        results = [review for _, found in sorted(self.results, key=lambda item: item[0]) for review in found]
+        return results[:self.limit] if self.limit > 0 else results
+
+
+async def fetch_additional_reviews_from_api(page, seed_urls: List[str], limit: int,
+                                            fast_path: Optional[HttpFastPath] = None,
+                                            max_pages: int = 20, concurrency: int = 4,
+                                            streaming: bool = False, is_stale_page=None,
+                                            resume: Optional[Dict] = None, on_progress=None) -> List[Dict]:
+    """Fetch additional reviews from API pagination, over HTTP when a fast path is available.
+    
+    `resume` is a progress record passed to `on_progress` by an earlier attempt at the same page.
+    """
+    
+    async def fetch_page(url: str) -> Optional[Tuple[List[Dict], List[str]]]:
+        if fast_path and not fast_path.blocked:
+            try:
+                if streaming:
+                    return await fast_path.stream_reviews(url)
+                return await fast_path.get_reviews(url)
+            except HttpPathBlocked as e:
+                Actor.log.warning(f'HTTP fast path blocked during API pagination ({str(e)}), using browser.')
+        
+        response = await page.context.request.get(url, timeout=60000)
+        if not response.ok:
+            return None
+        body = await response.body()
+        stage_timer.add_bytes('apiExtra', len(body))
+        response_recorder.record(url, response.status, response.headers.get('content-type', ''), body, 'api')
+        return await extraction_executor.run(parse_review_body, body, url, streaming)
+    
+    paginator = ApiPaginator(fetch_page, limit, max_pages, concurrency, is_stale_page, on_progress)
+    if resume:
+        paginator.restore(resume)
+        Actor.log.info(f'Resuming API pagination after {paginator.pages_fetched} pages from a checkpoint.')
+    return await paginator.run(seed_urls)
+
+
+# =============================================================================
+# PAGE PLANNING
+# =============================================================================
+
+PLAN_MAX_PAGES = 200
+PAGE_COUNT_KEYS = ('totalPages', 'total_pages', 'pageCount', 'page_count', 'numPages', 'num_pages', 'lastPage', 'last_page')
+REVIEW_COUNT_KEYS = ('totalCount', 'total_count', 'totalResults', 'total_results', 'reviewCount', 'review_count',
+                     'totalReviews', 'total_reviews', 'numReviews', 'num_reviews')
+COUNT_KEYS = {**{key: 'pages' for key in PAGE_COUNT_KEYS}, **{key: 'reviews' for key in REVIEW_COUNT_KEYS}}
+# Totals are only read from review and pagination objects, not from listings, favorites and the like
+COUNT_CONTEXT_PATTERN = re.compile(r'review|paginat|paging|pager', re.IGNORECASE)
+COUNT_MAX_VALUE = 9_999_999
+
+
+def find_count_pairs(payload: Any) -> List[Tuple[str, Any]]:
+    """(key, value) pairs of the count keys in the review and pagination objects of parsed JSON.
+    
+    An object qualifies when it sits under a review or pagination key, or when it holds a
+    list under a review key (the envelope around the reviews themselves).
+    """
+    pairs: List[Tuple[str, Any]] = []
+    stack: List[Tuple[Any, bool]] = [(payload, False)]
+    while stack:
+        node, in_context = stack.pop()
+        if isinstance(node, list):
+            stack.extend((item, in_context) for item in node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        if in_context or any(isinstance(value, list) and COUNT_CONTEXT_PATTERN.search(key) for key, value in node.items()):
+            pairs.extend((key, value) for key, value in node.items() if key in COUNT_KEYS)
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                stack.append((value, bool(COUNT_CONTEXT_PATTERN.search(key))))
+    return pairs
+
+
+def count_hints_from_pairs(pairs: Iterable[Tuple[str, Any]]) -> Dict[str, int]:
+    """Smallest positive page and review totals among the pairs, keyed 'pages' and 'reviews'."""
+    hints: Dict[str, int] = {}
+    for key, value in pairs:
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= COUNT_MAX_VALUE:
+            continue
+        kind = COUNT_KEYS[key]
+        hints[kind] = min(hints.get(kind, value), value)
+    return hints
+
+
+def scan_count_hints(text: str) -> Dict[str, int]:
+    """Page and review totals of a JSON document (see find_count_pairs); empty if it does not parse."""
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return {}
+    return count_hints_from_pairs(find_count_pairs(payload))
+
+
+def page_number(url: str) -> int:
+    """Shop review page number of a URL; 1 when it has no page parameter."""
+    value = dict(parse_qsl(urlparse(url).query)).get('page', '')
+    return int(value) if value.isdigit() else 1
+
+
+def last_page_in_links(links: List[Tuple[str, str]]) -> int:
+    """Highest page number among (text, href) pagination links, 0 if there is none."""
+    last_page = 0
+    for text, href in links:
+        if text.isdigit():
+            last_page = max(last_page, int(text))
+        last_page = max(last_page, page_number(href))
+    return last_page
+
+
+def find_last_page_in_nav(document: ExtractionDocument) -> int:
+    """Highest page number linked from the pagination nav, 0 if there is none.
+    
+    Etsy truncates long navs, so this is a lower bound on the page count.
+    """
+    return last_page_in_links([
+        (link.get_text(strip=True), link.get('href') or '')
+        for link in document.soup.select('nav[aria-label="Pagination"] a')
+    ])
+
+
+def plan_review_pages(nav_last_page: int, page_hints: Dict[str, int], api_hints: Dict[str, int], url: str,
+                      per_page: int, remaining: int) -> Tuple[List[str], Optional[str]]:
+    """URLs of the pages after `url` needed for `remaining` more reviews (0 = all), and the count's source.
+    
+    The page count comes from review API metadata (or __NEXT_DATA__ when the API reported
+    nothing) and from the pagination nav. Etsy truncates long navs, so the nav is a lower
+    bound: the smallest count from the metadata is used when it reaches the nav, the nav
+    otherwise. A plan that falls short only means its last page keeps paginating, while
+    an overlong one loads empty pages. Returns no URLs when there is no count.
+    """
+    if per_page <= 0:
+        return [], None
+    
+    hints, hints_source = (api_hints, 'api') if api_hints else (page_hints, 'nextData')
+    # A shop without reviews may report zero pages; that is no count rather than a missing one
+    hint_pages = [pages for pages in (hints.get('pages', 0), math.ceil(hints.get('reviews', 0) / per_page)) if pages > 1]
+    if hint_pages and min(hint_pages) >= nav_last_page:
+        source, last_page = hints_source, min(hint_pages)
+    elif nav_last_page > 1:
+        source, last_page = 'nav', nav_last_page
+    else:
+        return [], None
+    
+    current = page_number(url)
+    if remaining > 0:
+        last_page = min(last_page, current + math.ceil(remaining / per_page))
+    last_page = min(last_page, current + PLAN_MAX_PAGES)
+    scheme = PaginationScheme('page', url, 'page', 1)
+    return [scheme.url_for(number) for number in range(current + 1, last_page + 1)], source
+
+
+# =============================================================================
+# LISTING FAN-OUT
+# =============================================================================
+
+LISTING_ID_PATTERN = re.compile(r'/listing/(\d+)')
+
+
+def find_listing_urls(document: ExtractionDocument) -> List[str]:
+    """Listing links on a page, in page order."""
+    return [link.get('href') or '' for link in document.soup.select('a[href*="/listing/"]')]
+
+
+def find_listing_ids(urls: List[str], reviews: List[Dict]) -> List[str]:
+    """Listing IDs in the given URLs or in the reviews' item URLs, in order."""
+    urls = urls + [review.get('item_url') or '' for review in reviews]
+    listing_ids = []
+    for url in urls:
+        match = LISTING_ID_PATTERN.search(url)
+        if match:
+            listing_ids.append(match.group(1))
+    return list(dict.fromkeys(listing_ids))
+
+
+def listing_reviews_url(page_url: str, listing_id: str) -> str:
+    """Review section of a listing on the same host as the page it was found on."""
+    parsed = urlparse(page_url)
+    return f'{parsed.scheme}://{parsed.netloc}/listing/{listing_id}#reviews'
+
+
+# =============================================================================
+# EXTRACTION EXECUTOR
+# =============================================================================
+
+EXTRACTION_EXECUTORS = ['inline', 'thread', 'process']
+
+
+class PageExtraction:
+    """Everything the handler needs from a page's HTML, small and picklable so it can come back from a worker process."""
     
-    try:
-        reviews_link = page.locator('a[href*="#reviews"], a[href*="reviews"]').first
-        if await reviews_link.count():
-            await reviews_link.click(timeout=5000)
-            await asyncio.sleep(0.8)
-    except Exception as e:
-        Actor.log.debug(f'Reviews link click failed: {str(e)}')
+    def __init__(self):
+        self.next_data_reviews: List[Dict] = []
+        self.jsonld_reviews: List[Dict] = []
+        self.html_reviews: List[Dict] = []
+        self.count_hints: Dict[str, int] = {}
+        self.nav_last_page = 0
+        self.listing_urls: List[str] = []
+        self.next_page_url: Optional[str] = None
+        self.block_reason: Optional[str] = None
+        self.block_details: Dict = {}
+        self.timings: Dict[str, float] = {}
+    
+    @property
+    def reviews(self) -> List[Dict]:
+        return merge_reviews(self.next_data_reviews, self.jsonld_reviews, self.html_reviews)
 
 
-async def scroll_for_reviews(page) -> None:
-    """Scroll to load more reviews."""
-    for _ in range(6):
-        await page.evaluate('window.scrollBy(0, window.innerHeight * 0.8)')
-        await asyncio.sleep(0.7 + (time.time() % 0.9))
+def extract_page(html: str, url: str) -> PageExtraction:
+    """Parse a page once and run every extractor over it; stage timings are returned rather than recorded."""
+    extraction = PageExtraction()
+    
+    started = time.perf_counter()
+    document = ExtractionDocument(html)
+    extraction.timings['extract.parse'] = time.perf_counter() - started
+    for stage, extractor, attribute in (
+        ('extract.nextData', extract_reviews_from_next_data, 'next_data_reviews'),
+        ('extract.jsonLd', extract_reviews_from_jsonld, 'jsonld_reviews'),
+        ('extract.html', extract_reviews_from_html, 'html_reviews'),
+    ):
+        started = time.perf_counter()
+        setattr(extraction, attribute, extractor(document))
+        extraction.timings[stage] = time.perf_counter() - started
+    
+    extraction.count_hints = scan_count_hints(document.next_data or '')
+    extraction.nav_last_page = find_last_page_in_nav(document)
+    extraction.listing_urls = find_listing_urls(document)
+    extraction.next_page_url = find_next_page_link(document, url)
+    if not (extraction.next_data_reviews or extraction.jsonld_reviews or extraction.html_reviews):
+        extraction.block_reason = detect_block_reason(document)
+        if extraction.block_reason:
+            extraction.block_details = extract_block_details(document)
+    return extraction
 
 
-class ApiResponseCollector:
-    """Collect reviews from API responses."""
+def run_with_counters(fn: Callable[..., Any], *args: Any) -> Tuple[Any, Dict[str, int]]:
+    """Run a job in a worker process and return it with the KeyResolver lookups it made there."""
+    hits, misses = key_resolver.hits, key_resolver.misses
+    result = fn(*args)
+    return result, {
+        'hits': key_resolver.hits - hits,
+        'misses': key_resolver.misses - misses,
+        'cachedShapes': len(key_resolver.plans),
+    }
+
+
+class ExtractionExecutor:
+    """Run CPU-bound extraction off the event loop.
+    
+    In 'thread' and 'process' mode jobs go to a pool of `workers`; at most
+    `max_pending` jobs are queued or running at once and further callers wait
+    for a slot, so a burst of pages never piles up unbounded work. 'inline'
+    calls the function directly, which is fastest on one core.
+    """
     
     def __init__(self):
-        self.reviews: List[Dict] = []
-        self.next_urls: Set[str] = set()
-        self.seen_urls: Set[str] = set()
+        self.mode = 'inline'
+        self.workers = 0
+        self.pool: Optional[Executor] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.jobs = 0
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.queue_waits: List[float] = []
     
-    async def on_response(self, response) -> None:
-        """Handle API responses."""
+    def configure(self, mode: str, workers: int = 0, max_pending: int = 0) -> None:
+        self.shutdown()
+        self.mode = mode
+        self.jobs = self.max_pending_seen = 0
+        self.queue_waits = []
+        if mode == 'inline':
+            return
+        self.workers = workers or os.cpu_count() or 1
+        if mode == 'process':
+            # Spawned workers import this module fresh instead of forking the crawler's event loop and browsers
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix='extract')
+        self.slots = asyncio.Semaphore(max_pending or self.workers * 2)
+    
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.jobs += 1
+        if not self.pool:
+            return fn(*args)
+        
+        queued = time.perf_counter()
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
         try:
-            url = response.url
-            if url in self.seen_urls:
-                return
-            
-            content_type = response.headers.get('content-type', '')
-            if not is_likely_review_response(url, content_type):
-                return
-            if 'application/json' not in content_type:
-                return
-            
-            self.seen_urls.add(url)
-            payload = await response.json()
-            found = extract_reviews_from_any(payload, url)
-            if found:
-                self.reviews.extend(found)
-            
-            next_urls = find_next_page_urls(payload)
-            for next_url in next_urls:
-                self.next_urls.add(next_url)
-        except Exception as e:
-            Actor.log.debug(f'API response parse failed: {str(e)}')
+            async with self.slots:
+                self.queue_waits.append((time.perf_counter() - queued) * 1000)
+                loop = asyncio.get_running_loop()
+                if self.mode == 'process':
+                    # Counters in the worker processes would otherwise never reach the run statistics
+                    result, counts = await loop.run_in_executor(self.pool, run_with_counters, fn, *args)
+                    key_resolver.add_worker_counts(counts)
+                    return result
+                return await loop.run_in_executor(self.pool, fn, *args)
+        finally:
+            self.pending -= 1
+    
+    def shutdown(self) -> None:
+        if self.pool:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+    
+    def statistics(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'jobs': self.jobs,
+            'maxPending': self.max_pending_seen,
+            'queueWaitP50Ms': round(percentile(self.queue_waits, 50), 2),
+            'queueWaitP95Ms': round(percentile(self.queue_waits, 95), 2),
+        }
 
 
-async def fetch_additional_reviews_from_api(page, seed_urls: List[str], limit: int) -> List[Dict]:
-    """Fetch additional reviews from API pagination."""
-    results = []
-    queue = list(seed_urls)
-    visited = set(queue)
-    max_pages = 20
+extraction_executor = ExtractionExecutor()
+
+
+# =============================================================================
+# IN-PAGE EXTRACTION
+# =============================================================================
+
+# Runs inside the page and returns only what the extractors would read from page.content():
+# the raw parts of each review element, review candidates from __NEXT_DATA__ and JSON-LD
+# (walked in the same order as walk_payload, keeping only the keys normalize_review reads),
+# count hints, pagination and listing links. Normalization stays in Python, so both paths
+# produce the same reviews.
+IN_PAGE_EXTRACTION_SCRIPT = '''(config) => {
+    const parts = config.parts;
+    const text = (node) => node ? node.textContent.trim() : null;
+    const elements = Array.from(document.querySelectorAll(config.reviewSelector)).map((node) => {
+        const itemLink = node.querySelector(parts.itemLink);
+        const image = node.tagName === 'IMG' ? node : node.querySelector('img');
+        return {
+            username: text(node.querySelector(parts.username)),
+            rating: text(node.querySelector(parts.rating)),
+            comment: text(node.querySelector(parts.comment)),
+            date: text(node.querySelector(parts.date)),
+            itemTitle: itemLink ? text(itemLink.querySelector(parts.itemTitle)) : null,
+            itemHref: itemLink ? itemLink.getAttribute('href') : null,
+            image: image ? image.getAttribute('src') : null,
+        };
+    });
+    
+    let nextData = null;
+    const jsonld = [];
+    for (const script of document.querySelectorAll('script')) {
+        const content = script.textContent;
+        if (!content) continue;
+        if (script.getAttribute('id') === '__NEXT_DATA__') {
+            if (nextData === null) nextData = content;
+        } else if (script.getAttribute('type') === 'application/ld+json') {
+            jsonld.push(content);
+        }
+    }
+    
+    const countKeys = new Set(config.countKeys);
+    const countContext = new RegExp(config.countContextPattern, 'i');
+    const countPairs = (content) => {
+        let payload;
+        try {
+            payload = JSON.parse(content);
+        } catch (error) {
+            return [];
+        }
+        const pairs = [];
+        const stack = [[payload, false]];
+        while (stack.length) {
+            const [node, inContext] = stack.pop();
+            if (Array.isArray(node)) {
+                for (const item of node) stack.push([item, inContext]);
+                continue;
+            }
+            if (node === null || typeof node !== 'object') continue;
+            const entries = Object.entries(node);
+            if (inContext || entries.some(([key, value]) => Array.isArray(value) && countContext.test(key))) {
+                for (const [key, value] of entries) {
+                    if (countKeys.has(key)) pairs.push([key, value]);
+                }
+            }
+            for (const [key, value] of entries) {
+                if (value !== null && typeof value === 'object') stack.push([value, countContext.test(key)]);
+            }
+        }
+        return pairs;
+    };
+    
+    const reviewFields = new RegExp(config.reviewFieldPattern, 'i');
+    const aliases = new Set(config.reviewAliases);
+    const skipped = new Set(config.skippedKeys);
+    const isObject = (value) => value !== null && typeof value === 'object' && !Array.isArray(value);
+    const candidates = (content) => {
+        let payload;
+        try {
+            payload = JSON.parse(content);
+        } catch (error) {
+            return [];
+        }
+        const found = [];
+        const add = (node) => {
+            const picked = Object.fromEntries(Object.entries(node).filter(([key]) => aliases.has(key.toLowerCase())));
+            if (Object.keys(picked).length) found.push(picked);
+        };
+        const tried = new Set();
+        const stack = [payload];
+        while (stack.length) {
+            const node = stack.pop();
+            if (Array.isArray(node)) {
+                for (const item of node) {
+                    if (Array.isArray(item)) {
+                        stack.push(item);
+                    } else if (isObject(item)) {
+                        tried.add(item);
+                        add(item);
+                        stack.push(item);
+                    }
+                }
+                continue;
+            }
+            if (!isObject(node)) continue;
+            if (!tried.has(node) && reviewFields.test(Object.keys(node).join('\\n'))) add(node);
+            for (const [key, value] of Object.entries(node)) {
+                if (value !== null && typeof value === 'object' && Object.keys(value).length && !skipped.has(key.toLowerCase())) {
+                    stack.push(value);
+                }
+            }
+        }
+        return found;
+    };
+    
+    return JSON.stringify({
+        elements,
+        nextData: nextData === null ? [] : candidates(nextData),
+        jsonld: jsonld.map(candidates),
+        countHints: nextData === null ? [] : countPairs(nextData),
+        nav: Array.from(document.querySelectorAll('nav[aria-label="Pagination"] a'))
+            .map((link) => [link.textContent.trim(), link.getAttribute('href') || '']),
+        listingUrls: Array.from(document.querySelectorAll('a[href*="/listing/"]')).map((link) => link.getAttribute('href') || ''),
+        nextPageUrl: (NEXT_PAGE_SCRIPT)(),
+    });
+}'''.replace('NEXT_PAGE_SCRIPT', NEXT_PAGE_SCRIPT)
+
+IN_PAGE_EXTRACTION_CONFIG = {
+    'reviewSelector': ','.join(REVIEW_ELEMENT_SELECTORS),
+    'parts': REVIEW_PART_SELECTORS,
+    'reviewFieldPattern': REVIEW_FIELD_PATTERN.pattern,
+    'reviewAliases': sorted({alias.lower() for aliases in REVIEW_FIELDS.values() for alias in aliases}),
+    'skippedKeys': sorted(SKIPPED_SUBTREE_KEYS),
+    'countKeys': sorted(COUNT_KEYS),
+    'countContextPattern': COUNT_CONTEXT_PATTERN.pattern,
+}
+
+
+def normalize_candidates(candidates: List[Dict], source: str) -> List[Dict]:
+    reviews = (normalize_review(candidate, source) for candidate in candidates)
+    return [review for review in reviews if review]
+
+
+def extract_in_page_result(payload: str) -> PageExtraction:
+    """Build a PageExtraction from the JSON returned by IN_PAGE_EXTRACTION_SCRIPT."""
+    extraction = PageExtraction()
+    data = json.loads(payload)
+    
+    started = time.perf_counter()
+    extraction.next_data_reviews = normalize_candidates(data['nextData'], 'next_data')
+    extraction.timings['extract.nextData'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    extraction.jsonld_reviews = [
+        review for candidates in data['jsonld'] for review in normalize_candidates(candidates, 'jsonld')
+    ]
+    extraction.timings['extract.jsonLd'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    if not data['elements']:
+        Actor.log.warning('No review elements found with primary selectors.')
+    reviews = (build_element_review(parts) for parts in data['elements'])
+    extraction.html_reviews = [review for review in reviews if review]
+    extraction.timings['extract.html'] = time.perf_counter() - started
+    
+    extraction.count_hints = count_hints_from_pairs(data['countHints'])
+    extraction.nav_last_page = last_page_in_links(data['nav'])
+    extraction.listing_urls = data['listingUrls']
+    extraction.next_page_url = data['nextPageUrl']
+    return extraction
+
+
+# =============================================================================
+# SHARDING
+# =============================================================================
+
+SHARD_ROLES = ['single', 'coordinator', 'worker', 'merge']
+SHARD_LOCAL_ROOT = Path('storage') / 'shards'
+SHARD_LEASE_SECS = 120.0
+SHARD_POLL_SECS = 1.0
+SHARD_IDLE_TIMEOUT_SECS = 300.0
+# Worker items carry their dedup digest, so the merge matches reviews on the review ID like a single run
+SHARD_DIGEST_FIELD = '_reviewDigest'
+
+
+class LocalShardStore:
+    """Shared shard queue and worker registry in a directory, for worker processes on one machine.
+    
+    Each shard is a serialized request in its own file. A worker claims one by renaming
+    it from pending/ to claimed/, which is atomic, so two workers never take the same
+    shard. Claims not renewed for lease_secs (a crashed worker) go back to pending/.
+    """
+    
+    def __init__(self, directory: Path, lease_secs: float = SHARD_LEASE_SECS):
+        self.directory = directory
+        self.lease_secs = lease_secs
+    
+    @classmethod
+    async def open(cls, name: str) -> 'LocalShardStore':
+        path = Path(name)
+        store = cls(path if path.is_absolute() else SHARD_LOCAL_ROOT / name)
+        for state in ('pending', 'claimed', 'done', 'workers'):
+            (store.directory / state).mkdir(parents=True, exist_ok=True)
+        return store
+    
+    @staticmethod
+    def _file_name(request: Request) -> str:
+        return hashlib.sha1(request.unique_key.encode()).hexdigest() + '.json'
+    
+    async def reset(self) -> 'LocalShardStore':
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return await self.open(str(self.directory))
+    
+    async def add(self, requests: List[Request]) -> int:
+        """Add requests as shards, skipping any that were already added; returns how many were new."""
+        added = 0
+        for request in requests:
+            name = self._file_name(request)
+            if any((self.directory / state / name).exists() for state in ('pending', 'claimed', 'done')):
+                continue
+            temp = self.directory / f'.{name}.{os.getpid()}.tmp'
+            temp.write_text(request.model_dump_json(), encoding='utf-8')
+            temp.replace(self.directory / 'pending' / name)
+            added += 1
+        return added
+    
+    async def claim(self) -> Optional[Request]:
+        self._requeue_expired()
+        for name in sorted(os.listdir(self.directory / 'pending')):
+            claimed = self.directory / 'claimed' / name
+            try:
+                os.rename(self.directory / 'pending' / name, claimed)
+            except FileNotFoundError:
+                continue  # another worker took it first
+            os.utime(claimed)
+            return Request.model_validate_json(claimed.read_text(encoding='utf-8'))
+        return None
     
-    while queue and (limit == 0 or len(results) < limit) and len(visited) <= max_pages:
-        url = queue.pop(0)
+    async def renew(self, request: Request) -> None:
         try:
-            response = await page.context.request.get(url, timeout=60000)
-            if not response.ok:
+            os.utime(self.directory / 'claimed' / self._file_name(request))
+        except FileNotFoundError:
+            pass
+    
+    async def complete(self, request: Request) -> None:
+        name = self._file_name(request)
+        try:
+            os.rename(self.directory / 'claimed' / name, self.directory / 'done' / name)
+        except FileNotFoundError:
+            pass
+    
+    def _requeue_expired(self) -> None:
+        cutoff = time.time() - self.lease_secs
+        for name in os.listdir(self.directory / 'claimed'):
+            claimed = self.directory / 'claimed' / name
+            try:
+                if claimed.stat().st_mtime < cutoff:
+                    os.rename(claimed, self.directory / 'pending' / name)
+            except FileNotFoundError:
                 continue
+    
+    async def is_finished(self) -> bool:
+        """True once shards were added and none are pending or claimed."""
+        return (
+            not os.listdir(self.directory / 'pending')
+            and not os.listdir(self.directory / 'claimed')
+            and bool(os.listdir(self.directory / 'done'))
+        )
+    
+    async def register_worker(self, worker_id: str, record: Dict) -> None:
+        record = {**record, 'storageDir': str(Path(Actor.configuration.storage_dir).resolve())}
+        (self.directory / 'workers' / f'{worker_id}.json').write_text(json.dumps(record), encoding='utf-8')
+    
+    async def workers(self) -> List[Dict]:
+        return [json.loads(path.read_text(encoding='utf-8')) for path in sorted((self.directory / 'workers').glob('*.json'))]
+    
+    async def open_dataset(self, record: Dict) -> Dataset:
+        """A worker's default dataset, read from its local storage directory."""
+        configuration = Configuration(storage_dir=record['storageDir'], purge_on_start=False)
+        return await Dataset.open(configuration=configuration, storage_client=FileSystemStorageClient())
+
+
+class PlatformShardStore:
+    """Shared shard queue and worker registry on the Apify platform.
+    
+    Shards live in a named request queue opened in shared access mode, which locks
+    each fetched request so parallel Actor runs never process the same shard. Worker
+    records go to a key-value store of the same name.
+    """
+    
+    def __init__(self, name: str, queue: RequestQueue, store: KeyValueStore):
+        self.name = name
+        self.queue = queue
+        self.store = store
+    
+    @classmethod
+    async def open(cls, name: str) -> 'PlatformShardStore':
+        queue = await RequestQueue.open(name=name, storage_client=ApifyStorageClient(request_queue_access='shared'))
+        return cls(name, queue, await Actor.open_key_value_store(name=name, force_cloud=True))
+    
+    async def reset(self) -> 'PlatformShardStore':
+        await self.queue.drop()
+        await self.store.drop()
+        return await self.open(self.name)
+    
+    async def add(self, requests: List[Request]) -> int:
+        added = 0
+        for request in requests:
+            processed = await self.queue.add_request(request)
+            added += bool(processed and not processed.was_already_present)
+        return added
+    
+    async def claim(self) -> Optional[Request]:
+        return await self.queue.fetch_next_request()
+    
+    async def renew(self, request: Request) -> None:
+        pass  # the shared queue client keeps its locks alive
+    
+    async def complete(self, request: Request) -> None:
+        await self.queue.mark_request_as_handled(request)
+    
+    async def is_finished(self) -> bool:
+        return await self.queue.get_total_count() > 0 and await self.queue.is_finished()
+    
+    async def register_worker(self, worker_id: str, record: Dict) -> None:
+        await self.store.set_value(f'worker-{worker_id}', record)
+    
+    async def workers(self) -> List[Dict]:
+        return [await self.store.get_value(item.key) async for item in self.store.iterate_keys() if item.key.startswith('worker-')]
+    
+    async def open_dataset(self, record: Dict) -> Dataset:
+        return await Actor.open_dataset(id=record['datasetId'], force_cloud=True)
+
+
+async def open_shard_store(name: str) -> Union[LocalShardStore, PlatformShardStore]:
+    """The shard store for this environment: a named request queue on Apify, a local directory otherwise."""
+    if Actor.is_at_home():
+        return await PlatformShardStore.open(name)
+    return await LocalShardStore.open(name)
+
+
+class ShardFeeder:
+    """Move shards from the shared store into this worker's crawler, up to max_in_flight at a time.
+    
+    A shard is completed in the store once the crawler has handled its request (or
+    given up on it), and the crawler is stopped when the store has no work left.
+    """
+    
+    def __init__(self, store, crawler: PlaywrightCrawler, max_in_flight: int):
+        self.store = store
+        self.crawler = crawler
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight: Dict[str, Request] = {}
+        self.claimed = 0
+        self.completed = 0
+    
+    async def run(self) -> None:
+        try:
+            await self._feed()
+        finally:
+            self.crawler.stop('No shards left in the shared store.')
+    
+    async def _feed(self) -> None:
+        request_queue = await self.crawler.get_request_manager()
+        idle_since = time.monotonic()
+        while True:
+            for unique_key, shard in list(self.in_flight.items()):
+                request = await request_queue.get_request(unique_key)
+                if request is None or request.handled_at is not None:
+                    await self.store.complete(self.in_flight.pop(unique_key))
+                    self.completed += 1
+                else:
+                    await self.store.renew(shard)
             
-            payload = await response.json()
-            found = extract_reviews_from_any(payload, url)
-            if found:
-                results.extend(found)
+            while len(self.in_flight) < self.max_in_flight:
+                shard = await self.store.claim()
+                if shard is None:
+                    break
+                self.in_flight[shard.unique_key] = shard
+                self.claimed += 1
+                await self.crawler.add_requests([
+                    Request.from_url(shard.url, unique_key=shard.unique_key, user_data=dict(shard.user_data))
+                ])
             
-            next_urls = find_next_page_urls(payload)
-            for next_url in next_urls:
-                if next_url not in visited:
-                    visited.add(next_url)
-                    queue.append(next_url)
-        except Exception as e:
-            Actor.log.debug(f'API pagination fetch failed: {str(e)}')
+            if self.in_flight:
+                idle_since = time.monotonic()
+            elif await self.store.is_finished() or time.monotonic() - idle_since > SHARD_IDLE_TIMEOUT_SECS:
+                return
+            await asyncio.sleep(SHARD_POLL_SECS)
     
-    return results
+    def statistics(self) -> Dict:
+        return {'shardsClaimed': self.claimed, 'shardsCompleted': self.completed}
+
+
+async def seed_shards(store, shop_entries: List[Dict]) -> int:
+    """Add one shard per shop; workers add page and listing shards as they go."""
+    return await store.add([
+        Request.from_url(entry['url'], user_data=ShopState(entry['shop'], entry['url'], entry['results_wanted']).request_data())
+        for entry in shop_entries
+    ])
+
+
+async def run_platform_workers(actor_input: Dict, worker_count: int) -> List[str]:
+    """Start worker runs of this Actor and wait for all of them; returns their run IDs."""
+    run_ids = []
+    for number in range(1, worker_count + 1):
+        run = await Actor.start(Actor.configuration.actor_id, {**actor_input, 'role': 'worker', 'workerId': f'worker-{number}'})
+        run_ids.append(run.id)
+    for run_id in run_ids:
+        await Actor.apify_client.run(run_id).wait_for_finish()
+    return run_ids
+
+
+async def merge_worker_outputs(store, push_data, digest_bits: int = 64, bloom_capacity: int = 0) -> Dict:
+    """Combine the workers' datasets into one, deduplicated per shop and trimmed to each shop's budget.
+    
+    Workers keep their own shop budgets, so together they can overshoot results_wanted
+    by a page or so per worker; the trim here restores the single-run limit. Reviews are
+    matched on the digest workers store in SHARD_DIGEST_FIELD (built from the review ID,
+    as in a single run), or on the review signature for items without one.
+    """
+    records = await store.workers()
+    budgets: Dict[str, int] = {}
+    shops: Dict[str, Dict] = {}
+    for record in records:
+        for key, shop in record['statistics'].get('shops', {}).items():
+            budgets[key] = max(budgets.get(key, 0), shop.get('resultsWanted', 0))
+            combined = shops.setdefault(key, {'reviewsScraped': 0, 'pagesProcessed': 0, 'reviewsMerged': 0})
+            combined['reviewsScraped'] += shop.get('reviewsScraped', 0)
+            combined['pagesProcessed'] += shop.get('pagesProcessed', 0)
+    
+    seen: Dict[str, ReviewDedup] = {}
+    merged: Dict[str, int] = {}
+    read = duplicates = over_budget = 0
+    for record in records:
+        dataset = await store.open_dataset(record)
+        async for item in dataset.iterate_items():
+            read += 1
+            review = dict(item)
+            key = review.get('shop', '')
+            dedup = seen.setdefault(key, ReviewDedup(digest_bits, bloom_capacity))
+            stored_digest = review.pop(SHARD_DIGEST_FIELD, None)
+            digest = int(stored_digest, 16) if stored_digest else dedup.digest(review)
+            if not dedup.add_digest(digest):
+                duplicates += 1
+                continue
+            if budgets.get(key, 0) > 0 and merged.get(key, 0) >= budgets[key]:
+                over_budget += 1
+                continue
+            merged[key] = merged.get(key, 0) + 1
+            await push_data(review)
+    
+    for key, count in merged.items():
+        shops.setdefault(key, {'reviewsScraped': 0, 'pagesProcessed': 0, 'reviewsMerged': 0})['reviewsMerged'] = count
+    return {
+        'totalReviewsScraped': sum(merged.values()),
+        'pagesProcessed': sum(record['statistics'].get('pagesProcessed', 0) for record in records),
+        'shopsProcessed': len(shops),
+        'shops': shops,
+        'merge': {
+            'workers': [record['workerId'] for record in records],
+            'itemsRead': read,
+            'duplicatesDropped': duplicates,
+            'overBudgetDropped': over_budget,
+        },
+    }
+
+
+# =============================================================================
+# CHECKPOINT
+# =============================================================================
+
+CHECKPOINT_KEY = 'CRAWL_CHECKPOINT'
+CHECKPOINT_DEDUP_PREFIX = 'CHECKPOINT-'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_INTERVAL_SECS = 60
+# Event and timer saves this close to the previous one are skipped; migration and abort always save
+CHECKPOINT_MIN_GAP_SECS = 10
+
+
+class CrawlCheckpoint:
+    """Crawl progress in the default key-value store, so a migrated or restarted run resumes where it stopped.
+    
+    The checkpoint record holds the run's page counter, each shop's counters, plan and
+    listing progress, and the export parts written so far. Each shop's dedup keys go into
+    their own binary record, rewritten only when the shop saw new reviews, under a
+    generation-numbered key; the checkpoint record is written last and points at them, so
+    a save cut short leaves the previous checkpoint intact. Pending pages are not copied:
+    they stay in the request queue, which outlives migrations like the key-value store does.
+    What a page walks inside its own handler, the HTTP fast path and API pagination, is
+    kept as the shop's cursors, so a retried page continues where it stopped.
+    
+    Pushes are paused while a checkpoint is taken, so it never counts a review as seen
+    before it is stored, and stay paused after the migration checkpoint, so the resumed
+    run does not push anything twice.
+    """
+    
+    def __init__(self, store, interval: float = CHECKPOINT_INTERVAL_SECS):
+        self.store = store
+        self.interval = interval
+        self.generation = 0
+        # Shop key -> (record key, dedup size) of the dedup records the last checkpoint points at
+        self.dedup_records: Dict[str, Tuple[str, int]] = {}
+        self.resumed_from: Optional[int] = None
+        self.saves = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.save_latencies: List[float] = []
+        self.last_save = 0.0
+        self.migrating = False
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._listeners: List[Tuple[Event, Callable]] = []
+    
+    async def load(self) -> Optional[Dict]:
+        record = await self.store.get_value(CHECKPOINT_KEY)
+        if not record:
+            return None
+        if record.get('version') != CHECKPOINT_VERSION:
+            Actor.log.warning(f'Ignoring a checkpoint of version {record.get("version")}, starting fresh.')
+            return None
+        self.generation = self.resumed_from = record['generation']
+        return record
+    
+    async def restore_shops(self, record: Dict, shops: Dict[str, ShopState], add_missing: bool) -> int:
+        """Restore the shops of a checkpoint; `add_missing` also brings back shops not in `shops` (workers)."""
+        restored = 0
+        for key, state in record['shops'].items():
+            if key not in shops:
+                if not add_missing:
+                    continue
+                shops[key] = ShopState(key, state['startUrl'], state['resultsWanted'])
+            data = await self.store.get_value(state['dedupKey'])
+            if data is None:
+                Actor.log.warning(f'[{key}] Checkpoint dedup record "{state["dedupKey"]}" is missing, restarting this shop.')
+                continue
+            shops[key].restore(state, ReviewDedup.from_bytes(data))
+            self.dedup_records[key] = (state['dedupKey'], state['dedupCount'])
+            restored += 1
+        return restored
+    
+    async def save(self, reason: str, shops: Dict[str, ShopState], pages_processed: int, started_at: float,
+                   writer: DatasetWriter, exporter: Optional[ReviewExporter] = None) -> None:
+        forced = reason in ('migrating', 'aborting', 'finished')
+        if self.migrating or (self._lock.locked() and not forced):
+            self.skipped += 1
+            return
+        async with self._lock:
+            if self.migrating or (not forced and time.monotonic() - self.last_save < CHECKPOINT_MIN_GAP_SECS):
+                self.skipped += 1
+                return
+            # Pages wait at push_reviews while the checkpoint is taken; pages already queueing finish first
+            await writer.pause()
+            saved = False
+            try:
+                await self._write(reason, shops, pages_processed, started_at, writer, exporter)
+                saved = True
+            finally:
+                if saved and reason == 'migrating':
+                    # Whatever is pushed from here on would be pushed again by the resumed run
+                    self.migrating = True
+                    Actor.log.info(f'Checkpoint {self.generation} saved for the migration, holding back further reviews.')
+                else:
+                    writer.resume()
+    
+    async def _write(self, reason: str, shops: Dict[str, ShopState], pages_processed: int, started_at: float,
+                     writer: DatasetWriter, exporter: Optional[ReviewExporter]) -> None:
+        started = time.perf_counter()
+        
+        # No page is halfway through pushing, so every review the snapshot counts as seen is queued;
+        # sync() stores them before the checkpoint is written
+        shop_states = {key: state.to_checkpoint() for key, state in shops.items()}
+        counts = {key: len(state.seen_reviews) for key, state in shops.items()}
+        changed = {
+            key: state.seen_reviews.to_bytes()
+            for key, state in shops.items()
+            if self.dedup_records.get(key, ('', -1))[1] != counts[key]
+        }
+        await writer.sync()
+        if exporter:
+            await exporter.flush()
+        
+        generation = self.generation + 1
+        records = dict(self.dedup_records)
+        for key, data in changed.items():
+            record_key = f'{CHECKPOINT_DEDUP_PREFIX}{generation}-{get_state_store_key(key)}'
+            await self.store.set_value(record_key, data, content_type='application/octet-stream')
+            records[key] = (record_key, counts[key])
+            self.bytes_written += len(data)
+        
+        record = {
+            'version': CHECKPOINT_VERSION,
+            'generation': generation,
+            'reason': reason,
+            'savedAt': datetime.utcnow().isoformat(),
+            'startedAt': started_at,
+            'pagesProcessed': pages_processed,
+            'shops': {
+                key: {**state, 'dedupKey': records[key][0], 'dedupCount': records[key][1]}
+                for key, state in shop_states.items()
+            },
+            'export': exporter.to_checkpoint() if exporter else None,
+        }
+        await self.store.set_value(CHECKPOINT_KEY, record)
+        self.bytes_written += len(json.dumps(record))
+        
+        # Superseded dedup records go only once the new checkpoint no longer points at them
+        for key in changed:
+            previous = self.dedup_records.get(key)
+            if previous:
+                await self.store.delete_value(previous[0])
+        self.dedup_records = records
+        self.generation = generation
+        self.saves += 1
+        self.last_save = time.monotonic()
+        self.save_latencies.append(time.perf_counter() - started)
+        Actor.log.debug(f'Checkpoint {generation} saved ({reason}): {len(changed)} dedup records, '
+                        f'{self.save_latencies[-1] * 1000:.0f} ms')
+    
+    def start(self, save) -> None:
+        """Call `save(reason)` on migration, abort and persist-state events, and every `interval` seconds."""
+        async def on_migrating() -> None:
+            await save('migrating')
+        
+        async def on_aborting() -> None:
+            await save('aborting')
+        
+        async def on_persist_state() -> None:
+            await save('persistState')
+        
+        async def every_interval() -> None:
+            while True:
+                await asyncio.sleep(self.interval)
+                await save('timer')
+        
+        self._listeners = [
+            (Event.MIGRATING, on_migrating),
+            (Event.ABORTING, on_aborting),
+            (Event.PERSIST_STATE, on_persist_state),
+        ]
+        for event, listener in self._listeners:
+            Actor.on(event, listener)
+        if self.interval > 0:
+            self._timer = asyncio.create_task(every_interval())
+    
+    async def stop(self) -> None:
+        for event, listener in self._listeners:
+            Actor.off(event, listener)
+        self._listeners = []
+        if self._timer:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        # Let a save that is already running finish before the writer closes under it
+        async with self._lock:
+            pass
+    
+    def statistics(self) -> Dict:
+        latencies_ms = [latency * 1000 for latency in self.save_latencies]
+        return {
+            'resumedFrom': self.resumed_from,
+            'generation': self.generation,
+            'saves': self.saves,
+            'skipped': self.skipped,
+            'bytesWritten': self.bytes_written,
+            'saveMs': {
+                'p50': round(percentile(latencies_ms, 50), 1),
+                'max': round(max(latencies_ms, default=0.0), 1),
+            },
+        }
 
 
 async def main() -> None:
@@ -536,71 +3675,330 @@ async def main() -> None:
     async with Actor:
         # Get input
         actor_input = await Actor.get_input() or {}
-        start_url = actor_input.get('startUrl')
         results_wanted = actor_input.get('results_wanted', 20)
         debug = actor_input.get('debug', False)
         max_request_retries = actor_input.get('maxRequestRetries', 3)
+        max_concurrency = max(1, actor_input.get('maxConcurrency', 1))
+        pages_per_browser = max(1, actor_input.get('pagesPerBrowser', 1))
+        http_fast_path = actor_input.get('httpFastPath', False)
+        max_api_pages = max(1, actor_input.get('maxApiPages', 20))
+        api_concurrency = max(1, actor_input.get('apiConcurrency', 4))
+        push_batch_size = max(1, actor_input.get('pushBatchSize', 100))
+        export_format = actor_input.get('exportFormat', 'none')
+        if export_format not in EXPORT_FORMATS:
+            Actor.log.warning(f'Unknown "exportFormat" value "{export_format}"; not exporting.')
+            export_format = 'none'
+        if export_format == 'parquet' and pyarrow is None:
+            Actor.log.warning('"exportFormat": "parquet" requires the pyarrow package; exporting NDJSON instead.')
+            export_format = 'ndjson'
+        export_only = actor_input.get('exportOnly', False) and export_format != 'none'
+        export_chunk_rows = max(1, actor_input.get('exportChunkRows', EXPORT_CHUNK_ROWS))
+        incremental = actor_input.get('incremental', False)
+        checkpoints = actor_input.get('checkpoints', True)
+        checkpoint_interval = max(0, actor_input.get('checkpointIntervalSecs', CHECKPOINT_INTERVAL_SECS))
+        dedup_digest_bits = 128 if actor_input.get('dedupDigestBits', 64) == 128 else 64
+        dedup_bloom_capacity = max(0, actor_input.get('dedupBloomCapacity', 0))
+        incremental_store_name = actor_input.get('incrementalStoreName') or 'etsy-reviews-incremental'
+        stream_json = actor_input.get('streamJson', False)
+        in_page_extraction = actor_input.get('inPageExtraction', False)
+        response_filter.learn = actor_input.get('responseFilterLearning', True)
+        page_planning = actor_input.get('pagePlanning', True)
+        listing_fan_out = actor_input.get('listingFanOut', False)
+        listing_results_wanted = max(0, actor_input.get('listingResultsWanted', 50))
+        max_listings = max(0, actor_input.get('maxListings', 200))
+        if stream_json and ijson is None:
+            Actor.log.warning('"streamJson" requires the ijson package; falling back to regular JSON parsing.')
+            stream_json = False
+        resource_blocking = actor_input.get('resourceBlocking', 'off')
+        if resource_blocking not in RESOURCE_BLOCKING_PROFILES:
+            Actor.log.warning(f'Unknown "resourceBlocking" value "{resource_blocking}"; using "off".')
+            resource_blocking = 'off'
+        blocked_domains = actor_input.get('blockedDomains') or []
+        speed_profile_name = actor_input.get('speedProfile', 'stealth')
+        if speed_profile_name not in SPEED_PROFILES:
+            Actor.log.warning(f'Unknown "speedProfile" value "{speed_profile_name}"; using "stealth".')
+            speed_profile_name = 'stealth'
+        speed_profile = SPEED_PROFILES[speed_profile_name]
+        warm_sessions = max(1, actor_input.get('warmSessions', max(2, max_concurrency)))
+        session_max_pages = max(1, actor_input.get('sessionMaxPages', 50))
+        profile_extraction = actor_input.get('profileExtraction', False)
+        executor_mode = actor_input.get('extractionExecutor', 'inline')
+        if executor_mode not in EXTRACTION_EXECUTORS:
+            Actor.log.warning(f'Unknown "extractionExecutor" value "{executor_mode}"; using "inline".')
+            executor_mode = 'inline'
+        if profile_extraction and executor_mode != 'inline':
+            Actor.log.warning('"profileExtraction" only sees extraction on the event loop; using the "inline" executor.')
+            executor_mode = 'inline'
+        executor_workers = max(0, actor_input.get('extractionWorkers', 0))
+        response_recorder.enabled = actor_input.get('recordArchive', False)
         proxy_config_input = actor_input.get('proxyConfiguration')
+        role = actor_input.get('role', 'single')
+        if role not in SHARD_ROLES:
+            Actor.log.warning(f'Unknown "role" value "{role}"; using "single".')
+            role = 'single'
+        shard_store_name = actor_input.get('shardStoreName') or 'etsy-reviews-shards'
+        worker_count = max(0, actor_input.get('workerCount', 0))
+        worker_id = str(actor_input.get('workerId') or Actor.configuration.actor_run_id or os.getpid())
+        if role == 'worker' and incremental:
+            Actor.log.warning('"incremental" is not supported for sharded workers; running without it.')
+            incremental = False
+        if role == 'worker' and export_format != 'none':
+            # The merge step reads worker datasets, so the export happens there
+            export_format, export_only = 'none', False
         
-        if not start_url:
-            raise ValueError('Missing "startUrl" in input.')
-        
-        # Normalize URL to include reviews section
-        if '#reviews' not in start_url:
-            start_url = f"{start_url.split('#')[0]}#reviews"
+        shop_entries = parse_start_urls(actor_input, results_wanted)
+        if not shop_entries and role in ('single', 'coordinator'):
+            raise ValueError('Missing "startUrls" (or "startUrl") in input.')
         
         Actor.log.info('Starting Etsy Reviews Scraper', {
-            'startUrl': start_url,
+            'shops': len(shop_entries),
             'results_wanted': results_wanted,
             'debug': debug,
-            'maxRequestRetries': max_request_retries
+            'maxRequestRetries': max_request_retries,
+            'maxConcurrency': max_concurrency,
+            'pagesPerBrowser': pages_per_browser,
+            'httpFastPath': http_fast_path,
+            'maxApiPages': max_api_pages,
+            'apiConcurrency': api_concurrency,
+            'streamJson': stream_json,
+            'inPageExtraction': in_page_extraction,
+            'responseFilterLearning': response_filter.learn,
+            'pagePlanning': page_planning,
+            'listingFanOut': listing_fan_out,
+            'pushBatchSize': push_batch_size,
+            'exportFormat': export_format,
+            'exportOnly': export_only,
+            'incremental': incremental,
+            'checkpoints': checkpoints,
+            'checkpointIntervalSecs': checkpoint_interval,
+            'dedupDigestBits': dedup_digest_bits,
+            'dedupBloomCapacity': dedup_bloom_capacity,
+            'resourceBlocking': resource_blocking,
+            'blockedDomains': blocked_domains,
+            'speedProfile': speed_profile_name,
+            'warmSessions': warm_sessions,
+            'sessionMaxPages': session_max_pages,
+            'profileExtraction': profile_extraction,
+            'extractionExecutor': executor_mode,
+            'recordArchive': response_recorder.enabled,
+            'role': role,
         })
         
+        # Sharded runs: the coordinator seeds a shared store (and on Apify starts the workers),
+        # workers crawl shards from it into their own datasets, and the merge step combines them
+        shard_store = await open_shard_store(shard_store_name) if role != 'single' else None
+        if role == 'coordinator':
+            shard_store = await shard_store.reset()
+            seeded = await seed_shards(shard_store, shop_entries)
+            Actor.log.info(f'Coordinator: added {seeded} shop shards to "{shard_store_name}".')
+            if not worker_count:
+                return
+            if not Actor.is_at_home():
+                Actor.log.info('Start local workers as separate processes with "role": "worker", then run "role": "merge".')
+                return
+            run_ids = await run_platform_workers(actor_input, worker_count)
+            Actor.log.info(f'Coordinator: {len(run_ids)} workers finished, merging their datasets.')
+            role = 'merge'
+        
+        # Batches of reviews go to the dataset, to the export files, or both
+        exporter = ReviewExporter(export_format, Actor.set_value, export_chunk_rows) if export_format != 'none' else None
+        
+        async def push_batch(batch: List[Dict]) -> None:
+            if exporter:
+                await exporter.write(batch)
+            if not export_only:
+                await Actor.push_data(batch)
+        
+        if role == 'merge':
+            writer = DatasetWriter(push_batch, batch_size=push_batch_size)
+            writer.start()
+            try:
+                statistics = await merge_worker_outputs(shard_store, writer.put, dedup_digest_bits, dedup_bloom_capacity)
+            finally:
+                await writer.close()
+                if exporter:
+                    await exporter.close()
+            statistics['datasetWriter'] = writer.statistics()
+            if exporter:
+                statistics['export'] = exporter.statistics()
+            await Actor.set_value('statistics', json.dumps(statistics))
+            Actor.log.info('Merge completed!', statistics['merge'])
+            return
+        
         # Setup proxy
         proxy_config = await Actor.create_proxy_configuration(
-            check_access=True,
-            **(proxy_config_input or {'useApifyProxy': True, 'apifyProxyGroups': ['RESIDENTIAL']})
+            actor_proxy_input=proxy_config_input or {'useApifyProxy': True, 'apifyProxyGroups': ['RESIDENTIAL']}
         )
         
+        # Shared by the crawler and the HTTP fast path; keeps one keep-alive client per proxy session
+        http_client = ImpitHttpClient(browser='firefox')
+        
         # Initialize counters
-        total_reviews_scraped = 0
         pages_processed = 0
         start_time = time.time()
-        seen_reviews: Set[str] = set()
+        shops: Dict[str, ShopState] = {
+            entry['shop']: ShopState(
+                entry['shop'], entry['url'], entry['results_wanted'],
+                ReviewDedup(dedup_digest_bits, dedup_bloom_capacity)
+            )
+            for entry in shop_entries
+        }
+        
+        # Load review high-water marks from previous runs
+        incremental_store = None
+        if incremental:
+            incremental_store = await Actor.open_key_value_store(name=incremental_store_name)
+            for state in shops.values():
+                state.attach_incremental(await IncrementalState.load(incremental_store, state.key, dedup_digest_bits))
+            Actor.log.info(f'Incremental mode: loaded state for {len(shops)} shops from "{incremental_store_name}"')
+        
+        # Reviews are written in batches off the request handler's critical path
+        writer = DatasetWriter(push_batch, batch_size=push_batch_size,
+                               digest_field=SHARD_DIGEST_FIELD if role == 'worker' else None)
+        
+        # A migrated or restarted run picks up its counters, dedup keys and export parts from the last checkpoint
+        checkpoint = CrawlCheckpoint(await Actor.open_key_value_store(), checkpoint_interval) if checkpoints else None
+        if checkpoint:
+            record = await checkpoint.load()
+            if record:
+                restored = await checkpoint.restore_shops(record, shops, add_missing=role == 'worker')
+                pages_processed = record['pagesProcessed']
+                start_time = record['startedAt']
+                if exporter and record.get('export'):
+                    exporter.restore(record['export'])
+                Actor.log.info(f'Resuming from checkpoint {checkpoint.generation} ({record["reason"]}, {record["savedAt"]}): '
+                               f'{restored} shops, {sum(state.reviews_scraped for state in shops.values())} reviews, '
+                               f'{pages_processed} pages')
+        
+        async def save_checkpoint(reason: str) -> None:
+            try:
+                await checkpoint.save(reason, shops, pages_processed, start_time, writer, exporter)
+            except Exception as e:
+                Actor.log.warning(f'Failed to save the {reason} checkpoint: {str(e)}')
+        
+        # Images, fonts and trackers are aborted before they leave the browser
+        network_profile = NetworkProfile(resource_blocking, blocked_domains)
+        network_stats = NetworkStats(network_profile)
+        page_traffic: Dict[int, PageTraffic] = {}
+        readiness_stats = ReadinessStats(speed_profile_name)
+        
+        # A small pool of proxy sessions, each served by its own warm browser, reused across pages and shops
+        browser_pool = SessionBrowserPool(
+            plugins=[CamoufoxPlugin(max_open_pages_per_browser=pages_per_browser)],
+            warm_browsers=warm_sessions,
+        )
+        session_pages: Dict[str, int] = {}
+        navigation_started: Dict[int, float] = {}
+        extraction_profiler = ExtractionProfiler() if profile_extraction else None
+        if extraction_profiler and not extraction_profiler.sampling:
+            Actor.log.warning('"profileExtraction" works best with pyinstrument installed; falling back to cProfile.')
+        
+        # Page and payload parsing runs on a worker pool when asked, keeping the event loop free for browsers
+        extraction_executor.configure(executor_mode, executor_workers)
         
         # Create crawler
         crawler = PlaywrightCrawler(
             proxy_configuration=proxy_config,
-            max_concurrency=1,
-            navigation_timeout_secs=120,
-            request_handler_timeout_secs=300,
+            concurrency_settings=ConcurrencySettings(
+                max_concurrency=max_concurrency,
+                desired_concurrency=max_concurrency,
+            ),
+            navigation_timeout=timedelta(seconds=120),
+            request_handler_timeout=timedelta(seconds=300),
             max_request_retries=max_request_retries,
             max_requests_per_crawl=None,
-            browser_pool=BrowserPool(plugins=[CamoufoxPlugin()]),
+            keep_alive=role == 'worker',
+            http_client=http_client,
+            browser_pool=browser_pool,
+            session_pool=SessionPool(
+                max_pool_size=warm_sessions,
+                create_session_settings={'max_usage_count': session_max_pages},
+            ),
+            use_session_pool=True,
         )
         
+        @crawler.pre_navigation_hook
+        async def install_network_layer(context) -> None:
+            traffic = PageTraffic(network_profile)
+            await traffic.install(context.page)
+            page_traffic[id(context.page)] = traffic
+            navigation_started[id(context.page)] = time.perf_counter()
+            
+            # Pages that fail navigation never reach the handler
+            def forget_page(_) -> None:
+                page_traffic.pop(id(context.page), None)
+                navigation_started.pop(id(context.page), None)
+            
+            context.page.once('close', forget_page)
+        
+        def retire_blocked_session(context: PlaywrightCrawlingContext, reason: str) -> SessionError:
+            """Drop the blocked session's browser now; raising the returned error retires the session itself."""
+            browser_pool.retire_session(context.proxy_info.session_id if context.proxy_info else None)
+            return SessionError(reason)
+        
+        def shop_for(request: Request) -> ShopState:
+            key = request.user_data.get('shop') or get_shop_key(request.url)
+            if key not in shops:
+                # Workers learn about shops from the shards they pull
+                shops[key] = ShopState(
+                    key, request.user_data.get('startUrl') or request.url,
+                    int(request.user_data.get('results_wanted', results_wanted)),
+                    ReviewDedup(dedup_digest_bits, dedup_bloom_capacity)
+                )
+            return shops[key]
+        
+        async def enqueue(requests: List[Request]) -> None:
+            """Queue follow-up requests; workers share them with the other workers through the shard store."""
+            if shard_store:
+                await shard_store.add(requests)
+            else:
+                await crawler.add_requests(requests)
+        
         @crawler.router.default_handler
         async def request_handler(context: PlaywrightCrawlingContext) -> None:
-            nonlocal total_reviews_scraped, pages_processed, seen_reviews
+            nonlocal pages_processed
             
             pages_processed += 1
             page = context.page
             request = context.request
+            handler_started = time.perf_counter()
+            navigation_start = navigation_started.pop(id(page), None)
+            if navigation_start is not None:
+                stage_timer.record('navigation', handler_started - navigation_start)
+            shop = shop_for(request)
+            shop.pages_processed += 1
+            if context.session:
+                session_pages[context.session.id] = session_pages.get(context.session.id, 0) + 1
+            
+            listing_id = request.user_data.get('listing')
+            listing_limit = shop.listing_remaining(listing_id, listing_results_wanted) if listing_id else 0
+            listing_done = bool(listing_id) and listing_results_wanted > 0 and listing_limit == 0
+            may_plan = page_planning and shop.can_plan and not listing_id and not request.user_data.get('planned')
+            
+            if shop.is_complete or shop.caught_up or listing_done:
+                Actor.log.info(f'[{shop.key}] Nothing left to collect, skipping {request.url}')
+                shop.cursors.pop(request.unique_key, None)
+                return
             
-            Actor.log.info(f'Processing page {pages_processed}: {request.url}')
+            Actor.log.info(f'[{shop.key}] Processing page {shop.pages_processed} (run page {pages_processed}): {request.url}')
             
+            # Where an earlier attempt at this page got to, when a checkpoint brought it back
+            cursor = shop.cursors.get(request.unique_key, {})
+            failed = False
             try:
-                collector = ApiResponseCollector()
+                collector = ApiResponseCollector(streaming=stream_json, scan_counts=may_plan)
                 page.on('response', collector.on_response)
                 
-                await page.wait_for_load_state('domcontentloaded')
-                await asyncio.sleep(1.5 + (time.time() % 1.5))
-                
-                # Check early block
-                early_html = await page.content()
-                early_block = detect_block_reason(early_html)
+                # Check early block from the navigation response, before any waits or DOM work
+                await response_recorder.record_document(context.response)
+                with stage_timer.span('blockCheck'):
+                    early_block, conclusive = await classify_page_response(context.response)
+                    await page.wait_for_load_state('domcontentloaded')
+                    if not conclusive:
+                        early_block = detect_block_reason_in_text(await page.evaluate(BLOCK_TEXT_SCRIPT))
                 
                 if early_block:
+                    early_html = await page.content()
                     details = extract_block_details(early_html)
                     if debug:
                         screenshot = await page.screenshot(full_page=True)
@@ -614,38 +4012,92 @@ async def main() -> None:
                         **details,
                         'timestamp': datetime.utcnow().isoformat()
                     }))
-                    raise Exception(f'Blocked early: {early_block}')
+                    raise retire_blocked_session(context, f'Blocked early: {early_block}')
+                
+                ready_started = time.monotonic()
+                await asyncio.sleep(jitter(*speed_profile['settle']))
                 
-                # Simulate human behavior
-                await asyncio.sleep(3 + (time.time() % 2))
+                # Simulate human behavior, keeping as much jitter as the speed profile asks for
+                await asyncio.sleep(jitter(*speed_profile['before_interaction']))
                 await ensure_reviews_section(page)
-                await simulate_human_behavior(page)
-                await scroll_for_reviews(page)
+                await simulate_human_behavior(page, speed_profile['human_scale'])
+                scrolls = await scroll_for_reviews(page, speed_profile, collector)
                 
                 # Wait for reviews
-                try:
-                    await page.wait_for_selector('[data-review-id], [data-reviews-container]', timeout=15000)
-                except Exception:
+                if not await wait_for_review_nodes(page, 15000):
                     Actor.log.warning('Timed out waiting for reviews content.')
                 
-                await asyncio.sleep(2)
+                await collector.wait_until_quiet(speed_profile['api_quiet'])
                 page.remove_listener('response', collector.on_response)
+                ready_secs = time.monotonic() - ready_started
+                readiness_stats.add(ready_secs, scrolls)
+                stage_timer.record('readiness', ready_secs)
+                Actor.log.debug(f'[{shop.key}] Page ready after {ready_secs:.1f}s and {scrolls} scrolls')
+                
+                # Extract reviews, either inside the page (only compact review data crosses over) or from the full HTML
+                html: Optional[str] = None
+                if in_page_extraction:
+                    with stage_timer.span('extract.inPage'):
+                        page_data = await page.evaluate(IN_PAGE_EXTRACTION_SCRIPT, IN_PAGE_EXTRACTION_CONFIG)
+                    stage_timer.add_bytes('inPage', len(page_data.encode('utf-8')))
+                else:
+                    with stage_timer.span('pageContent'):
+                        html = await page.content()
+                    stage_timer.add_bytes('html', len(html.encode('utf-8')))
                 
-                # Extract reviews
-                html = await page.content()
                 api_reviews = collector.reviews
-                next_data_reviews = extract_reviews_from_next_data(html)
-                jsonld_reviews = extract_reviews_from_jsonld(html)
-                html_reviews = extract_reviews_from_html(html)
+                with extraction_profiler.profile() if extraction_profiler else nullcontext():
+                    if html is None:
+                        extraction = await extraction_executor.run(extract_in_page_result, page_data)
+                    else:
+                        extraction = await extraction_executor.run(extract_page, html, request.url)
+                for stage, seconds in extraction.timings.items():
+                    stage_timer.record(stage, seconds)
+                next_data_reviews = extraction.next_data_reviews
+                jsonld_reviews = extraction.jsonld_reviews
+                html_reviews = extraction.html_reviews
                 
-                # Fetch extra reviews if needed
+                # In incremental mode, a page with only known reviews ends the crawl for this shop
+                # (a listing page only ends that listing, the shop's other listings may still have new reviews)
+                if shop.is_stale_page(merge_reviews(api_reviews, next_data_reviews, jsonld_reviews, html_reviews)):
+                    if listing_id:
+                        listing_done = True
+                    else:
+                        shop.mark_caught_up(request.url)
+                
+                # Export the trusted browser session for browser-free pagination
+                fast_path = None
+                if http_fast_path and shop.use_http:
+                    with stage_timer.span('httpExport'):
+                        fast_path = await HttpFastPath.from_page(
+                            page, http_client, context.proxy_info, sorted(collector.review_endpoints)
+                        )
+                
+                # Fetch extra reviews if needed (not again when an earlier attempt already pushed them)
                 api_extra_reviews = []
-                if collector.next_urls and (results_wanted == 0 or total_reviews_scraped + len(api_reviews) < results_wanted):
-                    remaining = max(0, results_wanted - total_reviews_scraped - len(api_reviews)) if results_wanted > 0 else 0
-                    api_extra_reviews = await fetch_additional_reviews_from_api(page, list(collector.next_urls), remaining)
+                api_pushed = 'api' in cursor and cursor['api'] is None
+                if collector.next_urls and shop.wants_more(len(api_reviews)) and not listing_done and not api_pushed:
+                    remaining = min(filter(None, (shop.remaining(len(api_reviews)), listing_limit)), default=0)
+                    
+                    def save_api_progress(progress: Dict) -> None:
+                        shop.set_cursor(request.unique_key, api=progress)
+                    
+                    with stage_timer.span('apiPagination'):
+                        api_extra_reviews = await fetch_additional_reviews_from_api(
+                            page, list(collector.next_urls), remaining, fast_path,
+                            max_pages=max_api_pages, concurrency=api_concurrency, streaming=stream_json,
+                            is_stale_page=shop.is_stale_page, resume=cursor.get('api'), on_progress=save_api_progress
+                        )
                 
                 # Merge all reviews
-                reviews = merge_reviews(api_reviews, api_extra_reviews, next_data_reviews, jsonld_reviews, html_reviews)
+                with stage_timer.span('merge'):
+                    reviews = merge_reviews(api_reviews, api_extra_reviews, next_data_reviews, jsonld_reviews, html_reviews)
+                
+                stage_timer.add_yield('api', len(api_reviews))
+                stage_timer.add_yield('apiExtra', len(api_extra_reviews))
+                stage_timer.add_yield('nextData', len(next_data_reviews))
+                stage_timer.add_yield('jsonLd', len(jsonld_reviews))
+                stage_timer.add_yield('html', len(html_reviews))
                 
                 Actor.log.info('Review extraction summary', {
                     'api': len(api_reviews),
@@ -657,7 +4109,12 @@ async def main() -> None:
                 })
                 
                 if not reviews:
-                    block_reason = detect_block_reason(html)
+                    if html is None:
+                        # Block reporting and debug artifacts need the full page
+                        with stage_timer.span('pageContent'):
+                            html = await page.content()
+                        extraction = await extraction_executor.run(extract_page, html, request.url)
+                    block_reason = extraction.block_reason
                     msg = f'No reviews extracted.{f" Reason: {block_reason}" if block_reason else ""}'
                     Actor.log.warning(msg)
                     
@@ -667,79 +4124,184 @@ async def main() -> None:
                         await Actor.set_value(f'DEBUG_{pages_processed}.html', html, content_type='text/html')
                     
                     if block_reason:
-                        details = extract_block_details(html)
                         await Actor.set_value(f'BLOCKED_{pages_processed}.json', json.dumps({
                             'stage': 'post-extract',
                             'url': request.url,
                             'reason': block_reason,
-                            **details,
+                            **extraction.block_details,
                             'timestamp': datetime.utcnow().isoformat()
                         }))
-                        raise Exception(f'Blocked: {block_reason}')
+                        raise retire_blocked_session(context, f'Blocked: {block_reason}')
                 
-                # Deduplicate
-                unique_reviews = []
-                for review in reviews:
-                    review_id = review.get('review_id')
-                    key = f"id:{review_id}" if review_id else f"sig:{review.get('username', '')}-{review.get('comment', '')}-{review.get('date', '')}-{review.get('item_title', '')}"
-                    
-                    if key not in seen_reviews:
-                        seen_reviews.add(key)
-                        unique_reviews.append(review)
+                # Deduplicate, reserve this shop's budget and push
+                with stage_timer.span('push'):
+                    saved = await push_reviews(shop, reviews, writer, listing_limit)
+                if 'api' in shop.cursors.get(request.unique_key, {}):
+                    shop.set_cursor(request.unique_key, api=None)
+                if listing_id:
+                    shop.listings[listing_id] = shop.listings.get(listing_id, 0) + saved
+                    listing_done = listing_done or (listing_results_wanted > 0 and saved >= listing_limit)
+                if saved:
+                    Actor.log.info(f'[{shop.key}] Saved {saved} new reviews. Total: {shop.reviews_scraped}')
+                
+                # Check if limit reached
+                if shop.is_complete:
+                    Actor.log.info(f'[{shop.key}] Reached goal: {shop.results_wanted} reviews.')
+                    return
                 
-                # Push data
-                slice_size = max(0, results_wanted - total_reviews_scraped) if results_wanted > 0 else len(unique_reviews)
-                reviews_to_push = unique_reviews[:slice_size]
+                # Fan out to the listings found so far; each one pages through its own reviews in parallel
+                if listing_fan_out:
+                    # A listing page links to recommendations and other shops' items; only its reviews point at this shop's
+                    page_listing_urls = [] if listing_id else extraction.listing_urls
+                    new_listings = shop.add_listings(find_listing_ids(page_listing_urls, reviews), max_listings)
+                    if new_listings:
+                        Actor.log.info(f'[{shop.key}] Fanning out to {len(new_listings)} listings ({len(shop.listings)} so far).')
+                        with stage_timer.span('enqueue'):
+                            await enqueue([
+                                Request.from_url(
+                                    listing_reviews_url(request.url, new_listing),
+                                    user_data=shop.request_data(listing=new_listing),
+                                )
+                                for new_listing in new_listings
+                            ])
+                    # Listing requests replace deep shop pagination once any listing is known
+                    if shop.listings and not listing_id:
+                        return
                 
-                for review in reviews_to_push:
-                    # Remove internal fields
-                    review.pop('review_id', None)
-                    review.pop('source', None)
+                if listing_done:
+                    Actor.log.info(f'[{shop.key}] Listing {listing_id} done with {shop.listings.get(listing_id, 0)} reviews.')
+                    return
                 
-                if reviews_to_push:
-                    for review in reviews_to_push:
-                        await context.push_data(review)
-                    total_reviews_scraped += len(reviews_to_push)
-                    Actor.log.info(f'Saved {len(reviews_to_push)} new reviews. Total: {total_reviews_scraped}')
+                # Plan the rest of the shop's pages from the first page so they are fetched in parallel;
+                # the HTTP fast path walks pages without a browser, so it keeps its own pagination
+                planned_urls: List[str] = []
+                if may_plan and not (fast_path and not fast_path.blocked):
+                    page_size = max(len(next_data_reviews), len(jsonld_reviews), len(html_reviews)) or len(api_reviews)
+                    with stage_timer.span('planPages'):
+                        planned_urls, shop.plan_source = plan_review_pages(
+                            extraction.nav_last_page, extraction.count_hints, collector.count_hints,
+                            request.url, page_size, shop.remaining()
+                        )
                 
-                # Check if limit reached
-                if results_wanted > 0 and total_reviews_scraped >= results_wanted:
-                    Actor.log.info(f'Reached goal: {results_wanted} reviews.')
+                if planned_urls:
+                    shop.planned_pages = len(planned_urls)
+                    Actor.log.info(f'[{shop.key}] Planned {len(planned_urls)} more pages from the {shop.plan_source} count, enqueuing them at once.')
+                    with stage_timer.span('enqueue'):
+                        await enqueue([
+                            Request.from_url(url, user_data=shop.request_data(planned=True, planLast=url == planned_urls[-1]))
+                            for url in planned_urls
+                        ])
+                    return
+                
+                # Pages inside a planned range are already queued; only the last one looks further
+                if request.user_data.get('planned') and not request.user_data.get('planLast'):
                     return
                 
                 # Find pagination
-                next_page_url = await page.evaluate('''() => {
-                    const nextButton = document.querySelector('nav[aria-label="Pagination"] a:last-child');
-                    if (nextButton && !nextButton.classList.contains('wt-is-disabled') && nextButton.getAttribute('aria-label')?.includes('Next')) {
-                        return nextButton.href;
-                    }
-                    const alternatives = Array.from(document.querySelectorAll('a[href*="page="]'));
-                    const nextLink = alternatives.find(a => a.innerText.includes('Next') || a.getAttribute('aria-label')?.includes('Next'));
-                    return nextLink ? nextLink.href : null;
-                }''')
+                with stage_timer.span('nextPageLookup'):
+                    next_page_url = extraction.next_page_url if in_page_extraction else await page.evaluate(NEXT_PAGE_SCRIPT)
+                if 'http' in cursor:
+                    Actor.log.info(f'[{shop.key}] Resuming HTTP pagination at {cursor["http"]} from a checkpoint.')
+                    next_page_url = cursor['http']
                 
-                if next_page_url and (results_wanted == 0 or total_reviews_scraped < results_wanted):
-                    Actor.log.info(f'Enqueuing next page: {next_page_url}')
-                    await crawler.add_requests([next_page_url])
+                if next_page_url and shop.wants_more() and fast_path and not fast_path.blocked and not listing_id:
+                    http_pages_before = shop.http_pages
+                    with stage_timer.span('httpPagination'):
+                        next_page_url = await paginate_over_http(fast_path, shop, next_page_url, writer, request.unique_key)
+                    if fast_path.blocked and shop.http_pages == http_pages_before:
+                        Actor.log.info(f'[{shop.key}] HTTP fast path yielded nothing, using the browser for this shop.')
+                        shop.use_http = False
+                
+                if next_page_url and shop.wants_more():
+                    request_data = shop.request_data(listing=listing_id) if listing_id else shop.request_data()
+                    Actor.log.info(f'[{shop.key}] Enqueuing next page: {next_page_url}')
+                    with stage_timer.span('enqueue'):
+                        await enqueue([Request.from_url(next_page_url, user_data=request_data)])
                 else:
-                    Actor.log.info('No more pages to process.')
+                    Actor.log.info(f'[{shop.key}] No more pages to process.')
             
             except Exception as e:
+                failed = True
                 Actor.log.error(f'Error processing {request.url}: {str(e)}')
                 raise
+            
+            finally:
+                if not failed:
+                    shop.cursors.pop(request.unique_key, None)
+                stage_timer.record('handler', time.perf_counter() - handler_started)
+                traffic = page_traffic.pop(id(page), None)
+                if traffic:
+                    await traffic.finish(page)
+                    network_stats.add(traffic)
+                    blocked = sum(traffic.blocked.values())
+                    Actor.log.info(f'[{shop.key}] Page transferred {traffic.bytes_transferred / 1024:.0f} KiB over {traffic.requests} requests, blocked {blocked}')
         
         Actor.log.info('Starting crawler...')
-        await crawler.run([start_url])
+        writer.start()
+        if checkpoint:
+            checkpoint.start(save_checkpoint)
+        feeder = ShardFeeder(shard_store, crawler, max_concurrency) if role == 'worker' else None
+        try:
+            if feeder:
+                feeder_task = asyncio.create_task(feeder.run())
+                await crawler.run([])
+                await feeder_task
+            else:
+                await crawler.run([
+                    Request.from_url(entry['url'], user_data=shops[entry['shop']].request_data())
+                    for entry in shop_entries
+                ])
+        finally:
+            if checkpoint:
+                await checkpoint.stop()
+            await writer.close()
+            if exporter:
+                await exporter.close()
+            extraction_executor.shutdown()
+            if incremental_store:
+                for state in shops.values():
+                    await state.incremental.save(incremental_store)
+        
+        # Kept after a clean finish too: a resurrected run then reports the same totals instead of starting over
+        if checkpoint:
+            await save_checkpoint('finished')
         
         # Save statistics
         duration = int(time.time() - start_time)
         statistics = {
-            'totalReviewsScraped': total_reviews_scraped,
+            'totalReviewsScraped': sum(state.reviews_scraped for state in shops.values()),
             'pagesProcessed': pages_processed,
+            'shopsProcessed': len(shops),
+            'shops': {key: state.to_statistics() for key, state in shops.items()},
+            'keyResolver': key_resolver.statistics(),
+            'datasetWriter': writer.statistics(),
+            'network': network_stats.statistics(),
+            'readiness': readiness_stats.statistics(),
+            'extractionExecutor': extraction_executor.statistics(),
+            'responseFilter': response_filter.statistics(),
+            'checkpoint': checkpoint.statistics() if checkpoint else None,
+            'browserSessions': {
+                **browser_pool.statistics(),
+                'sessionsUsed': len(session_pages),
+                'sessionReuses': sum(pages - 1 for pages in session_pages.values()),
+                'maxPagesPerSession': max(session_pages.values(), default=0),
+            },
             'duration': f'{duration} seconds'
         }
+        if exporter:
+            statistics['export'] = exporter.statistics()
+        
+        if feeder:
+            statistics['sharding'] = {'workerId': worker_id, **feeder.statistics()}
+            dataset = await Actor.open_dataset()
+            await shard_store.register_worker(worker_id, {'workerId': worker_id, 'datasetId': dataset.id, 'statistics': statistics})
         
         await Actor.set_value('statistics', json.dumps(statistics))
+        await Actor.set_value('stage_timings', json.dumps(stage_timer.statistics()))
+        if extraction_profiler:
+            await extraction_profiler.save()
+        if response_recorder.enabled:
+            await response_recorder.save()
         Actor.log.info('Scraping completed!', statistics)
 
 